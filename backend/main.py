@@ -26,6 +26,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],  # 카탈로그 캐시 검증 / 페이지 커서
 )
 
 # ----- 특정 라우터 개별 prefix/alias -----
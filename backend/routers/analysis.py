@@ -3,16 +3,32 @@ import json
 import math
 import os
 from collections import defaultdict
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response
 from pydantic import BaseModel
 from sqlalchemy.orm import Session, declarative_base
-from sqlalchemy import create_engine, Column, Integer, String, Float, Text, Index, text, DateTime, Enum, BigInteger, func
+from sqlalchemy import create_engine, Column, Integer, String, Float, Text, Index, text, DateTime, Enum, BigInteger, func, bindparam
 from sqlalchemy.dialects.mysql import JSON as MySQL_JSON
-from db import get_db
+from db import SessionLocal, get_db
 from typing import List
+from .ingredient_dict import IngredientMatch, caution_name_key, get_snapshot, normalize_name, start_background_refresh
+from .ingredient_scanner import get_scanner
+from .ingredient_tokens import ProductTokens, as_tokens, get_product_tokens
+from .ingredient_tokens import start_background_refresh as start_token_store_refresh
+from .product_resolver import fetch_product_by_pid, normalize_product_name, resolve_product_pid
+from .product_resolver import start_background_refresh as start_product_resolver_refresh
+from .product_name_index import start_background_refresh as start_product_index_refresh
+from .scoring_engine import ProductScoreMatrix, compile_all_weights, compile_weights, reliability_label, score_single
+from .score_materializer import fetch_materialized_all_types, fetch_materialized_score, fetch_top_scores
+from .score_materializer import start_background_refresh as start_score_refresh
+from .ttl_cache import TTLCache
+from .ocr_executor import run_ocr
+from .ocr_upload import read_upload
+from .image_preprocess import prepare_for_vision
+from .ocr_layout import OcrLayout, cached_layout, ingredient_block_text, layout_from_annotation
+from . import catalog
 from google.cloud import vision
 import io
-import re
+import numpy as np
 
 # --- SQLAlchemy Models (기존과 동일) ---
 Base = declarative_base()
@@ -92,10 +108,22 @@ class UserIngredients(Base):
 
 # --- Pydantic Models ---
 class AnalysisRequest(BaseModel):
-    product_name: str
+    product_name: str | None = None
+    pid: int | None = None          # [신규] 지정 시 이름 대신 기본키로 조회
     skin_type: str
     user_id: int | None = None  # [신규] 사용자 주의 성분 조회용
 
+class AllTypesAnalysisRequest(BaseModel):
+    product_name: str | None = None
+    pid: int | None = None
+    user_id: int | None = None
+
+class BatchAnalysisRequest(BaseModel):
+    product_names: List[str] = []
+    pids: List[int] = []
+    skin_type: str
+    user_id: int | None = None
+
 class ProductResponse(BaseModel):
     product_name: str
     
@@ -108,14 +136,21 @@ KEYWORD_KOR_TO_ENG = {
 }
 KEYWORD_ENG_TO_KOR = {v: k for k, v in KEYWORD_KOR_TO_ENG.items()}
 
-def normalize_name(name):
-    if not name: return None
-    return name.strip().lower().replace(' ', '').replace('-', '')
-
 def get_product_from_db(product_name: str, db: Session):
+    """제품명 → pid 리졸버로 기본키 조회. 리졸버에 없으면(신규 등록 직후 등) 이름으로 조회"""
+    try:
+        pid = resolve_product_pid(product_name)
+        if pid is not None:
+            product = fetch_product_by_pid(pid, db)
+            if product and (product["product_name"] == product_name or
+                            normalize_product_name(product["product_name"]) == normalize_product_name(product_name)):
+                return product
+    except Exception as e:
+        print(f"❌ DB 조회 오류 (get_product_from_db/pid): {e}")
+        raise HTTPException(status_code=500, detail=f"Database query error: {e}")
     try:
         query = text("""
-            SELECT product_name, category, p_ingredients
+            SELECT pid, product_name, category, p_ingredients
             FROM product_data
             WHERE product_name = :name
         """)
@@ -129,41 +164,26 @@ def get_product_from_db(product_name: str, db: Session):
         raise HTTPException(status_code=500, detail=f"Database query error: {e}")
 
 # --- [신규] 전체 성분 매칭 함수 ---
-def match_all_ingredients(ingredients_str: str, db: Session):
+def match_all_ingredients(ingredients: str | ProductTokens, db: Session | None = None):
     """
     '실제 전체 성분'을 더 정확히 세기 위해
     - KCIA.name_normalized와 정규화 일치 OR
     - ingredients.korean_name과 원문 정확 일치
-    를 만족하는 원소들을 수집하여 반환한다.
+    를 만족하는 원소들을 수집하여 반환한다. (인메모리 성분 사전 스냅샷 사용)
+    ingredients 는 사전 토큰화된 ProductTokens 또는 원문 문자열.
     """
-    if not ingredients_str:
+    if not ingredients:
         return []
 
-    # 원문 토큰 & 정규화
-    ingredients_list = [ing.strip().strip('"') for ing in ingredients_str.split(',') if ing.strip()]
-    norm_list = [normalize_name(ing) for ing in ingredients_list if normalize_name(ing)]
-    norm_set = set(norm_list)
-    orig_set = set(ingredients_list)
-
-    # KCIA 정규화 매칭
-    kcia_rows = db.query(KCIAIngredients.name_normalized).filter(
-        KCIAIngredients.name_normalized.in_(norm_set)
-    ).all()
-    kcia_norm_set = {r[0] for r in kcia_rows}
-
-    # ingredients 국문 정확 일치
-    ing_rows = db.query(Ingredients.korean_name).filter(
-        Ingredients.korean_name.in_(orig_set)
-    ).all()
-    ing_exact_set = {r[0] for r in ing_rows}
+    tokens = as_tokens(ingredients)
+    snap = get_snapshot()
 
     # 두 기준을 만족하는 원문 표기만 반환(중복 제거)
     matched = []
     seen = set()
-    for ing in ingredients_list:
-        n = normalize_name(ing)
-        if (n in kcia_norm_set) or (ing in ing_exact_set):
-            key = n if (n in kcia_norm_set) else f"EXACT::{ing}"
+    for ing, n in tokens:
+        if snap.is_verified(ing, n):
+            key = n if (n in snap.kcia_names) else f"EXACT::{ing}"
             if key not in seen:
                 matched.append(ing)
                 seen.add(key)
@@ -171,93 +191,88 @@ def match_all_ingredients(ingredients_str: str, db: Session):
     return matched
 
 # --- [신규] 주의 성분 조회 함수 (시스템 DB) ---
-def query_caution_ingredients(ingredients_list: List[str], db: Session):
+def query_caution_ingredients(ingredients_list: List[str], db: Session | None = None):
     """
-    caution_ingredients 테이블에서 주의 성분 조회
+    caution_ingredients(스냅샷)에서 주의 성분 조회
+    (기존 _ci 콜레이션 IN 조회처럼 대소문자/앞뒤 공백 무시, 같은 이름의 행은 모두 반환)
     """
     if not ingredients_list:
         return []
 
     try:
-        caution_results = db.query(
-            CautionIngredients.korean_name,
-            CautionIngredients.caution_grade
-        ).filter(
-            CautionIngredients.korean_name.in_(ingredients_list)
-        ).all()
-
-        return [
-            {
-                'korean_name': row[0],
-                'caution_grade': row[1]
-            }
-            for row in caution_results
-        ]
+        caution_rows = get_snapshot().caution_rows
+        results = []
+        seen = set()
+        for name in ingredients_list:
+            key = caution_name_key(name)
+            if key in seen:
+                continue
+            seen.add(key)
+            for korean_name, grade in caution_rows.get(key, ()):
+                results.append({
+                    'korean_name': korean_name,
+                    'caution_grade': grade
+                })
+        return results
     except Exception as e:
         print(f"❌ 주의 성분 조회 오류: {e}")
         return []
 
 # --- [신규] 사용자 주의 성분 조회 (정규화 교집합) ---
-def query_user_caution_ingredients(user_id: int | None, product_tokens: List[str], db: Session) -> List[str]:
-    """
-    user_ingredients에서 (user_id, ing_type='caution') 전체를 읽어 정규화 교집합으로 매칭.
-    DB에서 문자열 IN 비교를 하지 않아 표기차(공백/하이픈/대소문자/따옴표)를 흡수한다.
-    """
-    if not user_id or not product_tokens:
+def load_user_caution_names(user_id: int | None, db: Session) -> List[str]:
+    """user_ingredients에서 (user_id, ing_type='caution') 전체를 한 번에 읽는다."""
+    if not user_id:
         return []
-
-    product_norm_set = {normalize_name(t) for t in product_tokens if normalize_name(t)}
-
     try:
         rows = db.query(UserIngredients.korean_name).filter(
             UserIngredients.user_id == user_id,
             UserIngredients.ing_type == 'caution'
         ).all()
-
-        hits = []
-        for (kor_name,) in rows:
-            if not kor_name:
-                continue
-            if normalize_name(kor_name) in product_norm_set:
-                hits.append(kor_name)
-        # 디버깅 도움:
-        if hits:
-            print(f"[USER_CAUTION] user_id={user_id}, hits={hits}")
-        return hits
+        return [kor_name for (kor_name,) in rows if kor_name]
     except Exception as e:
-        print(f"❌ 사용자 주의 성분 정규화 매칭 오류: {e}")
+        print(f"❌ 사용자 주의 성분 조회 오류: {e}")
         return []
 
-# --- Matching Logic (기존과 동일) ---
-def match_ingredients(ingredients_str: str, db: Session):
-    if not ingredients_str:
+def match_user_cautions(caution_names: List[str], product_norm_set) -> List[str]:
+    """사용자 주의 성분 중 제품 정규화 토큰 집합에 포함된 것만 (원래 순서 유지)"""
+    if not caution_names or not product_norm_set:
+        return []
+    return [n for n in caution_names if normalize_name(n) in product_norm_set]
+
+def query_user_caution_ingredients(user_id: int | None, product_tokens: List[str] | ProductTokens,
+                                   db: Session) -> List[str]:
+    """
+    user_ingredients에서 (user_id, ing_type='caution') 전체를 읽어 정규화 교집합으로 매칭.
+    DB에서 문자열 IN 비교를 하지 않아 표기차(공백/하이픈/대소문자/따옴표)를 흡수한다.
+    """
+    if not user_id or not product_tokens:
+        return []
+
+    product_norm_set = as_tokens(product_tokens).norm_set()
+    hits = match_user_cautions(load_user_caution_names(user_id, db), product_norm_set)
+    # 디버깅 도움:
+    if hits:
+        print(f"[USER_CAUTION] user_id={user_id}, hits={hits}")
+    return hits
+
+def get_user_weights(skin_type: str):
+    """피부 타입 가중치(user_weights_dict 형태)를 스냅샷에서 조회. 없으면 None"""
+    return get_snapshot().weights.get(skin_type)
+
+# --- Matching Logic (기존과 동일, 사전 조회는 스냅샷) ---
+def match_ingredients(ingredients: str | ProductTokens, db: Session | None = None):
+    if not ingredients:
         return [], {}, [], 0
-    ingredients_list = [ing.strip().strip('"') for ing in ingredients_str.split(',') if ing.strip()]
+    tokens = as_tokens(ingredients)
     matched_details = []
     matched_stats = defaultdict(list)
     unmatched = []
-    normalized_names = list(set(normalize_name(ing) for ing in ingredients_list if normalize_name(ing)))
-
-    keyword_results = db.query(
-        Ingredients6Keyword.name_normalized,
-        Ingredients6Keyword.keyword
-    ).filter(
-        Ingredients6Keyword.name_normalized.in_(normalized_names)
-    ).all()
-    keyword_map = defaultdict(set)
-    for norm_name, kw in keyword_results:
-        keyword_map[norm_name].add(kw)
 
-    kcia_results = db.query(
-        KCIAIngredients.name_normalized,
-        KCIAIngredients.purpose
-    ).filter(
-        KCIAIngredients.name_normalized.in_(normalized_names)
-    ).all()
-    purpose_map = {norm_name: purp for norm_name, purp in kcia_results}
+    snap = get_snapshot()
+    keyword_map = snap.keywords
+    purpose_map = snap.kcia_purpose
 
-    for ingredient in ingredients_list:
-        normalized = normalize_name(ingredient)
+    for ingredient, normalized in tokens:
         if not normalized: continue
         keywords = keyword_map.get(normalized)
         purpose = purpose_map.get(normalized, '미확인')
@@ -278,7 +293,73 @@ def match_ingredients(ingredients_str: str, db: Session):
                 '효능': '미분류'
             })
 
-    return matched_details, dict(matched_stats), unmatched, len(ingredients_list)
+    return matched_details, dict(matched_stats), unmatched, len(tokens)
+
+# --- [신규] 단일 패스 매칭: 토큰당 사전 조회 1회 → 키워드/검증/주의 집계 ---
+def resolve_ingredient_matches(ingredients: str | ProductTokens) -> List[IngredientMatch]:
+    snap = get_snapshot()
+    return [snap.resolve(surface, norm) for surface, norm in as_tokens(ingredients)]
+
+def summarize_matches(records: List[IngredientMatch]) -> dict:
+    """
+    match_ingredients + match_all_ingredients + query_caution_ingredients 와 같은 결과를
+    매칭 레코드 한 번 순회로 만든다.
+    """
+    matched_details = []
+    matched_stats = defaultdict(list)
+    unmatched = []
+    verified = []
+    verified_norms = set()
+    verified_seen = set()
+    cautions = []
+    caution_seen = set()
+
+    for r in records:
+        if r.norm:
+            if r.keywords:
+                for keyword in r.keywords:
+                    matched_details.append({
+                        '성분명': r.surface,
+                        '배합목적': r.purpose,
+                        '효능': KEYWORD_ENG_TO_KOR.get(keyword, keyword)
+                    })
+                    matched_stats[keyword].append(r.surface)
+            else:
+                unmatched.append({
+                    '성분명': r.surface,
+                    '배합목적': r.purpose,
+                    '효능': '미분류'
+                })
+
+        if r.verified:
+            key = r.verified_key
+            if key in verified_seen:
+                continue
+            verified_seen.add(key)
+            verified.append(r.surface)
+            if r.norm:
+                verified_norms.add(r.norm)
+            if r.has_caution:
+                ckey = caution_name_key(r.surface)
+                if ckey not in caution_seen:
+                    caution_seen.add(ckey)
+                    cautions.extend({'korean_name': n, 'caution_grade': g} for n, g in r.cautions)
+
+    unique_matched = set()
+    for ing_list in matched_stats.values():
+        unique_matched.update(ing_list)
+
+    return {
+        "matched_details": matched_details,
+        "matched_stats": dict(matched_stats),
+        "unmatched": unmatched,
+        "total_count": len(records),
+        "total_keyword_hits": len(matched_details),
+        "unique_matched_count": len(unique_matched),
+        "verified": verified,                     # 검증된 원문 (match_all_ingredients)
+        "verified_norms": frozenset(verified_norms),
+        "caution": cautions,                      # 시스템 주의 성분 (query_caution_ingredients)
+    }
 
 # --- Score Logic (기존과 동일 + 타겟 내부 0.90~0.97 보정 유지) ---
 def calculate_keyword_ratios(matched_stats, total_matched_count):
@@ -459,147 +540,514 @@ def generate_analysis_text(skin_type, final_score, breakdown, caution_count):
 # --- API Router ---
 router = APIRouter()
 
+@router.on_event("startup")
+def load_ingredient_dict_on_startup():
+    """서버 시작 시 성분 사전 스냅샷 적재 + 백그라운드 버전 확인 시작"""
+    start_background_refresh()
+    # OCR 성분 스캐너 미리 구성 (실패 시 첫 OCR 요청에서 구성)
+    try:
+        get_scanner()
+    except Exception as e:
+        print(f"⚠️ OCR 성분 스캐너 사전 구성 실패: {e}")
+    # 사전 토큰화된 제품 성분(product_ingredient_tokens) 적재 + 증분 갱신
+    start_token_store_refresh()
+    # 제품명 → pid 리졸버 (분석 조회를 기본키 조회로)
+    start_product_resolver_refresh()
+    # OCR 제품 식별용 제품명 3-gram 색인
+    start_product_index_refresh()
+    # SCORE_REFRESH_SEC > 0 일 때만 워커 내 점수 테이블 주기 갱신
+    start_score_refresh()
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
 @router.get("/api/categories", response_model=List[str])
-def get_categories(db: Session = Depends(get_db)):
+def get_categories(request: Request, response: Response):
     try:
-        categories_query = db.query(ProductData.category).filter(
-            ProductData.p_ingredients.is_not(None),
-            ProductData.category.is_not(None)
-        ).distinct().order_by(ProductData.category)
-        categories = [row[0] for row in categories_query.all() if row[0]]
+        version, categories = catalog.get_categories()
+        etag = catalog.make_etag("categories", version)
+        if catalog.etag_matches(request.headers.get("if-none-match"), etag):
+            return _not_modified(etag)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
         return categories
     except Exception as e:
         print(f"❌ /api/categories 서버 오류: {e}")
         raise HTTPException(status_code=500, detail="카테고리 조회 중 오류가 발생했습니다.")
 
 @router.get("/api/products-by-category", response_model=List[ProductResponse])
-def get_products_by_category(category: str, db: Session = Depends(get_db)):
+def get_products_by_category(
+    category: str,
+    request: Request,
+    response: Response,
+    prefix: str | None = None,
+    cursor: str | None = None,
+    limit: int | None = Query(None, ge=1, le=500)
+):
+    """
+    카테고리 제품명 목록. limit 을 주면 (product_name, pid) 키셋 페이지네이션,
+    다음 페이지 커서는 X-Next-Cursor 헤더로 반환 (없으면 마지막 페이지)
+    """
+    try:
+        after = catalog.decode_cursor(cursor)
+    except Exception:
+        raise HTTPException(status_code=400, detail="잘못된 cursor 입니다.")
     try:
-        products_query = db.query(ProductData.product_name).filter(
-            ProductData.category == category,
-            ProductData.p_ingredients.is_not(None)
-        ).order_by(ProductData.product_name)
-        products = [{"product_name": row[0]} for row in products_query.all()]
-        return products
+        version, products = catalog.get_category_products(category)
+        etag = catalog.make_etag("products", version, category, prefix or "", cursor or "", limit or "")
+        if catalog.etag_matches(request.headers.get("if-none-match"), etag):
+            return _not_modified(etag)
+
+        names, next_cursor = catalog.page_products(products, prefix, after, limit)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return [{"product_name": n} for n in names]
     except Exception as e:
         print(f"❌ /api/products-by-category 서버 오류: {e}")
         raise HTTPException(status_code=500, detail="제품 목록 조회 중 오류가 발생했습니다.")
 
-# --- [수정] API - 기존 제품 분석 (주의 성분 + 사용자 주의 -40 적용) ---
-@router.post("/api/analyze")
-def analyze_product_api(request: AnalysisRequest, db: Session = Depends(get_db)):
-    print(f"[REQ] /api/analyze user_id={request.user_id}, product={request.product_name}")
-    """React에서 호출할 메인 분석 API 엔드포인트 (주의 성분 + 사용자 주의 감점)"""
+# 사용자와 무관한 분석 결과 캐시 (키에 사전/가중치 스냅샷 버전 포함 → 버전 변경 시 자연 무효화)
+_ANALYSIS_CACHE = TTLCache(
+    maxsize=int(os.getenv("ANALYZE_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("ANALYZE_CACHE_TTL_SEC", "600"))
+)
+
+def load_product(product_name: str | None, pid: int | None, db: Session) -> dict:
+    """pid 가 있으면 기본키 조회, 없으면 이름(리졸버 경유) 조회. 없으면 404"""
     try:
-        # 1. DB 조회
-        product = get_product_from_db(request.product_name, db)
-        if not product:
-            raise HTTPException(status_code=404, detail="제품을 찾을 수 없습니다.")
-        ingredients_str = product.get('p_ingredients')
-        if not ingredients_str:
-            raise HTTPException(status_code=400, detail="제품에 분석 가능한 성분 정보(p_ingredients)가 없습니다.")
-
-        # 2. 성분 매칭(키워드/목적용)
-        matched_details, matched_stats, unmatched, total_count = match_ingredients(
-            ingredients_str, db
-        )
+        product = fetch_product_by_pid(pid, db) if pid is not None else get_product_from_db(product_name, db)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ DB 조회 오류 (load_product): {e}")
+        raise HTTPException(status_code=500, detail=f"Database query error: {e}")
+    if not product:
+        raise HTTPException(status_code=404, detail="제품을 찾을 수 없습니다.")
+    return product
 
-        # ✅ 전체 성분(검증된 원문) 확보
-        all_matched_ingredients = match_all_ingredients(ingredients_str, db)
-        actual_total_count = len(all_matched_ingredients)
+def _product_cache_key(product_name: str | None, pid: int | None):
+    """캐시 키: pid 우선 (이름 요청도 리졸버로 pid 를 알면 같은 항목을 공유)"""
+    if pid is None:
+        pid = resolve_product_pid(product_name)
+    return ("pid", pid) if pid is not None else ("name", product_name)
 
-        # [신규] 고유 매칭 성분 수 계산
-        unique_matched_set = set()
-        for ing_list in matched_stats.values():
-            unique_matched_set.update(ing_list)
-        unique_matched_count = len(unique_matched_set)
+def build_analysis_base(product_name: str | None, skin_type: str, db: Session, pid: int | None = None) -> dict:
+    """
+    /api/analyze 결과 중 user_id 와 무관한 부분.
+    very_low 하드-스탑은 {"error": (status, detail)} 로 반환해 함께 캐시한다.
+    """
+    # 1. DB 조회
+    product = load_product(product_name, pid, db)
+    return build_analysis_base_for_product(product, skin_type, db)
 
-        # 비율 계산 + 신뢰등급 결정
-        total_keyword_hits = len(matched_details)
-        reliability = classify_reliability(total_keyword_hits)
-        if reliability == "low":
-            print(f"[WARN] low reliability (product): hits={total_keyword_hits}, product={product.get('product_name','N/A')}")
+def build_analysis_base_for_product(product: dict, skin_type: str, db: Session) -> dict:
+    """이미 조회한 product_data 행(pid, product_name, category, p_ingredients)으로 기본 결과 생성"""
+    ingredients_str = product.get('p_ingredients')
+    if not ingredients_str:
+        raise HTTPException(status_code=400, detail="제품에 분석 가능한 성분 정보(p_ingredients)가 없습니다.")
+    # 사전 토큰화된 성분 (스토어에 없거나 동기화 전이면 즉석 분할)
+    ingredient_tokens = get_product_tokens(product.get('pid'), ingredients_str)
 
-        # 하드-스탑: very_low(<3)
-        if reliability == "very_low":
-            raise HTTPException(
-                status_code=400,
-                detail=f"분석 중단: OCR 매칭 성분이 {total_keyword_hits}개로 매우 적습니다. 성분표를 더 선명하게 촬영해 다시 시도해주세요."
-            )
+    # 2. 성분 매칭 (키워드/목적 + 검증된 원문 + 시스템 주의를 단일 패스로)
+    summary = summarize_matches(resolve_ingredient_matches(ingredient_tokens))
+    matched_stats = summary["matched_stats"]
 
+    # 비율 계산 + 신뢰등급 결정
+    total_keyword_hits = summary["total_keyword_hits"]
+    reliability = classify_reliability(total_keyword_hits)
+    if reliability == "low":
+        print(f"[WARN] low reliability (product): hits={total_keyword_hits}, product={product.get('product_name','N/A')}")
+
+    # 하드-스탑: very_low(<3)
+    if reliability == "very_low":
+        return {"error": (
+            400,
+            f"분석 중단: OCR 매칭 성분이 {total_keyword_hits}개로 매우 적습니다. 성분표를 더 선명하게 촬영해 다시 시도해주세요."
+        )}
+
+    # 3~5. 물리화된 점수 테이블 우선 (없거나 갱신 전이면 실시간 계산)
+    materialized = fetch_materialized_score(product.get('pid'), skin_type, ingredients_str, db,
+                                            ingredient_tokens)
+    if materialized:
+        ratios = materialized["ratios"]
+        breakdown = materialized["breakdown"]
+        final_score = materialized["final_score"]
+    else:
         # 3. 비율 계산
         ratios = calculate_keyword_ratios(matched_stats, total_keyword_hits)
 
-        # 4. 가중치 조회
-        weights_from_db = db.query(BaumannWeights).filter(BaumannWeights.skin_type == request.skin_type).all()
-        if not weights_from_db:
+        # 4. 가중치 조회 (스냅샷)
+        user_weights_dict = get_user_weights(skin_type)
+        if not user_weights_dict:
             raise HTTPException(status_code=404, detail="피부 타입 가중치를 DB에서 찾을 수 없습니다.")
-        user_weights_dict = {}
-        for w in weights_from_db:
-            user_weights_dict[w.keyword] = {
-                "importance": w.importance,
-                "target_range": [w.target_min, w.target_max]
-            }
 
         # 5. 점수 계산
         final_score, breakdown = calculate_score_final(ratios, user_weights_dict)
         # === 점수 소프트 캡 적용 (히트/신뢰도 기반) ===
         final_score = apply_soft_caps_by_hits(final_score, total_keyword_hits, reliability)
 
-        # ✅ 6. 시스템 주의 성분 (검증된 원문 사용)
-        caution_ingredients = query_caution_ingredients(all_matched_ingredients, db)
+    # ✅ 6. 시스템 주의 성분 (검증된 원문 사용)
+    caution_ingredients = summary["caution"]
 
-        # ✅ 7. 사용자 주의 성분 매칭 (정규화 교집합, 검증된 원문 사용) 및 -40 즉시 감점
-        user_cautions = query_user_caution_ingredients(request.user_id, all_matched_ingredients, db)
-        score_before = final_score
-        has_user_caution = False
-        warning_message = None
-        modal_variant = None
-        if user_cautions:
-            has_user_caution = True
-            final_score = max(0, final_score - 40)
-            warning_message = "선택하신 주의 성분이 포함되어 있습니다."
-            modal_variant = "danger"
+    # 감점 없는 경우의 텍스트 분석은 미리 만들어 둔다
+    analysis_texts = generate_analysis_text(skin_type, final_score, breakdown, len(caution_ingredients))
+    if reliability == "low":
+        analysis_texts["opinion"] = prepend_low_reliability_warning(analysis_texts["opinion"])
+
+    return {
+        "product_info": {
+            "name": product.get('product_name', 'N/A'),
+            "category": product.get('category', 'N/A'),
+            "total_count": len(summary["verified"]),  # 실제 성분 개수
+            "matched_count": summary["unique_matched_count"]
+        },
+        "meta": {
+            "reliability": reliability,
+            "total_keyword_hits": total_keyword_hits
+        },
+        "skin_type": skin_type,
+        "score": final_score,
+        "charts": { "ratios": ratios, "breakdown": breakdown },
+        "analysis": analysis_texts,
+        "ingredients": {
+            "matched": summary["matched_details"],
+            "unmatched": summary["unmatched"],
+            "caution": caution_ingredients  # 시스템 주의 성분
+        },
+        # 사용자 주의 성분 교집합 / 비교 diff 용 (검증된 원문과 그 정규화 집합)
+        "verified_ingredients": summary["verified"],
+        "verified_norms": summary["verified_norms"],
+    }
+
+def get_analysis_base(product_name: str | None, skin_type: str, db: Session, pid: int | None = None) -> dict:
+    key = (_product_cache_key(product_name, pid), skin_type, get_snapshot().version)
+    return _ANALYSIS_CACHE.get_or_set(key, lambda: build_analysis_base(product_name, skin_type, db, pid))
 
-        # 8. 텍스트 분석 (주의 성분 개수 전달: 시스템 주의 기준)
-        analysis_texts = generate_analysis_text(request.skin_type, final_score, breakdown, len(caution_ingredients))
+def apply_user_overlay(base: dict, user_id: int | None, db: Session,
+                       caution_names: List[str] | None = None) -> dict:
+    """
+    캐시된 기본 결과 위에 사용자 주의 성분(-40 감점, 경고, 텍스트 재생성)만 덧씌운다.
+    caution_names 를 넘기면 사용자 주의 성분을 다시 조회하지 않는다(배치 분석용).
+    """
+    # ✅ 7. 사용자 주의 성분 매칭 (정규화 교집합, 검증된 원문 사용) 및 -40 즉시 감점
+    if caution_names is None:
+        caution_names = load_user_caution_names(user_id, db) if base["verified_norms"] else []
+    user_cautions = match_user_cautions(caution_names, base["verified_norms"])
+    if user_cautions:
+        print(f"[USER_CAUTION] user_id={user_id}, hits={user_cautions}")
+    score_before = base["score"]
+    final_score = score_before
+    has_user_caution = False
+    warning_message = None
+    modal_variant = None
+    analysis_texts = base["analysis"]
+    if user_cautions:
+        has_user_caution = True
+        final_score = max(0, final_score - 40)
+        warning_message = "선택하신 주의 성분이 포함되어 있습니다."
+        modal_variant = "danger"
+
+        # 8. 텍스트 분석 (감점 점수 기준으로 다시 생성, 주의 성분 개수: 시스템 주의 기준)
+        analysis_texts = generate_analysis_text(
+            base["skin_type"], final_score, base["charts"]["breakdown"], len(base["ingredients"]["caution"])
+        )
         # 저신뢰 경고 문구를 종합 의견 앞에 덧붙임
-        if reliability == "low":
+        if base["meta"]["reliability"] == "low":
             analysis_texts["opinion"] = prepend_low_reliability_warning(analysis_texts["opinion"])
 
-        # 9. JSON 반환
+    # 9. JSON 반환
+    return {
+        "product_info": base["product_info"],
+        "meta": base["meta"],
+
+        "skin_type": base["skin_type"],
+        "score_before": score_before,
+        "final_score": final_score,
+        "has_user_caution": has_user_caution,
+        "user_caution": [{"korean_name": n} for n in user_cautions],
+        "warning_message": warning_message,
+        "modal_variant": modal_variant,
+        "charts": base["charts"],
+        "analysis": analysis_texts,
+        "ingredients": base["ingredients"]
+    }
+
+# --- [수정] API - 기존 제품 분석 (주의 성분 + 사용자 주의 -40 적용) ---
+@router.post("/api/analyze")
+def analyze_product_api(request: AnalysisRequest, db: Session = Depends(get_db)):
+    print(f"[REQ] /api/analyze user_id={request.user_id}, product={request.product_name}, pid={request.pid}")
+    """React에서 호출할 메인 분석 API 엔드포인트 (주의 성분 + 사용자 주의 감점)"""
+    if request.pid is None and not request.product_name:
+        raise HTTPException(status_code=400, detail="product_name 또는 pid 를 지정해주세요.")
+    try:
+        base = get_analysis_base(request.product_name, request.skin_type, db, request.pid)
+        if "error" in base:
+            status_code, detail = base["error"]
+            raise HTTPException(status_code=status_code, detail=detail)
+        return apply_user_overlay(base, request.user_id, db)
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        print(f"❌ /api/analyze 서버 오류: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+# --- [신규] API - 16개 피부타입 점수 벡터 (타입 전환은 클라이언트 조회) ---
+_ALL_WEIGHTS_CACHE = TTLCache(maxsize=4, ttl=0)
+
+def get_all_compiled_weights():
+    """스냅샷의 전체 바우만 가중치를 (P, 6) 배열로 컴파일 (버전별 1회)"""
+    snap = get_snapshot()
+    return _ALL_WEIGHTS_CACHE.get_or_set(snap.version, lambda: compile_all_weights(snap.weights))
+
+def build_all_types_base(product_name: str | None, db: Session, pid: int | None = None) -> dict:
+    """성분 매칭 1회 + 전체 피부타입 점수 (물리화 테이블 우선, 없으면 벡터화 채점, user_id 무관)"""
+    product = load_product(product_name, pid, db)
+    ingredients_str = product.get('p_ingredients')
+    if not ingredients_str:
+        raise HTTPException(status_code=400, detail="제품에 분석 가능한 성분 정보(p_ingredients)가 없습니다.")
+    ingredient_tokens = get_product_tokens(product.get('pid'), ingredients_str)
+
+    summary = summarize_matches(resolve_ingredient_matches(ingredient_tokens))
+    total_keyword_hits = summary["total_keyword_hits"]
+    reliability = classify_reliability(total_keyword_hits)
+    if reliability == "very_low":
+        return {"error": (
+            400,
+            f"분석 중단: OCR 매칭 성분이 {total_keyword_hits}개로 매우 적습니다. 성분표를 더 선명하게 촬영해 다시 시도해주세요."
+        )}
+
+    compiled = get_all_compiled_weights()
+    if len(compiled) == 0:
+        raise HTTPException(status_code=404, detail="피부 타입 가중치를 DB에서 찾을 수 없습니다.")
+
+    # /api/analyze 와 같은 출처: 물리화된 점수 테이블 우선 (하나라도 없거나 갱신 전이면 실시간 계산)
+    materialized = fetch_materialized_all_types(product.get('pid'), list(compiled.skin_types),
+                                                ingredients_str, db, ingredient_tokens)
+    if materialized:
+        ratios = materialized[compiled.skin_types[0]]["ratios"]
+        final_score = [materialized[st]["final_score"] for st in compiled.skin_types]
+        breakdowns = [materialized[st]["breakdown"] for st in compiled.skin_types]
+    else:
+        ratios = calculate_keyword_ratios(summary["matched_stats"], total_keyword_hits)
+        _, final_score, breakdowns = score_single(ratios, total_keyword_hits, compiled)
+
+    return {
+        "product_info": {
+            "name": product.get('product_name', 'N/A'),
+            "category": product.get('category', 'N/A'),
+            "total_count": len(summary["verified"]),
+            "matched_count": summary["unique_matched_count"]
+        },
+        "meta": {
+            "reliability": reliability,
+            "total_keyword_hits": total_keyword_hits
+        },
+        "charts": { "ratios": ratios },
+        "ingredients": {
+            "matched": summary["matched_details"],
+            "unmatched": summary["unmatched"],
+            "caution": summary["caution"]
+        },
+        "scores": [
+            {
+                "skin_type": st,
+                "score": int(final_score[p]),
+                "breakdown": breakdowns[p]
+            }
+            for p, st in enumerate(compiled.skin_types)
+        ],
+        "verified_norms": summary["verified_norms"],
+    }
+
+@router.post("/api/analyze/all-types")
+def analyze_all_types_api(request: AllTypesAnalysisRequest, db: Session = Depends(get_db)):
+    """
+    제품 1개를 전체 바우만 타입(baumann_weights)에 대해 한 번에 평가.
+    scores[i] 는 /api/analyze 의 타입별 항목(score_before/final_score/breakdown/analysis)과 같다.
+    """
+    print(f"[REQ] /api/analyze/all-types user_id={request.user_id}, product={request.product_name}, pid={request.pid}")
+    if request.pid is None and not request.product_name:
+        raise HTTPException(status_code=400, detail="product_name 또는 pid 를 지정해주세요.")
+    try:
+        # get_analysis_base 의 (제품, skin_type, 버전) 키와 겹치지 않도록 별도 네임스페이스
+        key = ("all_types", _product_cache_key(request.product_name, request.pid), get_snapshot().version)
+        base = _ANALYSIS_CACHE.get_or_set(
+            key, lambda: build_all_types_base(request.product_name, db, request.pid)
+        )
+        if "error" in base:
+            status_code, detail = base["error"]
+            raise HTTPException(status_code=status_code, detail=detail)
+
+        caution_names = load_user_caution_names(request.user_id, db) if base["verified_norms"] else []
+        user_cautions = match_user_cautions(caution_names, base["verified_norms"])
+        penalty = 40 if user_cautions else 0
+        caution_count = len(base["ingredients"]["caution"])
+        low = base["meta"]["reliability"] == "low"
+
+        scores = []
+        for item in base["scores"]:
+            final_score = max(0, item["score"] - penalty) if penalty else item["score"]
+            analysis_texts = generate_analysis_text(item["skin_type"], final_score, item["breakdown"], caution_count)
+            if low:
+                analysis_texts["opinion"] = prepend_low_reliability_warning(analysis_texts["opinion"])
+            scores.append({
+                "skin_type": item["skin_type"],
+                "score_before": item["score"],
+                "final_score": final_score,
+                "breakdown": item["breakdown"],
+                "analysis": analysis_texts
+            })
+
         return {
-            "product_info": {
-                "name": product.get('product_name', 'N/A'),
-                "category": product.get('category', 'N/A'),
-                "total_count": actual_total_count,  # 실제 성분 개수
-                "matched_count": unique_matched_count
-            },
-            "meta": {
-                "reliability": reliability,
-                "total_keyword_hits": total_keyword_hits
-            },
+            "product_info": base["product_info"],
+            "meta": base["meta"],
+            "has_user_caution": bool(user_cautions),
+            "user_caution": [{"korean_name": n} for n in user_cautions],
+            "warning_message": "선택하신 주의 성분이 포함되어 있습니다." if user_cautions else None,
+            "modal_variant": "danger" if user_cautions else None,
+            "charts": base["charts"],
+            "ingredients": base["ingredients"],
+            "scores": scores
+        }
 
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        print(f"❌ /api/analyze/all-types 서버 오류: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+# --- [신규] API - 배치 분석 (비교/즐겨찾기 화면) ---
+MAX_BATCH_ANALYZE = 20
+
+def get_products_for_batch(product_names: List[str], pids: List[int], db: Session) -> List[dict]:
+    """이름/pid 목록을 한 번의 쿼리로 조회. 요청 순서 유지, 중복 제거"""
+    conds, params, binds = [], {}, []
+    if product_names:
+        conds.append("product_name IN :names")
+        params["names"] = list(product_names)
+        binds.append(bindparam("names", expanding=True))
+    if pids:
+        conds.append("pid IN :pids")
+        params["pids"] = list(pids)
+        binds.append(bindparam("pids", expanding=True))
+    if not conds:
+        return []
+    query = text(f"""
+        SELECT pid, product_name, category, p_ingredients
+        FROM product_data
+        WHERE {" OR ".join(conds)}
+    """).bindparams(*binds)
+    rows = [dict(r._mapping) for r in db.execute(query, params).fetchall()]
+
+    by_name, by_pid = {}, {}
+    for r in rows:
+        by_name.setdefault(r["product_name"], r)
+        by_pid.setdefault(r["pid"], r)
+
+    ordered, seen = [], set()
+    for key, table in [(n, by_name) for n in product_names] + [(p, by_pid) for p in pids]:
+        r = table.get(key)
+        if r is not None and r["pid"] not in seen:
+            seen.add(r["pid"])
+            ordered.append(r)
+    return ordered
+
+def compare_ingredients(bases: List[tuple]) -> dict:
+    """
+    (pid, 기본 결과) 목록 → 공통/고유 성분 diff (검증된 원문 기준, 정규화로 비교)
+    unique 는 pid 로 키를 잡는다 (같은 이름의 제품이 서로 덮어쓰지 않도록)
+    """
+    if not bases:
+        return {"shared": [], "unique": {}}
+    surface_of = {}
+    for _, base in bases:
+        for ing in base["verified_ingredients"]:
+            n = normalize_name(ing)
+            if n:
+                surface_of.setdefault(n, ing)
+
+    norm_sets = [base["verified_norms"] for _, base in bases]
+    shared = frozenset.intersection(*norm_sets)
+    unique = {}
+    for i, (pid, base) in enumerate(bases):
+        others = frozenset().union(*(ns for j, ns in enumerate(norm_sets) if j != i))
+        unique[pid] = [surface_of[n] for n in sorted(base["verified_norms"] - others) if n in surface_of]
+    return {
+        "shared": [surface_of[n] for n in sorted(shared) if n in surface_of],
+        "unique": unique,
+    }
+
+@router.post("/api/analyze/batch")
+def analyze_batch_api(request: BatchAnalysisRequest, db: Session = Depends(get_db)):
+    """
+    여러 제품을 한 번에 분석. 제품 조회 1회, 가중치/사전 스냅샷 1회, 사용자 주의 성분 조회 1회.
+    results 의 각 항목은 /api/analyze 와 같은 스키마 (실패 항목은 error/status_code)
+    """
+    print(f"[REQ] /api/analyze/batch user_id={request.user_id}, "
+          f"names={len(request.product_names)}, pids={len(request.pids)}")
+    requested = len(set(request.product_names)) + len(set(request.pids))
+    if requested == 0:
+        raise HTTPException(status_code=400, detail="분석할 제품을 지정해주세요.")
+    if requested > MAX_BATCH_ANALYZE:
+        raise HTTPException(status_code=400, detail=f"한 번에 최대 {MAX_BATCH_ANALYZE}개 제품까지 분석할 수 있습니다.")
+
+    try:
+        snap = get_snapshot()
+        if not snap.weights.get(request.skin_type):
+            raise HTTPException(status_code=404, detail="피부 타입 가중치를 DB에서 찾을 수 없습니다.")
+
+        products = get_products_for_batch(request.product_names, request.pids, db)
+        found_names = {p["product_name"] for p in products}
+        found_pids = {p["pid"] for p in products}
+
+        results = []
+        bases = []
+        caution_names = None
+        for product in products:
+            name = product["product_name"]
+            key = (("pid", product["pid"]), request.skin_type, snap.version)
+            try:
+                base = _ANALYSIS_CACHE.get_or_set(
+                    key, lambda: build_analysis_base_for_product(product, request.skin_type, db)
+                )
+            except HTTPException as he:
+                results.append({"product_name": name, "pid": product["pid"],
+                                "status_code": he.status_code, "error": he.detail})
+                continue
+            if "error" in base:
+                status_code, detail = base["error"]
+                results.append({"product_name": name, "pid": product["pid"],
+                                "status_code": status_code, "error": detail})
+                continue
+            if caution_names is None:
+                caution_names = load_user_caution_names(request.user_id, db)
+            result = apply_user_overlay(base, request.user_id, db, caution_names)
+            result["pid"] = product["pid"]
+            results.append(result)
+            bases.append((product["pid"], base))
+
+        missing = ([{"product_name": n, "status_code": 404, "error": "제품을 찾을 수 없습니다."}
+                    for n in dict.fromkeys(request.product_names) if n not in found_names] +
+                   [{"pid": p, "status_code": 404, "error": "제품을 찾을 수 없습니다."}
+                    for p in dict.fromkeys(request.pids) if p not in found_pids])
+
+        return {
             "skin_type": request.skin_type,
-            "score_before": score_before,
-            "final_score": final_score,
-            "has_user_caution": has_user_caution,
-            "user_caution": [{"korean_name": n} for n in user_cautions],
-            "warning_message": warning_message,
-            "modal_variant": modal_variant,
-            "charts": { "ratios": ratios, "breakdown": breakdown },
-            "analysis": analysis_texts,
-            "ingredients": {
-                "matched": matched_details,
-                "unmatched": unmatched,
-                "caution": caution_ingredients  # 시스템 주의 성분
-            }
+            "results": results + missing,
+            "comparison": compare_ingredients(bases)
         }
 
     except HTTPException as he:
         raise he
     except Exception as e:
-        print(f"❌ /api/analyze 서버 오류: {e}")
+        print(f"❌ /api/analyze/batch 서버 오류: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
@@ -625,199 +1073,261 @@ def get_vision_client():
         print(f"❌ Vision API 클라이언트 생성 실패: {e}")
         raise HTTPException(status_code=500, detail=f"Vision API 설정 오류: {e}")
 
-def extract_text_from_image_bytes(image_bytes: bytes) -> str:
-    """이미지 바이트에서 OCR 텍스트 추출 (Google Vision API)"""
+def extract_ocr_layout_from_image_bytes(image_bytes: bytes | memoryview) -> OcrLayout | None:
+    """이미지 바이트의 OCR 텍스트 + 블록 레이아웃 (같은 이미지는 OCR 캐시에서, 아니면 Google Vision API)"""
+    return cached_layout("text_layout", image_bytes, lambda: _vision_text_detection(image_bytes))
+
+def extract_text_from_image_bytes(image_bytes: bytes | memoryview) -> str:
+    """이미지 바이트에서 OCR 전체 텍스트 추출"""
+    layout = extract_ocr_layout_from_image_bytes(image_bytes)
+    return layout.text if layout else ""
+
+def _vision_text_detection(image_bytes: bytes | memoryview) -> OcrLayout:
     try:
         client = get_vision_client()
-        image = vision.Image(content=image_bytes)
+        image = vision.Image(content=prepare_for_vision(image_bytes))
         response = client.text_detection(image=image)
 
         if response.error.message:
             raise Exception(f"Vision API 오류: {response.error.message}")
 
         texts = response.text_annotations
-        if texts:
-            return texts[0].description
-        else:
-            return ""
+        return layout_from_annotation(response.full_text_annotation, texts[0].description if texts else "")
     except Exception as e:
         print(f"❌ OCR 텍스트 추출 실패: {e}")
         raise HTTPException(status_code=500, detail=f"OCR 처리 오류: {e}")
 
-def extract_ingredients_from_ocr_with_db(full_text: str, db: Session) -> str:
+def extract_ocr_matches(full_text: str) -> List[IngredientMatch]:
     """
     OCR 텍스트에서 '전체 성분 후보'를 최대한 보존한다.
-    - KCIA.name_normalized ∈ 정규화토큰집합 → 포함
-    - ingredients.korean_name ∈ 원문토큰집합 → 포함(국문 정확일치)
-    결과: 중복 제거한 원문 표기를 콤마로 반환
+    - 사전 트라이 스캐너로 KCIA 정규화 이름 / ingredients 국문명(정규화)의
+      단어 경계 최장 일치 구간을 한 번에 추출 (여러 단어 성분명 포함)
+    - 국문명 패턴으로 잡힌 구간은 사전의 국문 표기를 원문으로 사용(국문 정확일치 유지)
+    결과: 중복 제거한 원문 표기별 매칭 레코드 (토큰당 스냅샷 조회 1회, 이후 집계에 재사용)
     """
     try:
-        # 1) 토큰화 & 전처리
-        words = re.findall(r'[가-힣a-zA-Z0-9\-]+', full_text)
-        words = [w for w in words if len(w) >= 2]
-        if not words:
-            return ""
-
-        normalized_words = []
-        original_map = {}
-        for w in words:
-            n = normalize_name(w)
-            if n:
-                normalized_words.append(n)
-                if n not in original_map:
-                    original_map[n] = w
-
-        if not normalized_words:
-            return ""
-
-        unique_norm = list(set(normalized_words))
-        words_set = set(words)  # 국문 정확일치용
-
-        # 2) KCIA 정규화 매칭
-        kcia_rows = db.query(KCIAIngredients.name_normalized).filter(
-            KCIAIngredients.name_normalized.in_(unique_norm)
-        ).distinct().all()
-        kcia_norm_set = {row[0] for row in kcia_rows}
-
-        # 3) ingredients 국문 정확 일치
-        ing_rows = db.query(Ingredients.korean_name).filter(
-            Ingredients.korean_name.in_(words_set)
-        ).distinct().all()
-        ing_exact_set = {row[0] for row in ing_rows}
-
-        # 4) 최종 후보 구성: (KCIA 정규화) ∪ (ingredients 국문 정확일치)
-        result = []
+        snap = get_snapshot()
+        spans = get_scanner(snap).scan(full_text or "")
+        if not spans:
+            return []
+
+        # 최종 후보 구성: (KCIA 정규화) ∪ (ingredients 국문 정확일치)
+        records = []
         seen = set()
-        for w in words:
-            n = normalize_name(w)
-            if (n in kcia_norm_set) or (w in ing_exact_set):
-                key = n if (n in kcia_norm_set) else f"EXACT::{w}"
-                if key not in seen:
-                    result.append(w)
-                    seen.add(key)
-
-        ingredients_str = ', '.join(result)
-        print(f"[DEBUG] OCR 전체 성분 후보 포함: {len(result)}개")
-        return ingredients_str
+        for sp in spans:
+            surface = sp.korean_name or sp.text
+            r = snap.resolve(surface, normalize_name(surface) if sp.korean_name else sp.norm)
+            if r.verified and r.verified_key not in seen:
+                records.append(r)
+                seen.add(r.verified_key)
+
+        print(f"[DEBUG] OCR 전체 성분 후보 포함: {len(records)}개")
+        return records
 
     except Exception as e:
         print(f"❌ 성분 추출 오류: {e}")
         import traceback; traceback.print_exc()
-        return ""
+        return []
 
-@router.get("/api/top-products")
-def top_products_api(
-    category: str,
-    skin_type: str,
-    user_id: int | None = None,
-    limit: int = 4,
-    db: Session = Depends(get_db)
-):
-    # 1) 카테고리 느슨 매칭 + p_ingredients 공란 제거
+def extract_ingredient_tokens_from_ocr(full_text: str) -> ProductTokens:
+    """extract_ocr_matches 결과를 토큰 형태로"""
+    records = extract_ocr_matches(full_text)
+    return ProductTokens([r.surface for r in records], [r.norm for r in records])
+
+def extract_ingredients_from_ocr_with_db(full_text: str, db: Session | None = None) -> str:
+    """extract_ingredient_tokens_from_ocr 결과를 콤마 문자열로 (기존 호출부 호환)"""
+    return ', '.join(extract_ingredient_tokens_from_ocr(full_text).surfaces)
+
+# 카테고리별 제품 × 6키워드 행렬 캐시 (사전 버전이 바뀌면 키가 달라져 자연 무효화)
+_CATEGORY_MATRIX_CACHE = TTLCache(maxsize=64, ttl=600)
+
+def _load_category_rows(category: str, db: Session):
+    # 1) 카테고리 느슨 매칭 + p_ingredients 공란 제거 (카테고리 전체)
     rows = db.query(
-        ProductData.product_name, ProductData.category, ProductData.p_ingredients
+        ProductData.pid, ProductData.product_name, ProductData.category, ProductData.p_ingredients
     ).filter(
         func.length(func.trim(ProductData.p_ingredients)) > 0,
         ProductData.category.ilike(category)
-    ).params(cat=category).limit(500).all()
+    ).all()
 
     if not rows:
         like_key = f"%{category.strip()}%"
         rows = db.query(
-            ProductData.product_name, ProductData.category, ProductData.p_ingredients
+            ProductData.pid, ProductData.product_name, ProductData.category, ProductData.p_ingredients
         ).filter(
             func.length(func.trim(ProductData.p_ingredients)) > 0,
             ProductData.category.like(like_key)
-        ).limit(500).all()
-
-    items = []
-    for name, cat, ing_str in rows:
-        # 재사용: 기존 점수 계산 로직
-        matched_details, matched_stats, unmatched, _ = match_ingredients(ing_str, db)
-        total_keyword_hits = len(matched_details)
-        reliability = classify_reliability(total_keyword_hits)
-        ratios = calculate_keyword_ratios(matched_stats, total_keyword_hits)
-
-        weights = db.query(BaumannWeights).filter(
-            BaumannWeights.skin_type == skin_type
         ).all()
-        if not weights:
-            continue
-
-        user_weights_dict = {
-            w.keyword: {"importance": w.importance, "target_range": [w.target_min, w.target_max]}
-            for w in weights
-        }
-
-        final_score, breakdown = calculate_score_final(ratios, user_weights_dict)
-        score_before = final_score
-
-        # === 점수 소프트 캡 적용 (히트/신뢰도 기반) ===
-        final_score = apply_soft_caps_by_hits(final_score, total_keyword_hits, reliability)
+    # 2) 사전 토큰화된 성분으로 교체 (행렬 구성 시 문자열 재분할 없음)
+    return [(name, cat, get_product_tokens(pid, ing_str)) for pid, name, cat, ing_str in rows]
+
+def get_category_matrix(category: str, db: Session) -> ProductScoreMatrix:
+    snap = get_snapshot()
+    key = (category, snap.version)
+    return _CATEGORY_MATRIX_CACHE.get_or_set(
+        key, lambda: ProductScoreMatrix(_load_category_rows(category, db), snap)
+    )
 
-        # 사용자 주의 감점
-        ingredients_list = [s.strip().strip('"') for s in ing_str.split(',') if s.strip()]
-        user_cautions = query_user_caution_ingredients(user_id, ingredients_list, db)
-        if user_cautions:
-            final_score = max(0, final_score - 40)
+def _top_products_from_table(category: str, skin_type: str, caution_names: List[str],
+                             limit: int, db: Session):
+    """
+    product_baumann_scores 인덱스 ORDER BY 로 상위 제품 조회 + 사용자 주의 감점만 요청 시 적용.
+    감점으로 순위가 바뀔 수 있으므로, 남은 행의 최고점(현재 페이지 최저점) 이상인
+    보정 점수가 limit개 모일 때까지 페이지를 더 읽는다.
+    테이블을 쓸 수 없거나 현재 사전/제품 버전으로 갱신되지 않았으면 None
+    """
+    page_size = max(limit * 3, 20) if caution_names else limit
+    for like in (False, True):
+        collected = []
+        offset = 0
+        while True:
+            page = fetch_top_scores(category, skin_type, page_size, offset, db,
+                                    with_ingredients=bool(caution_names), like=like)
+            if page is None:
+                return None
+            for r in page:
+                cautions = []
+                if caution_names:
+                    tokens = get_product_tokens(r["pid"], r.get("p_ingredients"))
+                    cautions = match_user_cautions(caution_names, tokens.norm_set())
+                adjusted = max(0, r["final_score"] - 40) if cautions else r["final_score"]
+                collected.append((adjusted, r, cautions))
+            if len(page) < page_size:
+                break
+            floor = page[-1]["final_score"]
+            if sum(1 for c in collected if c[0] >= floor) >= limit:
+                break
+            offset += page_size
+        if collected:
+            break
+    if not collected:
+        return None
+
+    collected.sort(key=lambda c: -c[0])
+    return [{
+        "product_name": r["product_name"],
+        "category": r["category"],
+        "final_score": adjusted,
+        "score_before": r["score_before"],
+        "has_user_caution": bool(cautions),
+        "user_caution": [{"korean_name": n} for n in cautions],
+        "matched_count": r["matched_count"],
+        "total_keyword_hits": r["total_keyword_hits"],
+        "reliability": r["reliability"]
+    } for adjusted, r, cautions in collected[:limit]]
 
-        # very_low(히트 0)은 제외, 1~2는 남겨서 ‘저신뢰’로 표기
-        if reliability == "very_low" and total_keyword_hits == 0:
-            continue
+@router.get("/api/top-products")
+def top_products_api(
+    category: str,
+    skin_type: str,
+    user_id: int | None = None,
+    limit: int = 4,
+    db: Session = Depends(get_db)
+):
+    limit = max(1, min(limit, 20))
+    caution_names = load_user_caution_names(user_id, db)
+
+    # 1) 물리화 점수 테이블 (인덱스 ORDER BY)
+    items = _top_products_from_table(category, skin_type, caution_names, limit, db)
+    if items is not None:
+        return {"items": items}
+
+    # 2) 테이블이 없거나 비어 있으면 실시간 벡터화 계산
+    user_weights_dict = get_user_weights(skin_type)
+    if not user_weights_dict:
+        return {"items": []}
+
+    # 카테고리 전체를 한 번에 벡터화 채점 (가중치 1회, 사용자 주의 성분 1회 조회)
+    matrix = get_category_matrix(category, db)
+    if len(matrix) == 0:
+        return {"items": []}
+    compiled = compile_weights(user_weights_dict, skin_type)
+    score_before, final_score = (a[:, 0] for a in matrix.score(compiled))
+
+    user_cautions = [match_user_cautions(caution_names, toks) for toks in matrix.norm_tokens]
+    penalty = np.array([40 if c else 0 for c in user_cautions], dtype=np.int64)
+    final_score = np.maximum(final_score - penalty, 0)
+
+    # very_low(히트 0)은 제외, 1~2는 남겨서 ‘저신뢰’로 표기
+    keep = matrix.hits > 0
+    # 점수 내림차순 상위 N개 (동점은 기존 조회 순서 유지)
+    order = [i for i in np.argsort(-final_score, kind="stable") if keep[i]]
 
+    items = []
+    for i in order[:limit]:
         items.append({
-            "product_name": name,
-            "category": cat,
-            "final_score": max(final_score, 0),
-            "score_before": score_before,
-            "has_user_caution": bool(user_cautions),
-            "user_caution": [{"korean_name": n} for n in user_cautions],
-            "matched_count": len(set(sum(matched_stats.values(), []))),
-            "total_keyword_hits": total_keyword_hits,
-            "reliability": reliability
+            "product_name": matrix.names[i],
+            "category": matrix.categories[i],
+            "final_score": int(final_score[i]),
+            "score_before": int(score_before[i]),
+            "has_user_caution": bool(user_cautions[i]),
+            "user_caution": [{"korean_name": n} for n in user_cautions[i]],
+            "matched_count": int(matrix.matched_count[i]),
+            "total_keyword_hits": int(matrix.hits[i]),
+            "reliability": reliability_label(matrix.reliability[i])
         })
 
-    # 점수 내림차순 상위 N개
-    items.sort(key=lambda x: x["final_score"], reverse=True)
-    return {"items": items[:max(1, min(limit, 20))]}
+    return {"items": items}
 
 @router.post("/api/analyze-ocr")
 async def analyze_ocr_image(
     file: UploadFile = File(...),
     skin_type: str = Form(...),
-    user_id: int | None = Form(None),
-    db: Session = Depends(get_db)
+    user_id: int | None = Form(None)
 ):
     """[신규] 이미지 OCR을 통한 제품 분석 (주의 성분 + 사용자 주의 감점)"""
+    content = await read_upload(file)
+    # Vision 호출 + DB 조회는 OCR 전용 실행기에서 (이벤트 루프 차단 방지)
+    return await run_ocr(_analyze_ocr_job, content, skin_type, user_id,
+                         getattr(file, 'filename', 'N/A'))
+
+def _analyze_ocr_job(content: bytes | memoryview, skin_type: str, user_id: int | None, filename: str = 'N/A'):
+    """
+    OCR 실행기 스레드용 래퍼: 세션을 작업 안에서 열고 닫는다.
+    (시간 초과로 요청이 먼저 끝나도 요청 세션을 닫힌 뒤에 쓰지 않도록)
+    """
+    db = SessionLocal()
+    try:
+        return analyze_ocr_content(content, skin_type, user_id, db, filename)
+    finally:
+        db.close()
+
+def analyze_ocr_content(content: bytes | memoryview, skin_type: str, user_id: int | None, db: Session, filename: str = 'N/A'):
+    """/api/analyze-ocr 본문 (동기, OCR 실행기 스레드에서 실행)"""
     try:
-        content = await file.read()
-        full_text = extract_text_from_image_bytes(content)
+        layout = extract_ocr_layout_from_image_bytes(content)
+        full_text = layout.text if layout else ""
 
         if not full_text or len(full_text.strip()) < 10:
             raise HTTPException(status_code=400, detail="이미지에서 텍스트를 찾을 수 없습니다.")
 
         print(f"[DEBUG] OCR 전체 텍스트 길이: {len(full_text)} 문자")
 
-        ingredients_str = extract_ingredients_from_ocr_with_db(full_text, db)
+        # 레이아웃으로 전성분 영역만 골라 스캔 (광고 문구/사용법/주의사항 제외)
+        ingredient_text = ingredient_block_text(layout)
+        if ingredient_text:
+            print(f"[DEBUG] 전성분 영역: {len(ingredient_text)} / {len(full_text)} 문자")
 
-        if not ingredients_str:
-            raise HTTPException(status_code=400, detail="이미지에서 화장품 성분을 찾을 수 없습니다.")
+        # 토큰 추출 + 사전 조회를 한 번에 (이후 집계는 레코드만 사용)
+        records = extract_ocr_matches(ingredient_text or full_text)
+        if not records and ingredient_text:
+            # 영역 추정이 빗나간 경우 전체 텍스트로 한 번 더
+            records = extract_ocr_matches(full_text)
 
-        print(f"[DEBUG] 추출된 성분: {ingredients_str[:100]}...")
+        if not records:
+            raise HTTPException(status_code=400, detail="이미지에서 화장품 성분을 찾을 수 없습니다.")
 
-        # 키워드/목적 매칭
-        matched_details, matched_stats, unmatched, total_count = match_ingredients(
-            ingredients_str, db
-        )
+        print(f"[DEBUG] 추출된 성분: {', '.join(r.surface for r in records)[:100]}...")
 
-        # ✅ OCR도 '검증된 원문' 사용
-        all_matched_ingredients = match_all_ingredients(ingredients_str, db)
-        actual_total_count = len(all_matched_ingredients)
+        # 키워드/목적 매칭 + ✅ OCR도 '검증된 원문' 사용 + 시스템 주의 성분
+        summary = summarize_matches(records)
+        matched_stats = summary["matched_stats"]
+        actual_total_count = len(summary["verified"])
 
-        total_keyword_hits = len(matched_details)
+        total_keyword_hits = summary["total_keyword_hits"]
         reliability = classify_reliability(total_keyword_hits)
         if reliability == "low":
-            print(f"[WARN] low reliability (ocr): hits={total_keyword_hits}, file={getattr(file,'filename', 'N/A')}")
+            print(f"[WARN] low reliability (ocr): hits={total_keyword_hits}, file={filename}")
 
         if reliability == "very_low":
             raise HTTPException(
@@ -827,29 +1337,19 @@ async def analyze_ocr_image(
 
         ratios = calculate_keyword_ratios(matched_stats, total_keyword_hits)
 
-        weights_from_db = db.query(BaumannWeights).filter(
-            BaumannWeights.skin_type == skin_type
-        ).all()
-
-        if not weights_from_db:
+        user_weights_dict = get_user_weights(skin_type)
+        if not user_weights_dict:
             raise HTTPException(status_code=404, detail="피부 타입 가중치를 찾을 수 없습니다.")
 
-        user_weights_dict = {}
-        for w in weights_from_db:
-            user_weights_dict[w.keyword] = {
-                "importance": w.importance,
-                "target_range": [w.target_min, w.target_max]
-            }
-
         final_score, breakdown = calculate_score_final(ratios, user_weights_dict)
         # === 점수 소프트 캡 적용 (히트/신뢰도 기반) ===
         final_score = apply_soft_caps_by_hits(final_score, total_keyword_hits, reliability)
 
         # ✅ 시스템 주의 성분 (검증된 원문 사용)
-        caution_ingredients = query_caution_ingredients(all_matched_ingredients, db)
+        caution_ingredients = summary["caution"]
 
         # ✅ 사용자 주의 성분(정규화 교집합, 검증된 원문 사용) 및 -40 즉시 감점
-        user_cautions = query_user_caution_ingredients(user_id, all_matched_ingredients, db)
+        user_cautions = query_user_caution_ingredients(user_id, summary["verified"], db)
         score_before = final_score
         has_user_caution = False
         warning_message = None
@@ -864,10 +1364,7 @@ async def analyze_ocr_image(
         if reliability == "low":
             analysis_texts["opinion"] = prepend_low_reliability_warning(analysis_texts["opinion"])
 
-        unique_matched_set = set()
-        for ing_list in matched_stats.values():
-            unique_matched_set.update(ing_list)
-        unique_matched_count = len(unique_matched_set)
+        unique_matched_count = summary["unique_matched_count"]
 
         return {
             "product_info": {
@@ -891,8 +1388,8 @@ async def analyze_ocr_image(
             "charts": { "ratios": ratios, "breakdown": breakdown },
             "analysis": analysis_texts,
             "ingredients": {
-                "matched": matched_details,
-                "unmatched": unmatched,
+                "matched": summary["matched_details"],
+                "unmatched": summary["unmatched"],
                 "caution": caution_ingredients  # 시스템 주의 성분
             }
         }
@@ -0,0 +1,168 @@
+# backend/routers/catalog.py
+# ============================================
+# 카테고리 / 카테고리별 제품명 카탈로그 캐시
+# - 카탈로그 버전(product_data 행 수/최대 pid/UPDATE_TIME)이 바뀔 때만 DB 재조회
+# - 제품 목록은 DB 정렬 순서(ORDER BY product_name, pid) 그대로 보관하고
+#   (product_name, pid) 커서로 키셋 페이지네이션
+# - 버전 + 요청 파라미터로 ETag 생성 (If-None-Match 일치 시 304)
+# ============================================
+
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from db import engine
+from .ttl_cache import TTLCache
+
+# 버전 확인 최소 간격(초): 이 시간 안의 요청은 마지막 버전을 그대로 사용
+VERSION_CHECK_SEC = float(os.getenv("CATALOG_VERSION_CHECK_SEC", "30"))
+
+_version_lock = threading.Lock()
+_version: Optional[str] = None
+_version_checked_at = 0.0
+
+_CATEGORIES_CACHE = TTLCache(maxsize=4, ttl=0)
+_PRODUCTS_CACHE = TTLCache(maxsize=256, ttl=0)
+
+
+def catalog_version() -> str:
+    """product_data 변경 여부 서명 (VERSION_CHECK_SEC 간격으로만 DB 확인)"""
+    global _version, _version_checked_at
+    now = time.time()
+    if _version is not None and now - _version_checked_at < VERSION_CHECK_SEC:
+        return _version
+    with _version_lock:
+        if _version is not None and time.time() - _version_checked_at < VERSION_CHECK_SEC:
+            return _version
+        with engine.connect() as conn:
+            row = conn.execute(text("SELECT COUNT(*), MAX(pid) FROM product_data")).fetchone()
+            parts = [f"product_data:{row[0]}:{row[1]}"]
+            try:
+                upd = conn.execute(text("""
+                    SELECT UPDATE_TIME FROM information_schema.TABLES
+                    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'product_data'
+                """)).scalar()
+                parts.append(f"@{upd}")
+            except Exception as e:
+                print(f"⚠️ product_data UPDATE_TIME 조회 실패(행 수 기준으로만 판별): {e}")
+        _version = hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+        _version_checked_at = time.time()
+        return _version
+
+
+def get_categories() -> Tuple[str, List[str]]:
+    """(버전, 카테고리 목록) — p_ingredients 가 있는 제품의 카테고리, DB 정렬 순서"""
+    version = catalog_version()
+
+    def _load():
+        with engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT DISTINCT category
+                FROM product_data
+                WHERE p_ingredients IS NOT NULL AND category IS NOT NULL
+                ORDER BY category
+            """)).fetchall()
+        return [r[0] for r in rows if r[0]]
+
+    return version, _CATEGORIES_CACHE.get_or_set(version, _load)
+
+
+class CategoryProducts:
+    """카테고리 하나의 (product_name, pid) 목록과 pid → 위치 색인"""
+
+    __slots__ = ("names", "pids", "position")
+
+    def __init__(self, rows):
+        self.names = [r[0] for r in rows]
+        self.pids = [r[1] for r in rows]
+        self.position: Dict[int, int] = {pid: i for i, pid in enumerate(self.pids)}
+
+    def start_after(self, cursor: Optional[Tuple[str, int]]) -> int:
+        """커서 다음 위치. 커서 pid 가 사라졌으면 이름 기준(대소문자 무시)으로 근사"""
+        if not cursor:
+            return 0
+        name, pid = cursor
+        pos = self.position.get(pid)
+        if pos is not None:
+            return pos + 1
+        key = (name or "").casefold()
+        for i, n in enumerate(self.names):
+            if (n or "").casefold() > key:
+                return i
+        return len(self.names)
+
+
+def get_category_products(category: str) -> Tuple[str, CategoryProducts]:
+    version = catalog_version()
+
+    def _load():
+        with engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT product_name, pid
+                FROM product_data
+                WHERE category = :category AND p_ingredients IS NOT NULL
+                ORDER BY product_name, pid
+            """), {"category": category}).fetchall()
+        return CategoryProducts(rows)
+
+    return version, _PRODUCTS_CACHE.get_or_set((category, version), _load)
+
+
+def page_products(products: CategoryProducts, prefix: Optional[str],
+                  cursor: Optional[Tuple[str, int]], limit: Optional[int]):
+    """
+    반환: (제품명 목록, 다음 커서 또는 None)
+    limit 이 없으면 (기존 동작처럼) 커서 이후 전체를 반환
+    """
+    start = products.start_after(cursor)
+    pfx = prefix.casefold() if prefix else None
+    names, last = [], None
+    i = start
+    n = len(products.names)
+    while i < n and (limit is None or len(names) < limit):
+        name = products.names[i]
+        if pfx is None or (name or "").casefold().startswith(pfx):
+            names.append(name)
+            last = (name, products.pids[i])
+        i += 1
+
+    if limit is None or last is None:
+        return names, None
+    # 남은 항목 중 조건을 만족하는 것이 있을 때만 다음 커서 발급
+    while i < n:
+        if pfx is None or (products.names[i] or "").casefold().startswith(pfx):
+            return names, encode_cursor(last)
+        i += 1
+    return names, None
+
+
+def encode_cursor(cursor: Tuple[str, int]) -> str:
+    raw = json.dumps([cursor[0], cursor[1]], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Tuple[str, int]]:
+    """잘못된 커서면 ValueError"""
+    if not token:
+        return None
+    padded = token + "=" * (-len(token) % 4)
+    name, pid = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+    return name, int(pid)
+
+
+def make_etag(*parts) -> str:
+    return 'W/"' + hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return "*" in tags or any((t[2:] if t.startswith("W/") else t) == bare for t in tags)
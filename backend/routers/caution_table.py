@@ -0,0 +1,216 @@
+# backend/routers/caution_table.py
+# ============================================
+# 주의 성분 사전 컴파일 테이블 (OCR 분석/요약용)
+# - caution_ingredients(공식) + ML_caution_ingredients(ML 예측)를 한 번 읽어
+#   성분별 레코드(위험 점수 0~3, 출처, 특성 플래그 6종, 등급/설명)를 배열로 보관
+# - 조회는 이름 → 행 번호 dict, 요약(평균/최대 위험도, 플래그 개수)은 numpy 집계
+# - CAUTION_TABLE_TTL_SEC 마다 다시 적재 (실패 시 호출부가 DB 조회로 대체)
+# ============================================
+
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+
+from db import engine
+from .ttl_cache import TTLCache
+
+TTL_SEC = float(os.getenv("CAUTION_TABLE_TTL_SEC", "600"))
+
+ML_WEIGHT = 0.7   # ML 예측 성분은 신뢰도 70%
+
+FLAG_KEYS = ("fragrance", "alcohol", "acid", "retinoid", "oil", "silicone")
+_FLAG_WORDS = {
+    "fragrance": ["fragrance", "향료", "퍼퓸", "리모넨", "리날룰", "제라니올", "시트로넬롤"],
+    "alcohol": ["alcohol", "에탄올"],
+    "acid": ["aha", "bha", "pha", "salicylic", "glycolic", "lactic", "mandelic", "아하", "비하", "살리실"],
+    "retinoid": ["retinol", "retinal", "비타민 a"],
+    "oil": ["oil", "오일", "essential oil", "정유"],
+    "silicone": ["siloxane", "silicone", "디메치콘", "디메티콘"],
+}
+FLAG_MESSAGES = {
+    "fragrance": "향료/에센셜오일 성분 포함",
+    "alcohol": "알코올계 성분 포함",
+    "acid": "AHA/BHA 등 각질 케어 성분 포함",
+    "retinoid": "레티노이드(비타민 A 계열) 포함",
+    "oil": "오일 성분 다수",
+    "silicone": "실리콘계 성분 포함",
+}
+
+_TABLE_CACHE = TTLCache(maxsize=1, ttl=TTL_SEC)
+
+
+def grade_to_score(g) -> float:
+    """
+    caution_grade를 0~3 점수로 정규화.
+    - 문자열 등급(주의, 비안전 등) + 숫자(0~10) 모두 대응
+    """
+    if g is None:
+        return 0.0
+
+    # 원본 문자열 정리
+    s = str(g).strip().lower()
+
+    # 흔한 포맷 제거: "등급: xxx", "예측 등급: xxx", 대괄호 등
+    for prefix in ["등급:", "예측 등급:", "grade:", "predicted:"]:
+        if s.startswith(prefix):
+            s = s[len(prefix):].strip()
+    s = s.replace("[", "").replace("]", "").strip()
+
+    # 1) 키워드 기반 분류 (부분 포함으로 판정)
+    #   - 최상위 위험 → 3.0
+    if any(k in s for k in ["고위험", "매우위험", "very high", "high risk"]):
+        return 3.0
+    if any(k in s for k in ["위험", "high"]):
+        return 3.0
+
+    #   - 중간~주의 수준 → 2.0
+    if any(k in s for k in ["비안전", "주의", "중간", "보통", "moderate", "medium"]):
+        return 2.0
+
+    #   - 낮은 위험·대체로 안전 → 0.5
+    if any(k in s for k in ["저위험", "낮음", "low", "안전"]):
+        return 0.5
+
+    # 2) 숫자 등급(예: "7", "7.5") → 0~3 스케일링
+    tmp = s.replace(".", "", 1)
+    if tmp.isdigit():
+        val = float(s)
+        return max(0.0, min(3.0, (val / 10.0) * 3.0))
+
+    # 3) 그 외는 정보 부족 → 0점
+    return 0.0
+
+
+def ingredient_flags(name: Optional[str]) -> Tuple[bool, ...]:
+    """성분명 키워드로 특성 플래그 추출 (FLAG_KEYS 순서)"""
+    n = (name or "").lower()
+    return tuple(any(k in n for k in _FLAG_WORDS[key]) for key in FLAG_KEYS)
+
+
+def _name_key(name: Optional[str]) -> str:
+    # DB IN 비교(utf8mb4_general_ci)처럼 대소문자/앞뒤 공백 무시
+    return (name or "").strip().casefold()
+
+
+class CautionTable:
+    """공식 + ML 주의 성분 레코드 배열"""
+
+    def __init__(self, official_rows, ml_rows):
+        rows = [(r[0], r[1], r[2], False) for r in official_rows] + [(r[0], r[1], r[2], True) for r in ml_rows]
+        self.names: List[str] = [r[0] for r in rows]
+        self.grades: List[Any] = [r[1] for r in rows]
+        self.descriptions: List[Optional[str]] = [r[2] for r in rows]
+        self.is_ml = np.array([r[3] for r in rows], dtype=bool)
+        self.risk = np.array([grade_to_score(r[1]) for r in rows], dtype=np.float64)
+        self.weighted_risk = np.where(self.is_ml, self.risk * ML_WEIGHT, self.risk)
+        self.flags = np.array([ingredient_flags(r[0]) for r in rows], dtype=np.int32).reshape(len(rows), len(FLAG_KEYS))
+
+        # 이름 → 행 번호들 (출처별), (출처, 이름, 등급) → 행 번호
+        self._by_name: Tuple[Dict[str, List[int]], Dict[str, List[int]]] = ({}, {})
+        self._by_record: Dict[Tuple[bool, str, Any], int] = {}
+        for i, (name, grade, _, ml) in enumerate(rows):
+            self._by_name[ml].setdefault(_name_key(name), []).append(i)
+            self._by_record.setdefault((ml, name, grade), i)
+        self.loaded_at = time.time()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _record(self, i: int) -> Dict[str, Any]:
+        return {"korean_name": self.names[i], "caution_grade": self.grades[i], "description": self.descriptions[i]}
+
+    def query(self, ingredients: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """기존 _query_caution_ingredients 와 같은 형태: 공식 일치 → 나머지 중 ML 일치"""
+        official_idx = sorted({i for ing in ingredients for i in self._by_name[False].get(_name_key(ing), ())})
+        official_keys = {_name_key(self.names[i]) for i in official_idx}
+        remain = [ing for ing in ingredients if _name_key(ing) not in official_keys]
+        ml_idx = sorted({i for ing in remain for i in self._by_name[True].get(_name_key(ing), ())})
+        return {"official": [self._record(i) for i in official_idx],
+                "ml_predicted": [self._record(i) for i in ml_idx]}
+
+    def index_of(self, record: Dict[str, Any], ml: bool) -> Optional[int]:
+        return self._by_record.get((ml, record.get("korean_name"), record.get("caution_grade")))
+
+
+def _load_table() -> CautionTable:
+    t0 = time.time()
+    with engine.connect() as conn:
+        official = conn.execute(text(
+            "SELECT korean_name, caution_grade, description FROM caution_ingredients"
+        )).fetchall()
+        try:
+            ml = conn.execute(text(
+                "SELECT korean_name, caution_grade, description FROM ML_caution_ingredients"
+            )).fetchall()
+        except Exception as e:
+            print(f"ML 주의 성분 조회 오류 (ML_caution_ingredients): {e}")
+            ml = []
+    table = CautionTable(official, ml)
+    print(f"[CAUTION_TABLE] 공식 {len(official)}개 + ML {len(ml)}개 적재 ({(time.time() - t0) * 1000:.0f}ms)")
+    return table
+
+
+def get_caution_table() -> CautionTable:
+    return _TABLE_CACHE.get_or_set("table", _load_table)
+
+
+def summarize(official: List[Dict[str, Any]], ml_predicted: List[Dict[str, Any]],
+              table: Optional[CautionTable] = None) -> Dict[str, Any]:
+    """
+    주의 성분 목록 요약: 개수, 평균/최대 위험도(ML 0.7배), 종합 위험도, 특성 플래그 개수.
+    테이블에 있는 레코드는 사전 계산값을 모아 numpy 로 집계, 없는 레코드만 즉석 계산
+    """
+    if table is None:
+        try:
+            table = get_caution_table()
+        except Exception as e:
+            print(f"⚠️ 주의 성분 테이블 사용 불가(즉석 계산): {e}")
+
+    idx: List[int] = []
+    extra_scores: List[float] = []
+    extra_flags: List[Tuple[bool, ...]] = []
+    for items, ml in ((official, False), (ml_predicted, True)):
+        for ing in items:
+            i = table.index_of(ing, ml) if table is not None else None
+            if i is not None:
+                idx.append(i)
+            else:
+                sc = grade_to_score(ing.get("caution_grade"))
+                extra_scores.append(sc * ML_WEIGHT if ml else sc)
+                extra_flags.append(ingredient_flags(ing.get("korean_name")))
+
+    if idx:
+        ia = np.asarray(idx, dtype=np.int64)
+        scores = np.concatenate((table.weighted_risk[ia], np.asarray(extra_scores, dtype=np.float64)))
+        flag_counts = table.flags[ia].sum(axis=0)
+    else:
+        scores = np.asarray(extra_scores, dtype=np.float64)
+        flag_counts = np.zeros(len(FLAG_KEYS), dtype=np.int64)
+    if extra_flags:
+        flag_counts = flag_counts + np.asarray(extra_flags, dtype=np.int64).sum(axis=0)
+
+    total_cnt = int(scores.size)
+    avg_score = float(scores.mean()) if total_cnt else 0.0
+    max_score = float(scores.max()) if total_cnt else 0.0
+
+    # 위험도 판단(평균 + 최대치 함께 고려)
+    # - max가 높으면 국소 자극 위험, avg가 높으면 전반적 리스크 증가
+    if total_cnt == 0:
+        risk_level = "낮음"
+    elif max_score >= 2.5 or avg_score >= 2.0:
+        risk_level = "높음"
+    elif max_score >= 1.5 or avg_score >= 1.0:
+        risk_level = "중간"
+    else:
+        risk_level = "낮음"
+
+    return {
+        "total_count": total_cnt,
+        "avg_score": avg_score,
+        "max_score": max_score,
+        "risk_level": risk_level,
+        "flags": {k: int(v) for k, v in zip(FLAG_KEYS, flag_counts)},
+    }
@@ -11,12 +11,21 @@ from langchain_core.runnables import (
 from .recommender_core import (
     log_event,
     analyze_with_llm,
+    aanalyze_with_llm,
     search_pipeline_from_parsed,
+    asearch_pipeline_from_parsed,
     generate_general_answer,
+    agenerate_general_answer,
     build_presented,
+    abuild_presented,
     stream_finalize_from_rag_texts,
+    run_stage,
+    LLM_TIMEOUT_SEC,
 )
 
+# 각 단계는 동기 함수 + 비동기 함수(afunc) 쌍:
+# MainChain.invoke 는 기존 동기 경로, MainChain.ainvoke 는 비동기 경로(단계별 제한 시간 적용)
+
 
 # ─────────────────────────────────────────────────────
 # 1) 입력 래핑 + 파서 체인
@@ -38,7 +47,22 @@ def _parse_query(state: Dict[str, Any]) -> Dict[str, Any]:
     return {**state, **analyzed}
 
 
-ParseQueryChain: RunnableSequence = RunnableLambda(_wrap_input) | RunnableLambda(_parse_query)
+async def _awrap_input(user_query: str) -> Dict[str, Any]:
+    return _wrap_input(user_query)
+
+
+async def _aparse_query(state: Dict[str, Any]) -> Dict[str, Any]:
+    q = state["user_query"]
+    analyzed = await run_stage("analyze", aanalyze_with_llm(q), LLM_TIMEOUT_SEC)
+
+    log_event("intent_decided_by_chain", intent=analyzed["intent"], parsed=analyzed["parsed"])
+    return {**state, **analyzed}
+
+
+ParseQueryChain: RunnableSequence = (
+    RunnableLambda(_wrap_input, afunc=_awrap_input)
+    | RunnableLambda(_parse_query, afunc=_aparse_query)
+)
 
 
 # ─────────────────────────────────────────────────────
@@ -54,7 +78,15 @@ def _routing_retrieval(state: Dict[str, Any]) -> Dict[str, Any]:
 
     out = search_pipeline_from_parsed(parsed, q)
     # out: { "parsed": parsed, "normalized": {...}, "results": rows, "message": ... }
+    return _with_search_result(state, out)
+
 
+async def _arouting_retrieval(state: Dict[str, Any]) -> Dict[str, Any]:
+    out = await asearch_pipeline_from_parsed(state["parsed"], state["user_query"])
+    return _with_search_result(state, out)
+
+
+def _with_search_result(state: Dict[str, Any], out: Dict[str, Any]) -> Dict[str, Any]:
     return {
         **state,
         "normalized": out.get("normalized"),
@@ -63,7 +95,7 @@ def _routing_retrieval(state: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-RoutingChain = RunnableLambda(_routing_retrieval)
+RoutingChain = RunnableLambda(_routing_retrieval, afunc=_arouting_retrieval)
 
 
 def _build_presented_chain(state: Dict[str, Any]) -> Dict[str, Any]:
@@ -79,7 +111,15 @@ def _build_presented_chain(state: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-BuildPresentedChain = RunnableLambda(_build_presented_chain)
+async def _abuild_presented_chain(state: Dict[str, Any]) -> Dict[str, Any]:
+    presented = await abuild_presented(state.get("results") or [])
+    return {
+        **state,
+        "presented": presented,
+    }
+
+
+BuildPresentedChain = RunnableLambda(_build_presented_chain, afunc=_abuild_presented_chain)
 
 # PRODUCT_FIND 용 검색 + 카드 빌드 전체
 RetrievalChain: RunnableSequence = RoutingChain | BuildPresentedChain
@@ -95,7 +135,15 @@ def _general_answer_chain(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     q = state["user_query"]
     txt = generate_general_answer(q)
+    return _with_general_answer(state, txt)
+
+
+async def _ageneral_answer_chain(state: Dict[str, Any]) -> Dict[str, Any]:
+    txt = await run_stage("general_answer", agenerate_general_answer(state["user_query"]), LLM_TIMEOUT_SEC)
+    return _with_general_answer(state, txt)
 
+
+def _with_general_answer(state: Dict[str, Any], txt: str) -> Dict[str, Any]:
     return {
         **state,
         "text": (txt or "").strip(),
@@ -106,7 +154,7 @@ def _general_answer_chain(state: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-GeneralAnswerChain = RunnableLambda(_general_answer_chain)
+GeneralAnswerChain = RunnableLambda(_general_answer_chain, afunc=_ageneral_answer_chain)
 
 
 # ─────────────────────────────────────────────────────
@@ -127,7 +175,16 @@ def _intent_branch(state: Dict[str, Any]) -> Dict[str, Any]:
         return RetrievalChain.invoke(state)
 
 
-IntentBranch = RunnableLambda(_intent_branch)
+async def _aintent_branch(state: Dict[str, Any]) -> Dict[str, Any]:
+    intent = (state.get("intent") or "GENERAL").upper()
+
+    if intent == "GENERAL":
+        return await GeneralAnswerChain.ainvoke(state)
+    else:
+        return await RetrievalChain.ainvoke(state)
+
+
+IntentBranch = RunnableLambda(_intent_branch, afunc=_aintent_branch)
 
 
 # 최종 MainChain: 입력(str) → 래핑+파싱 → intent 브랜칭
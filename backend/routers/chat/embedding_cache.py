@@ -0,0 +1,255 @@
+# backend/routers/chat/embedding_cache.py
+# ============================================
+# 질의 임베딩 2단 캐시 (브랜드/성분명/특징 문장 임베딩 재사용)
+# - 키: (임베딩 모델명, 정규화 텍스트[NFKC, 연속 공백 1칸, 앞뒤 공백 제거]) 의 SHA-256
+# - 1차: 프로세스 메모리 LRU (float32 배열, EMBED_CACHE_SIZE 개)
+# - 2차: sqlite 디스크 (float32 BLOB, EMBED_CACHE_DISK_MAX 행, 워커 재시작 후에도 유지)
+# 적중 시 OpenAI 임베딩 호출(150~400ms)을 건너뛴다
+# ============================================
+
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Awaitable, Callable, List, Optional, Sequence
+
+import numpy as np
+
+from ..ttl_cache import TTLCache
+
+MEM_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "2048"))
+DISK_MAX_ROWS = int(os.getenv("EMBED_CACHE_DISK_MAX", "20000"))
+DISK_PATH = os.getenv(
+    "EMBED_CACHE_DB",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        ".cache", "embeddings.sqlite3"
+    )
+)
+_PRUNE_EVERY = 200   # 디스크 행 수 확인 주기 (저장 횟수)
+
+# 비동기 경로의 sqlite 조회/저장 전용 풀 (기본 스레드풀을 쓰지 않도록 상한을 따로 둔다)
+IO_CONCURRENCY = max(1, int(os.getenv("EMBED_CACHE_IO_CONCURRENCY", "2")))
+_IO_POOL = ThreadPoolExecutor(max_workers=IO_CONCURRENCY, thread_name_prefix="embed-cache")
+_PENDING_WRITES: set = set()   # 기다리지 않는 디스크 저장 작업 (완료 시 제거)
+_PENDING_LOCK = threading.Lock()
+
+_MEM = TTLCache(maxsize=MEM_SIZE, ttl=0)
+_DISK_LOCK = threading.Lock()
+_disk_ready = False
+_disk_disabled = False
+
+_stats_lock = threading.Lock()
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "puts": 0}
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_text(text_: Optional[str]) -> str:
+    return _WS_RE.sub(" ", unicodedata.normalize("NFKC", text_ or "")).strip()
+
+
+def cache_key(model: str, norm_text: str) -> str:
+    return hashlib.sha256(f"{model}\x00{norm_text}".encode("utf-8")).hexdigest()
+
+
+def _count(name: str, n: int = 1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+# ============================================
+# 디스크 계층 (sqlite)
+# ============================================
+def _connect() -> Optional[sqlite3.Connection]:
+    global _disk_ready, _disk_disabled
+    if _disk_disabled:
+        return None
+    try:
+        if not _disk_ready:
+            os.makedirs(os.path.dirname(DISK_PATH), exist_ok=True)
+        conn = sqlite3.connect(DISK_PATH, timeout=5)
+        if not _disk_ready:
+            with _DISK_LOCK:
+                if not _disk_ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS embeddings (
+                            key TEXT PRIMARY KEY,
+                            model TEXT NOT NULL,
+                            text TEXT NOT NULL,
+                            dim INTEGER NOT NULL,
+                            vec BLOB NOT NULL,
+                            created_at REAL NOT NULL
+                        )
+                    """)
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_created ON embeddings (created_at)")
+                    conn.commit()
+                    _disk_ready = True
+        return conn
+    except Exception as e:
+        print(f"⚠️ 임베딩 디스크 캐시 사용 불가(메모리 캐시만 사용): {e}")
+        _disk_disabled = True
+        return None
+
+
+def _disk_get_many(keys: Sequence[str]) -> dict:
+    conn = _connect()
+    if conn is None or not keys:
+        return {}
+    try:
+        ph = ",".join("?" * len(keys))
+        rows = conn.execute(f"SELECT key, dim, vec FROM embeddings WHERE key IN ({ph})", list(keys)).fetchall()
+    except Exception as e:
+        print(f"⚠️ 임베딩 디스크 캐시 조회 실패: {e}")
+        return {}
+    finally:
+        conn.close()
+    out = {}
+    for key, dim, blob in rows:
+        vec = np.frombuffer(blob, dtype=np.float32)
+        if vec.size == dim:
+            out[key] = vec
+    return out
+
+
+def _disk_put_many(items: Sequence[tuple]):
+    """items: (key, model, text, vec)"""
+    conn = _connect()
+    if conn is None or not items:
+        return
+    try:
+        now = time.time()
+        conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, model, text, dim, vec, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            [(k, m, t, int(v.size), v.tobytes(), now) for k, m, t, v in items]
+        )
+        with _stats_lock:
+            before = _stats["puts"]
+            _stats["puts"] += len(items)
+            check = before // _PRUNE_EVERY != _stats["puts"] // _PRUNE_EVERY
+        if check:
+            # 행 수 상한: 오래된 항목부터 정리
+            (count,) = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            if count > DISK_MAX_ROWS:
+                conn.execute("""
+                    DELETE FROM embeddings WHERE rowid IN (
+                        SELECT rowid FROM embeddings ORDER BY created_at ASC LIMIT ?
+                    )
+                """, (count - DISK_MAX_ROWS,))
+        conn.commit()
+    except Exception as e:
+        print(f"⚠️ 임베딩 디스크 캐시 저장 실패: {e}")
+    finally:
+        conn.close()
+
+
+# ============================================
+# 공개 API
+# ============================================
+def _write_done(future: Future):
+    with _PENDING_LOCK:
+        _PENDING_WRITES.discard(future)
+    if not future.cancelled() and future.exception() is not None:
+        print(f"⚠️ 임베딩 디스크 캐시 저장 작업 실패: {future.exception()}")
+
+
+def _put_in_background(fresh: List[tuple]):
+    """디스크 저장을 _IO_POOL 로 넘기고 기다리지 않는다 (완료될 때까지 참조 유지, 예외는 로그)"""
+    future = _IO_POOL.submit(_disk_put_many, fresh)
+    with _PENDING_LOCK:
+        _PENDING_WRITES.add(future)
+    future.add_done_callback(_write_done)
+
+
+def _lookup_memory(texts: Sequence[str], model: str):
+    """메모리 조회. 반환: (키 목록, 키 → 정규화 텍스트, 찾은 벡터, 디스크에서 찾을 키[중복 제거])"""
+    norms = [normalize_text(t) for t in texts]
+    keys = [cache_key(model, n) for n in norms]
+    found = {}
+    for k in dict.fromkeys(keys):
+        vec = _MEM.get(k)
+        if vec is not None:
+            found[k] = vec
+    if found:
+        _count("memory_hits", sum(1 for k in keys if k in found))
+    pending = [k for k in dict.fromkeys(keys) if k not in found]
+    return keys, dict(zip(keys, norms)), found, pending
+
+
+def _merge_disk(keys: List[str], found: dict, disk: dict) -> List[str]:
+    """디스크 적중분을 메모리로 올리고, 남은 키[중복 제거] 반환"""
+    for k, vec in disk.items():
+        _MEM.set(k, vec)
+        found[k] = vec
+    if disk:
+        _count("disk_hits", sum(1 for k in keys if k in disk))
+
+    missing = [k for k in dict.fromkeys(keys) if k not in found]
+    if missing:
+        _count("misses", sum(1 for k in keys if k not in found))
+    return missing
+
+
+def _remember(missing: List[str], text_of: dict, vectors, model: str, found: dict) -> List[tuple]:
+    """새로 계산한 벡터를 메모리에 저장하고, 디스크에 쓸 (key, model, text, vec) 목록 반환"""
+    fresh = []
+    for k, v in zip(missing, vectors):
+        vec = np.asarray(v, dtype=np.float32)
+        _MEM.set(k, vec)
+        found[k] = vec
+        fresh.append((k, model, text_of[k], vec))
+    return fresh
+
+
+def get_embeddings(texts: Sequence[str], embed_many: Callable[[List[str]], List[List[float]]],
+                   model: str) -> List[np.ndarray]:
+    """
+    texts 순서대로 float32 임베딩 반환.
+    메모리 → 디스크 순으로 찾고, 남은 텍스트만 중복 제거 후 embed_many 한 번으로 계산해 두 계층에 저장
+    """
+    keys, text_of, found, pending = _lookup_memory(texts, model)
+    missing = _merge_disk(keys, found, _disk_get_many(pending) if pending else {})
+    if missing:
+        fresh = _remember(missing, text_of, embed_many([text_of[k] for k in missing]), model, found)
+        _disk_put_many(fresh)
+    return [found[k] for k in keys]
+
+
+async def aget_embeddings(texts: Sequence[str],
+                          aembed_many: Callable[[List[str]], Awaitable[List[List[float]]]],
+                          model: str) -> List[np.ndarray]:
+    """
+    get_embeddings 의 비동기 버전.
+    sqlite 조회는 _IO_POOL 에서 await 하고, 저장은 _IO_POOL 로 넘긴 뒤 기다리지 않는다
+    (메모리에는 이미 들어 있으므로 다음 요청은 메모리에서 적중)
+    """
+    keys, text_of, found, pending = _lookup_memory(texts, model)
+    disk = {}
+    if pending:
+        disk = await asyncio.get_running_loop().run_in_executor(_IO_POOL, _disk_get_many, pending)
+    missing = _merge_disk(keys, found, disk)
+    if missing:
+        fresh = _remember(missing, text_of, await aembed_many([text_of[k] for k in missing]), model, found)
+        _put_in_background(fresh)
+    return [found[k] for k in keys]
+
+
+def get_embedding(text_: str, embed_one: Callable[[str], List[float]], model: str) -> np.ndarray:
+    return get_embeddings([text_], lambda ts: [embed_one(t) for t in ts], model)[0]
+
+
+def stats() -> dict:
+    with _stats_lock:
+        s = dict(_stats)
+    total = s["memory_hits"] + s["disk_hits"] + s["misses"]
+    s["hit_rate"] = round((s["memory_hits"] + s["disk_hits"]) / total, 4) if total else 0.0
+    s["memory"] = _MEM.stats()
+    s["disk_path"] = DISK_PATH
+    s["disk_enabled"] = not _disk_disabled
+    return s
@@ -0,0 +1,228 @@
+# backend/routers/chat/entity_resolver.py
+# ============================================
+# 브랜드/성분명 로컬 해석기 (임베딩 + Pinecone 벡터 조회 전 단계)
+# - 브랜드: product_data_chain 의 brand (제품 수 많은 표기 우선)
+# - 성분: ingredients 의 id / korean_name / english_name (id 는 ingredient_name_index 와 같은 키)
+# - 순서: ① 정규화 이름 정확 일치 → ② 동의어 표 → ③ 3-gram 유사도(Dice)
+#   신뢰도(정확/동의어 1.0, 3-gram 은 Dice)가 LOCAL_MIN_CONFIDENCE 미만이거나
+#   상위 후보 둘이 근소한 차이면 None → 호출부가 기존 벡터 조회로 대체
+# - 조회는 dict / 3-gram 색인만 사용 (네트워크 I/O 없음)
+# - 주기적으로 전체 재적재 후 참조 교체 (product_name_index 와 같은 방식)
+# ============================================
+
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+
+from db import engine
+from ..trigram_index import TrigramIndex, normalize_for_ngrams
+
+REFRESH_INTERVAL_SEC = int(os.getenv("CHAT_RESOLVER_REFRESH_SEC", "600"))
+LOCAL_MIN_CONFIDENCE = float(os.getenv("CHAT_LOCAL_RESOLVE_MIN_CONF", "0.8"))
+
+AMBIGUITY_MARGIN = 0.05   # 서로 다른 값의 상위 두 후보 Dice 차이가 이 이하면 모호
+MIN_TRIGRAM_LEN = 4       # 정규화 길이가 이보다 짧으면 3-gram 유사도는 쓰지 않음
+
+# 동의어 묶음: 묶음 안의 어느 표기로 들어와도 나머지 표기 중 테이블에 있는 이름으로 해석
+BRAND_SYNONYMS: Sequence[Tuple[str, ...]] = (
+    ("라네즈", "laneige"),
+    ("이니스프리", "innisfree"),
+    ("설화수", "sulwhasoo"),
+    ("에스트라", "aestura"),
+    ("닥터지", "dr.g", "drg"),
+    ("라로슈포제", "라로슈 포제", "la roche-posay", "laroche-posay"),
+    ("아이소이", "isoi"),
+    ("토리든", "torriden"),
+    ("라운드랩", "round lab"),
+    ("아누아", "anua"),
+    ("코스알엑스", "cosrx"),
+    ("마녀공장", "manyo", "ma:nyo"),
+    ("에뛰드", "에뛰드하우스", "etude", "etude house"),
+    ("미샤", "missha"),
+    ("클리오", "clio"),
+    ("헤라", "hera"),
+    ("아이오페", "iope"),
+    ("스킨1004", "스킨천사", "skin1004"),
+    ("구달", "goodal"),
+    ("메디힐", "mediheal"),
+)
+
+INGREDIENT_SYNONYMS: Sequence[Tuple[str, ...]] = (
+    ("나이아신아마이드", "나이아신", "비타민b3", "niacinamide"),
+    ("하이알루로닉애씨드", "히알루론산", "hyaluronic acid"),
+    ("소듐하이알루로네이트", "히알루론산나트륨", "sodium hyaluronate"),
+    ("병풀추출물", "시카", "센텔라", "cica", "centella asiatica extract"),
+    ("마데카소사이드", "마데카", "madecassoside"),
+    ("아스코빅애씨드", "비타민c", "비타민씨", "ascorbic acid"),
+    ("토코페롤", "비타민e", "tocopherol"),
+    ("살리실릭애씨드", "살리실산", "salicylic acid"),
+    ("글라이콜릭애씨드", "글리콜산", "glycolic acid"),
+    ("세라마이드엔피", "세라마이드", "ceramide np"),
+    ("판테놀", "비타민b5", "프로비타민b5", "panthenol"),
+    ("레티놀", "비타민a", "retinol"),
+    ("티트리잎오일", "티트리", "티트리오일", "tea tree leaf oil"),
+)
+
+
+class LocalMatch(NamedTuple):
+    value: Any          # 브랜드명(str) 또는 성분 id(int)
+    name: str           # 일치한 테이블 표기
+    confidence: float
+    method: str         # "exact" | "synonym" | "trigram"
+
+
+def _synonym_map(groups: Sequence[Tuple[str, ...]]) -> Dict[str, Tuple[str, ...]]:
+    """정규화 표기 → 같은 묶음의 다른 정규화 표기들"""
+    out: Dict[str, Tuple[str, ...]] = {}
+    for group in groups:
+        keys = list(dict.fromkeys(k for k in (normalize_for_ngrams(g) for g in group) if k))
+        for k in keys:
+            out[k] = out.get(k, ()) + tuple(o for o in keys if o != k)
+    return out
+
+
+_BRAND_SYNONYMS = _synonym_map(BRAND_SYNONYMS)
+_INGREDIENT_SYNONYMS = _synonym_map(INGREDIENT_SYNONYMS)
+
+
+class NameTable:
+    """(표기, 값) 목록의 정규화 이름 해시맵 + 3-gram 색인 (생성 후 불변)"""
+
+    __slots__ = ("names", "values", "exact", "index", "synonyms")
+
+    def __init__(self, entries: Iterable[Tuple[Optional[str], Any]], synonyms: Dict[str, Tuple[str, ...]]):
+        self.names: List[str] = []
+        self.values: List[Any] = []
+        self.exact: Dict[str, int] = {}
+        for name, value in entries:
+            key = normalize_for_ngrams(name)
+            if not key:
+                continue
+            self.exact.setdefault(key, len(self.names))   # 같은 정규화 이름은 먼저 온 표기 우선
+            self.names.append(name)
+            self.values.append(value)
+        self.index = TrigramIndex(enumerate(self.names))
+        self.synonyms = synonyms
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _hit(self, pos: int, confidence: float, method: str) -> LocalMatch:
+        return LocalMatch(self.values[pos], self.names[pos], confidence, method)
+
+    def match(self, query: Optional[str], min_confidence: float = LOCAL_MIN_CONFIDENCE) -> Optional[LocalMatch]:
+        key = normalize_for_ngrams(query)
+        if not key:
+            return None
+
+        # ① 정확 일치
+        pos = self.exact.get(key)
+        if pos is not None:
+            return self._hit(pos, 1.0, "exact")
+
+        # ② 동의어
+        for alias in self.synonyms.get(key, ()):
+            pos = self.exact.get(alias)
+            if pos is not None:
+                return self._hit(pos, 1.0, "synonym")
+
+        # ③ 3-gram 유사도
+        if len(key) < MIN_TRIGRAM_LEN:
+            return None
+        hits = self.index.search(key, limit=5, min_dice=min_confidence)
+        if not hits:
+            return None
+        best = hits[0]
+        for other in hits[1:]:
+            if best.dice - other.dice > AMBIGUITY_MARGIN:
+                break
+            if self.values[other.doc_id] != self.values[best.doc_id]:
+                return None
+        return self._hit(best.doc_id, best.dice, "trigram")
+
+
+class EntityResolver:
+    def __init__(self):
+        self.brands = NameTable((), _BRAND_SYNONYMS)
+        self.ingredients = NameTable((), _INGREDIENT_SYNONYMS)
+        self.loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at > 0
+
+    def refresh(self) -> Tuple[int, int]:
+        with self._lock:
+            t0 = time.time()
+            with engine.connect() as conn:
+                brand_rows = conn.execute(text("""
+                    SELECT brand FROM product_data_chain
+                    WHERE brand IS NOT NULL AND brand <> ''
+                    GROUP BY brand
+                    ORDER BY COUNT(*) DESC
+                """)).fetchall()
+                ing_rows = conn.execute(text(
+                    "SELECT id, korean_name, english_name FROM ingredients ORDER BY id"
+                )).fetchall()
+
+            brands = NameTable(((r[0], r[0]) for r in brand_rows), _BRAND_SYNONYMS)
+            # 국문 표기를 먼저 모두 넣고 영문 표기는 그 뒤에 (국문 정확 일치 우선)
+            ingredients = NameTable(
+                [(r[1], int(r[0])) for r in ing_rows] + [(r[2], int(r[0])) for r in ing_rows],
+                _INGREDIENT_SYNONYMS,
+            )
+
+            # 참조 교체로 원자적 반영
+            self.brands, self.ingredients = brands, ingredients
+            self.loaded_at = time.time()
+            print(f"[ENTITY_RESOLVER] 브랜드 {len(brands)}개, 성분 표기 {len(ingredients)}개 적재 "
+                  f"({(time.time() - t0) * 1000:.0f}ms)")
+            return len(brands), len(ingredients)
+
+    def brand(self, raw: Optional[str]) -> Optional[LocalMatch]:
+        return self.brands.match(raw) if self.loaded else None
+
+    def ingredient(self, raw: Optional[str]) -> Optional[LocalMatch]:
+        return self.ingredients.match(raw) if self.loaded else None
+
+
+_RESOLVER = EntityResolver()
+_STOP_EVENT = threading.Event()
+_REFRESH_THREAD: Optional[threading.Thread] = None
+
+
+def get_entity_resolver() -> EntityResolver:
+    return _RESOLVER
+
+
+def _refresh_loop(interval: int):
+    while not _STOP_EVENT.wait(interval):
+        try:
+            _RESOLVER.refresh()
+        except Exception as e:
+            print(f"❌ 브랜드/성분 로컬 해석기 갱신 실패(기존 테이블 유지): {e}")
+
+
+def start_background_refresh(interval: int = REFRESH_INTERVAL_SEC):
+    """서버 시작 시 1회 적재 + 주기적 재적재 스레드 기동 (적재 전에는 벡터 조회만 사용)"""
+    global _REFRESH_THREAD
+    try:
+        _RESOLVER.refresh()
+    except Exception as e:
+        print(f"❌ 브랜드/성분 로컬 해석기 초기 적재 실패(벡터 조회로 대체): {e}")
+
+    if _REFRESH_THREAD is not None and _REFRESH_THREAD.is_alive():
+        return
+    _STOP_EVENT.clear()
+    _REFRESH_THREAD = threading.Thread(
+        target=_refresh_loop, args=(interval,), name="chat-entity-resolver", daemon=True
+    )
+    _REFRESH_THREAD.start()
+
+
+def stop_background_refresh():
+    _STOP_EVENT.set()
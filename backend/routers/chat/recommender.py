@@ -11,8 +11,10 @@ from typing import Any, Dict, List
 from .recommender_core import (
     log_event,
     stream_finalize_from_rag_texts,
+    astream_finalize_from_rag_texts,
 )
 from .chat_chains import MainChain  # ✅ 네가 만든 체인 import
+from . import embedding_cache
 
 
 def run_product_core(user_query: str) -> Dict[str, Any]:
@@ -42,6 +44,22 @@ def run_product_core(user_query: str) -> Dict[str, Any]:
 
     # 1) LangChain MainChain 실행
     state = MainChain.invoke(user_query)
+    return _core_response(state, t0)
+
+
+async def arun_product_core(user_query: str) -> Dict[str, Any]:
+    """
+    run_product_core 의 비동기 버전 (MainChain.ainvoke).
+    단계별 제한 시간 초과 시 asyncio.TimeoutError 전파 → routes 에서 504
+    """
+    t0 = time.time()
+    log_event("core_start", query=user_query, mode="async")
+
+    state = await MainChain.ainvoke(user_query)
+    return _core_response(state, t0)
+
+
+def _core_response(state: Dict[str, Any], t0: float) -> Dict[str, Any]:
     intent = state.get("intent", "GENERAL")
 
     # ---------------------------
@@ -106,7 +124,12 @@ def run_product_core(user_query: str) -> Dict[str, Any]:
         ],
     )
 
-    log_event("core_done", ms=int((time.time() - t0) * 1000))
+    cache = embedding_cache.stats()
+    log_event(
+        "core_done",
+        ms=int((time.time() - t0) * 1000),
+        embed_cache={k: cache[k] for k in ("memory_hits", "disk_hits", "misses", "hit_rate")},
+    )
 
     return {
         "intent": "PRODUCT_FIND",
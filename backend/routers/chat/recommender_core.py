@@ -1,10 +1,14 @@
 # recommender_core.py
 # -*- coding: utf-8 -*-
+import asyncio
+import functools
 import json
 import re
 import time
+import os
 import unicodedata
-from typing import Any, Dict, List, Optional, Tuple, Literal
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Literal
 
 from sqlalchemy import text, bindparam  # expanding bind
 import logging
@@ -21,9 +25,14 @@ def log_event(event: str, **payload):
 
 
 # ✅ db_connector에서 필요한 객체 로드
+from ..ingredient_tokens import product_surfaces
+from . import embedding_cache
+from .entity_resolver import get_entity_resolver
+from .vector_store import open_feature_index
 from db import (
     llm,                        # ChatOpenAI (messages API 호환)
     embeddings_model,           # OpenAIEmbeddings(text-embedding-3-large)
+    EMBEDDING_MODEL,            # 임베딩 캐시 키에 포함
     engine,                     # SQLAlchemy Engine
     pinecone_client,            # Pinecone(api_key=...)
     RAG_PRODUCT_INDEX_NAME,     # "rag-product"
@@ -34,10 +43,39 @@ from db import (
 # =============================================================================
 # Pinecone 인덱스
 # =============================================================================
-feature_index         = pinecone_client.Index(RAG_PRODUCT_INDEX_NAME)
+feature_index         = open_feature_index(pinecone_client, RAG_PRODUCT_INDEX_NAME)   # FEATURE_VECTOR_BACKEND
 ingredient_name_index = pinecone_client.Index(INGREDIENT_NAME_INDEX)
 brand_name_index      = pinecone_client.Index(BRAND_NAME_INDEX)
 
+# 브랜드/성분 top-1 조회를 동시에 보내는 전용 풀 (네트워크 대기 위주)
+VECTOR_QUERY_CONCURRENCY = max(1, int(os.getenv("VECTOR_QUERY_CONCURRENCY", "8")))
+_VECTOR_POOL = ThreadPoolExecutor(max_workers=VECTOR_QUERY_CONCURRENCY, thread_name_prefix="vector-query")
+
+# DB 조회(동기 드라이버) 전용 풀: 비동기 경로에서 기본 스레드풀을 쓰지 않도록 상한을 따로 둔다
+CHAT_DB_CONCURRENCY = max(1, int(os.getenv("CHAT_DB_CONCURRENCY", "8")))
+_DB_POOL = ThreadPoolExecutor(max_workers=CHAT_DB_CONCURRENCY, thread_name_prefix="chat-db")
+
+# 비동기 파이프라인 단계별 제한 시간(초)
+LLM_TIMEOUT_SEC = float(os.getenv("CHAT_LLM_TIMEOUT_SEC", "30"))
+VECTOR_TIMEOUT_SEC = float(os.getenv("CHAT_VECTOR_TIMEOUT_SEC", "10"))
+DB_TIMEOUT_SEC = float(os.getenv("CHAT_DB_TIMEOUT_SEC", "15"))
+
+
+async def _in_pool(pool: ThreadPoolExecutor, fn, *args, **kwargs):
+    """동기 클라이언트(Pinecone/SQLAlchemy) 호출을 전용 풀에서 실행"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+
+
+async def run_stage(stage: str, aw, timeout: float):
+    """단계별 제한 시간 적용. 초과 시 로그를 남기고 asyncio.TimeoutError 를 그대로 올린다"""
+    t0 = time.time()
+    try:
+        return await asyncio.wait_for(aw, timeout)
+    except asyncio.TimeoutError:
+        log_event("stage_timeout", stage=stage, timeout_sec=timeout, ms=int((time.time() - t0) * 1000))
+        raise
+
 # =============================================================================
 # 카테고리 표준/동의어 + 엄격 탐지
 # =============================================================================
@@ -197,34 +235,39 @@ def _safe_json_extract(text: str) -> Optional[Any]:
     return None
 
 
-def analyze_with_llm(user_query: str) -> Dict[str, Any]:
-    """의도 + 파싱을 한 번에 수행하는 LLM 호출."""
+def _analyze_messages(user_query: str, retry: bool = False) -> List[Dict[str, str]]:
     prompt = _ANALYZE_TMPL.format(q=user_query)
-    resp = llm.invoke(
-        [
-            {"role": "system", "content": _ANALYZE_SYSTEM},
-            {"role": "user", "content": prompt},
-        ]
-    )
-    raw = (getattr(resp, "content", "") or "").strip()
-    data = _safe_json_extract(raw)
+    if retry:
+        prompt = ("직전 응답이 JSON 형식이 아닙니다. "
+                  "반드시 스키마에 맞는 JSON만 출력하세요.\n\n" + prompt)
+    return [
+        {"role": "system", "content": _ANALYZE_SYSTEM},
+        {"role": "user", "content": prompt},
+    ]
 
+
+def _resp_json(resp) -> Optional[Any]:
+    return _safe_json_extract((getattr(resp, "content", "") or "").strip())
+
+
+def analyze_with_llm(user_query: str) -> Dict[str, Any]:
+    """의도 + 파싱을 한 번에 수행하는 LLM 호출."""
+    data = _resp_json(llm.invoke(_analyze_messages(user_query)))
     if not isinstance(data, dict):
         # 한 번 더 재시도
-        resp2 = llm.invoke(
-            [
-                {"role": "system", "content": _ANALYZE_SYSTEM},
-                {
-                    "role": "user",
-                    "content": "직전 응답이 JSON 형식이 아닙니다. "
-                               "반드시 스키마에 맞는 JSON만 출력하세요.\n\n"
-                               + prompt,
-                },
-            ]
-        )
-        raw2 = (getattr(resp2, "content", "") or "").strip()
-        data = _safe_json_extract(raw2)
+        data = _resp_json(llm.invoke(_analyze_messages(user_query, retry=True)))
+    return _analysis_from_data(data, user_query)
+
 
+async def aanalyze_with_llm(user_query: str) -> Dict[str, Any]:
+    """analyze_with_llm 의 비동기 버전 (llm.ainvoke)"""
+    data = _resp_json(await llm.ainvoke(_analyze_messages(user_query)))
+    if not isinstance(data, dict):
+        data = _resp_json(await llm.ainvoke(_analyze_messages(user_query, retry=True)))
+    return _analysis_from_data(data, user_query)
+
+
+def _analysis_from_data(data: Optional[Any], user_query: str) -> Dict[str, Any]:
     if not isinstance(data, dict):
         data = {}
 
@@ -278,36 +321,149 @@ def analyze_with_llm(user_query: str) -> Dict[str, Any]:
 # 2) 임베딩 & 인덱스 헬퍼
 # =============================================================================
 def embed_query(text_: str) -> List[float]:
-    return embeddings_model.embed_query(text_)
+    # 같은 (모델, 정규화 텍스트)는 메모리/디스크 임베딩 캐시에서 재사용
+    return embedding_cache.get_embedding(text_, embeddings_model.embed_query, EMBEDDING_MODEL).tolist()
 
 
-def resolve_brand_name(raw: Optional[str]) -> Optional[str]:
-    if not raw:
-        return None
-    vec = embed_query(raw)
-    res = brand_name_index.query(vector=vec, top_k=1, include_metadata=True)
+def embed_texts(texts: Sequence[str]) -> List[List[float]]:
+    """여러 텍스트를 embed_documents 배치 1회로 (캐시 적중분 제외)"""
+    if not texts:
+        return []
+    vecs = embedding_cache.get_embeddings(texts, embeddings_model.embed_documents, EMBEDDING_MODEL)
+    return [v.tolist() for v in vecs]
+
+
+async def aembed_texts(texts: Sequence[str]) -> List[List[float]]:
+    """embed_texts 의 비동기 버전 (aembed_documents)"""
+    if not texts:
+        return []
+    vecs = await embedding_cache.aget_embeddings(texts, embeddings_model.aembed_documents, EMBEDDING_MODEL)
+    return [v.tolist() for v in vecs]
+
+
+def _brand_from_res(res) -> Optional[str]:
     if not res.get("matches"):
         return None
     return (res["matches"][0].get("metadata") or {}).get("brand")
 
 
+def _ingredient_id_from_res(res) -> Optional[int]:
+    if not res.get("matches"):
+        return None
+    return int(res["matches"][0]["id"])
+
+
+class _EntityPlan(NamedTuple):
+    """로컬 해석 결과 + 벡터 조회가 필요한 나머지"""
+    brand: Optional[str]            # 로컬에서 해석된 브랜드
+    ids: List[Optional[int]]        # 토큰별 성분 id (None: 벡터 조회 대상)
+    vector_brand: Optional[str]     # 벡터 조회할 브랜드 원문
+    vector_tokens: List[str]        # 벡터 조회할 성분 토큰 (ids 의 None 순서대로)
+
+    @property
+    def vector_texts(self) -> List[str]:
+        return ([self.vector_brand] if self.vector_brand else []) + self.vector_tokens
+
+
+def _plan_entities(brand_raw: Optional[str], tokens: List[str]) -> _EntityPlan:
+    """로컬 해석기(정확 일치 → 동의어 → 3-gram)로 먼저 풀고, 신뢰도 미달만 벡터 조회로 남긴다"""
+    resolver = get_entity_resolver()
+    brand_hit = resolver.brand(brand_raw) if brand_raw else None
+    ing_hits = [resolver.ingredient(t) for t in tokens]
+    plan = _EntityPlan(
+        brand=brand_hit.value if brand_hit else None,
+        ids=[h.value if h else None for h in ing_hits],
+        vector_brand=brand_raw if brand_raw and brand_hit is None else None,
+        vector_tokens=[t for t, h in zip(tokens, ing_hits) if h is None],
+    )
+    if brand_raw or tokens:
+        log_event(
+            "entity_resolution",
+            local={
+                "brand": [brand_raw, brand_hit.name, brand_hit.method, round(brand_hit.confidence, 3)]
+                if brand_hit else None,
+                "ingredients": [[t, h.name, h.method, round(h.confidence, 3)] for t, h in zip(tokens, ing_hits) if h],
+            },
+            vector=plan.vector_texts,
+        )
+    return plan
+
+
+def _finish_entities(plan: _EntityPlan, results: Sequence[Any]) -> Tuple[Optional[str], List[int]]:
+    """벡터 조회 결과(브랜드 → 성분 순)를 로컬 결과에 채워 (브랜드명, 성분 id 목록[순서 유지, 중복 제거])"""
+    results = list(results)
+    brand = plan.brand
+    if plan.vector_brand:
+        brand = _brand_from_res(results.pop(0))
+    vector_ids = iter(_ingredient_id_from_res(r) for r in results)
+    ids = [i if i is not None else next(vector_ids) for i in plan.ids]
+    return brand, list(dict.fromkeys(i for i in ids if i is not None))
+
+
+def resolve_entities(
+    brand_raw: Optional[str],
+    ingredient_tokens: Optional[List[str]],
+    prefetch: Sequence[str] = (),
+) -> Tuple[Optional[str], List[int]]:
+    """
+    로컬 해석기로 먼저 풀고, 남은 브랜드 + 성분 토큰만 임베딩 배치 1회로 만든 뒤 top-1 조회를 동시에 실행.
+    prefetch 텍스트(예: 특징 문장)도 같은 배치로 임베딩해 캐시에 올려 둔다.
+    반환: (브랜드명, 성분 id 목록[순서 유지, 중복 제거])
+    """
+    tokens = [t for t in (ingredient_tokens or []) if t]
+    plan = _plan_entities(brand_raw, tokens)
+    texts = plan.vector_texts
+    if not texts:
+        return _finish_entities(plan, [])
+    vecs = embed_texts(texts + [t for t in prefetch if t])
+
+    futures = []
+    if plan.vector_brand:
+        futures.append(_VECTOR_POOL.submit(
+            brand_name_index.query, vector=vecs[0], top_k=1, include_metadata=True
+        ))
+    offset = len(futures)
+    futures += [
+        _VECTOR_POOL.submit(ingredient_name_index.query, vector=vecs[offset + i], top_k=1, include_metadata=False)
+        for i in range(len(plan.vector_tokens))
+    ]
+    return _finish_entities(plan, [f.result() for f in futures])
+
+
+async def aresolve_entities(
+    brand_raw: Optional[str],
+    ingredient_tokens: Optional[List[str]],
+    prefetch: Sequence[str] = (),
+    plan: Optional[_EntityPlan] = None,
+) -> Tuple[Optional[str], List[int]]:
+    """resolve_entities 의 비동기 버전 (Pinecone 동기 SDK 는 _VECTOR_POOL 에서 동시 실행)"""
+    if plan is None:
+        plan = _plan_entities(brand_raw, [t for t in (ingredient_tokens or []) if t])
+    texts = plan.vector_texts
+    if not texts:
+        return _finish_entities(plan, [])
+    vecs = await aembed_texts(texts + [t for t in prefetch if t])
+
+    queries = []
+    if plan.vector_brand:
+        queries.append(_in_pool(_VECTOR_POOL, brand_name_index.query, vector=vecs[0], top_k=1, include_metadata=True))
+    offset = len(queries)
+    queries += [
+        _in_pool(_VECTOR_POOL, ingredient_name_index.query, vector=vecs[offset + i], top_k=1, include_metadata=False)
+        for i in range(len(plan.vector_tokens))
+    ]
+    return _finish_entities(plan, await asyncio.gather(*queries))
+
+
+def resolve_brand_name(raw: Optional[str]) -> Optional[str]:
+    return resolve_entities(raw, None)[0]
+
+
 def resolve_ingredient_ids(tokens: Optional[List[str]]) -> List[int]:
-    if not tokens:
-        return []
-    out: List[int] = []
-    for t in tokens:
-        vec = embed_query(t)
-        res = ingredient_name_index.query(vector=vec, top_k=1, include_metadata=False)
-        if res.get("matches"):
-            out.append(int(res["matches"][0]["id"]))
-    return list(dict.fromkeys(out))
+    return resolve_entities(None, tokens)[1]
 
 
-def feature_candidates_from_text(
-    text_for_search: str, top_k: int = 300
-) -> Tuple[List[int], Dict[int, float]]:
-    vec = embed_query(text_for_search)
-    res = feature_index.query(vector=vec, top_k=top_k, include_metadata=False)
+def _feature_hits(res) -> Tuple[List[int], Dict[int, float]]:
     pids, scores = [], {}
     for m in (res.get("matches") or []):
         pid = int(m["id"])
@@ -316,6 +472,46 @@ def feature_candidates_from_text(
     return pids, scores
 
 
+def feature_filter(parsed: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    메타데이터 사전 필터를 지원하는 백엔드(로컬 색인)에서만 카테고리/가격 조건을 벡터 검색에 함께 건다.
+    조건은 rdb_filter 와 같아서 결과 집합은 그대로이고, top_k 안에 조건에 맞는 후보만 들어온다
+    """
+    if not getattr(feature_index, "supports_metadata_filter", False):
+        return None
+    flt: Dict[str, Any] = {}
+    if parsed.get("category"):
+        flt["category"] = {"$eq": parsed["category"]}
+    minp, maxp = parsed.get("price_range") or (None, None)
+    price = {op: v for op, v in (("$gte", minp), ("$lte", maxp)) if v is not None}
+    if price:
+        flt["price_krw"] = price
+    return flt or None
+
+
+def _feature_query_kwargs(top_k: int, metadata_filter: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {"top_k": top_k, "include_metadata": False}
+    if metadata_filter:
+        kwargs["filter"] = metadata_filter
+    return kwargs
+
+
+def feature_candidates_from_text(
+    text_for_search: str, top_k: int = 300, metadata_filter: Optional[Dict[str, Any]] = None
+) -> Tuple[List[int], Dict[int, float]]:
+    vec = embed_query(text_for_search)
+    return _feature_hits(feature_index.query(vector=vec, **_feature_query_kwargs(top_k, metadata_filter)))
+
+
+async def afeature_candidates_from_text(
+    text_for_search: str, top_k: int = 300, metadata_filter: Optional[Dict[str, Any]] = None
+) -> Tuple[List[int], Dict[int, float]]:
+    vec = (await aembed_texts([text_for_search]))[0]
+    res = await _in_pool(_VECTOR_POOL, feature_index.query, vector=vec,
+                         **_feature_query_kwargs(top_k, metadata_filter))
+    return _feature_hits(res)
+
+
 def dedup_keep_best(
     candidate_pids: List[int], score_map: Dict[int, float]
 ) -> Tuple[List[int], Dict[int, float]]:
@@ -350,6 +546,21 @@ def _normalize_ingredients(val) -> List[str]:
     return list(dict.fromkeys(items))
 
 
+_NON_COMMA_SEP = re.compile(r'[\|\;\n\/·•"\[\]]')
+
+
+def _product_ingredients(pid, val) -> List[str]:
+    """
+    사전 토큰화된 성분(product_ingredient_tokens)과 원문이 같으면 그 표기를, 아니면 문자열 파싱.
+    콤마 외 구분자/따옴표가 섞인 값은 분할 규칙이 달라 기존 파싱을 그대로 쓴다.
+    """
+    if isinstance(val, str) and not _NON_COMMA_SEP.search(val):
+        surfaces = product_surfaces(pid, val)
+        if surfaces is not None:
+            return list(dict.fromkeys(surfaces))
+    return _normalize_ingredients(val)
+
+
 def fetch_ingredient_grades(names: List[str]) -> Dict[str, Optional[str]]:
     if not names:
         return {}
@@ -443,7 +654,7 @@ def rdb_filter(
             items = []
             for r in rows:
                 d = dict(r)
-                d["ingredients"] = _normalize_ingredients(d.pop("ingredients", None))
+                d["ingredients"] = _product_ingredients(d.get("pid"), d.pop("ingredients", None))
                 items.append(d)
         return items
     except Exception as e:
@@ -471,7 +682,7 @@ def rdb_fetch_by_pids(pids: List[int], limit: int = 30) -> List[Dict]:
         items = []
         for r in rows:
             d = dict(r)
-            d["ingredients"] = _normalize_ingredients(d.pop("ingredients", None))
+            d["ingredients"] = _product_ingredients(d.get("pid"), d.pop("ingredients", None))
             items.append(d)
         by_pid = {it["pid"]: it for it in items}
         ordered = [by_pid[pid] for pid in pids if pid in by_pid]
@@ -522,34 +733,110 @@ def _price_key(v: Optional[int]) -> int:
     return v if v is not None else 10**12
 
  
+def _info_scarce_result(parsed: Dict[str, Any]) -> Dict[str, Any]:
+    log_event(
+        "info_scarce",
+        brand=parsed.get("brand"),
+        category=parsed.get("category"),
+        has_features=bool(parsed.get("features")),
+        has_ingredients=bool(parsed.get("ingredients")),
+        price_range=parsed.get("price_range"),
+    )
+    return {
+        "parsed": parsed,
+        "normalized": {
+            "brand": None,
+            "ingredient_ids": [],
+            "category": None,
+        },
+        "results": [],
+        "message": "조금만 더 구체적으로 말씀해 주세요. 예) ‘브랜드: 라네즈, 나이아신아마이드 포함’ / ‘선크림, 2만원대, 끈적임 없음’",
+    }
+
+
+def _feature_text(parsed: Dict[str, Any], user_query: str) -> str:
+    # feature 텍스트는 한 번만 구성
+    return " ".join(parsed.get("features") or []) or user_query
+
+
 def search_pipeline_from_parsed(
     parsed: Dict[str, Any], user_query: str, use_raw_for_features: bool = True
 ) -> Dict[str, Any]:
     # 1) 정보가 너무 부족한 경우 → 바로 메시지 리턴
     if is_info_scarce(parsed):
-        log_event(
-            "info_scarce",
-            brand=parsed.get("brand"),
-            category=parsed.get("category"),
-            has_features=bool(parsed.get("features")),
-            has_ingredients=bool(parsed.get("ingredients")),
-            price_range=parsed.get("price_range"),
+        return _info_scarce_result(parsed)
+
+    has_features = bool(parsed.get("features"))
+    feature_text = _feature_text(parsed, user_query)
+
+    # 브랜드/성분(+특징 문장) 임베딩 배치 1회 + 벡터 조회 동시 실행
+    brand_norm, ingredient_ids = resolve_entities(
+        parsed.get("brand"),
+        parsed.get("ingredients"),
+        prefetch=[feature_text] if has_features else (),
+    )
+    return _search_with_entities(parsed, feature_text, brand_norm, ingredient_ids)
+
+
+async def asearch_pipeline_from_parsed(parsed: Dict[str, Any], user_query: str) -> Dict[str, Any]:
+    """
+    search_pipeline_from_parsed 의 비동기 버전.
+    - 로컬 해석기로 못 푼 브랜드/성분 + 특징 문장 임베딩 배치 1회 후
+      브랜드·성분 top-1 조회와 특징 후보 검색(top_k 상한으로 미리)을 동시에 실행
+    - 강한 필터 케이스가 가능한 질의는 RDB-first 라 특징 후보 검색을 미리 하지 않는다
+    - 이후 RDB 필터/정렬은 _DB_POOL 에서 실행
+    """
+    if is_info_scarce(parsed):
+        return _info_scarce_result(parsed)
+
+    has_features = bool(parsed.get("features"))
+    feature_text = _feature_text(parsed, user_query)
+    brand_raw = parsed.get("brand")
+    tokens = [t for t in (parsed.get("ingredients") or []) if t]
+    has_price = any(parsed.get("price_range") or (None, None))
+    has_category = bool(parsed.get("category"))
+
+    maybe_strong = bool(has_features and brand_raw and tokens and has_category and has_price)
+    prefetch_features = has_features and not maybe_strong
+    # 브랜드/성분 해석이 실패하면 top_k 가 줄어들 수 있어 상한으로 받아 두고 뒤에서 자른다
+    prefetch_k = decide_top_k(True, bool(brand_raw or tokens or has_price or has_category))
+
+    # 로컬 해석기로 못 푼 브랜드/성분 + 특징 문장만 임베딩 배치 1회
+    plan = _plan_entities(brand_raw, tokens)
+    texts = plan.vector_texts + ([feature_text] if has_features else [])
+    if texts:
+        await run_stage("embed", aembed_texts(texts), VECTOR_TIMEOUT_SEC)
+
+    # 임베딩은 캐시에서 재사용 → 벡터 조회만 동시에
+    resolve = run_stage("resolve_entities", aresolve_entities(brand_raw, tokens, plan=plan), VECTOR_TIMEOUT_SEC)
+    if prefetch_features:
+        feature_search = run_stage(
+            "feature_search",
+            afeature_candidates_from_text(feature_text, top_k=prefetch_k, metadata_filter=feature_filter(parsed)),
+            VECTOR_TIMEOUT_SEC,
         )
-        return {
-            "parsed": parsed,
-            "normalized": {
-                "brand": None,
-                "ingredient_ids": [],
-                "category": None,
-            },
-            "results": [],
-            "message": "조금만 더 구체적으로 말씀해 주세요. 예) ‘브랜드: 라네즈, 나이아신아마이드 포함’ / ‘선크림, 2만원대, 끈적임 없음’",
-        }
+        (brand_norm, ingredient_ids), feature_hits = await asyncio.gather(resolve, feature_search)
+    else:
+        brand_norm, ingredient_ids = await resolve
+        feature_hits = None
+
+    return await run_stage(
+        "rdb_search",
+        _in_pool(_DB_POOL, _search_with_entities, parsed, feature_text, brand_norm, ingredient_ids, feature_hits),
+        DB_TIMEOUT_SEC,
+    )
 
-    brand_norm = resolve_brand_name(parsed.get("brand"))
-    ingredient_ids = resolve_ingredient_ids(parsed.get("ingredients"))
 
+def _search_with_entities(
+    parsed: Dict[str, Any],
+    feature_text: str,
+    brand_norm: Optional[str],
+    ingredient_ids: List[int],
+    feature_hits: Optional[Tuple[List[int], Dict[int, float]]] = None,
+) -> Dict[str, Any]:
+    """브랜드/성분 해석 이후 단계 (feature_hits: 미리 받아 둔 특징 후보, 점수순)"""
     has_features = bool(parsed.get("features"))
+
     pr = parsed.get("price_range") or (None, None)
     has_price = any(pr)
     has_category = bool(parsed.get("category"))
@@ -570,9 +857,6 @@ def search_pipeline_from_parsed(
     rows: List[Dict] = []
     score_map: Dict[int, float] = {}
 
-    # feature 텍스트는 한 번만 구성
-    feature_text = " ".join(parsed.get("features") or []) or user_query
-
     # 2-A) ✅ 강한 필터 케이스 → RDB-first → Vector-second
     if use_rdb_first_strong:
         # 1) 먼저 RDB에서 구조적 필터 전부 적용해서 후보군 확보
@@ -655,9 +939,12 @@ def search_pipeline_from_parsed(
  
     # 2-B) feature 기반 검색이 있는 경우 (기존 vector-first + RDB 필터)
     if has_features and not use_rdb_first_strong:
-        candidate_pids_raw, score_map_raw = feature_candidates_from_text(
-            feature_text, top_k=top_k
-        )
+        if feature_hits is not None:
+            candidate_pids_raw, score_map_raw = feature_hits[0][:top_k], feature_hits[1]
+        else:
+            candidate_pids_raw, score_map_raw = feature_candidates_from_text(
+                feature_text, top_k=top_k, metadata_filter=feature_filter(parsed)
+            )
         candidate_pids, score_map = dedup_keep_best(candidate_pids_raw, score_map_raw)
 
         if has_hardfilter:
@@ -822,12 +1109,7 @@ _FINALIZE_FROM_RAG_TMPL = """
 """
 
 
-def stream_finalize_from_rag_texts(user_query: str, results: List[Dict[str, Any]]):
-    """
-    finalize_from_rag_texts의 스트리밍 버전.
-    - OpenAI(ChatOpenAI)의 .stream()을 사용해 토큰이 나오는 즉시 yield.
-    - routes.py의 /finalize 스트리밍 API에서 사용.
-    """
+def _finalize_messages(user_query: str, results: List[Dict[str, Any]]) -> List[Dict[str, str]]:
     top5 = results[:5]
     items = [
         {
@@ -843,11 +1125,20 @@ def stream_finalize_from_rag_texts(user_query: str, results: List[Dict[str, Any]
         items=json.dumps(items, ensure_ascii=False, indent=2),
     )
 
-    messages = [
+    return [
         {"role": "system", "content": _FINALIZE_FROM_RAG_SYSTEM},
         {"role": "user", "content": prompt},
     ]
 
+
+def stream_finalize_from_rag_texts(user_query: str, results: List[Dict[str, Any]]):
+    """
+    finalize_from_rag_texts의 스트리밍 버전.
+    - OpenAI(ChatOpenAI)의 .stream()을 사용해 토큰이 나오는 즉시 yield.
+    - 동기 요약(run_product_finalize, SummarizerChain)에서 사용. /finalize 는 astream 버전 사용.
+    """
+    messages = _finalize_messages(user_query, results)
+
     for chunk in llm.stream(messages):
         txt = getattr(chunk, "content", "") or ""
         # 절대 strip() 하지 말 것!! 공백/개행이 여기 다 들어있음
@@ -856,6 +1147,15 @@ def stream_finalize_from_rag_texts(user_query: str, results: List[Dict[str, Any]
         yield txt
 
 
+async def astream_finalize_from_rag_texts(user_query: str, results: List[Dict[str, Any]]):
+    """stream_finalize_from_rag_texts 의 비동기 버전 (llm.astream, 이벤트 루프를 막지 않음)"""
+    async for chunk in llm.astream(_finalize_messages(user_query, results)):
+        txt = getattr(chunk, "content", "") or ""
+        if not txt:
+            continue
+        yield txt
+
+
 # =============================================================================
 # 6) 일반 질의용
 # =============================================================================
@@ -874,13 +1174,20 @@ _GENERAL_TMPL = """
 """
 
 
+def _general_messages(user_query: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": _GENERAL_SYSTEM},
+        {"role": "user", "content": _GENERAL_TMPL.format(q=user_query)},
+    ]
+
+
 def generate_general_answer(user_query: str) -> str:
-    resp = llm.invoke(
-        [
-            {"role": "system", "content": _GENERAL_SYSTEM},
-            {"role": "user", "content": _GENERAL_TMPL.format(q=user_query)},
-        ]
-    )
+    resp = llm.invoke(_general_messages(user_query))
+    return (getattr(resp, "content", "") or "").strip()
+
+
+async def agenerate_general_answer(user_query: str) -> str:
+    resp = await llm.ainvoke(_general_messages(user_query))
     return (getattr(resp, "content", "") or "").strip()
 
 
@@ -930,3 +1237,10 @@ def build_presented(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         )
 
     return presented
+
+
+async def abuild_presented(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """build_presented 의 비동기 버전 (성분 등급 DB 조회를 _DB_POOL 에서)"""
+    if not rows:
+        return []
+    return await run_stage("build_presented", _in_pool(_DB_POOL, build_presented, rows), DB_TIMEOUT_SEC)
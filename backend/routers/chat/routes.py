@@ -11,10 +11,17 @@ from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from db import get_db 
-from .recommender import run_product_core, stream_finalize_from_rag_texts  # ✅ 엔진 엔트리 함수 2개
+from .recommender import arun_product_core, astream_finalize_from_rag_texts  # ✅ 엔진 엔트리 함수 2개 (비동기)
+from .entity_resolver import start_background_refresh as start_entity_resolver_refresh
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+
+@router.on_event("startup")
+def load_entity_resolver_on_startup():
+    """서버 시작 시 브랜드/성분 로컬 해석기 적재 + 주기적 재적재 시작"""
+    start_entity_resolver_refresh()
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Simple in-memory cache (향후 Redis 등으로 교체 가능)
 # ──────────────────────────────────────────────────────────────────────────────
@@ -68,8 +75,15 @@ class FinalizeReq(BaseModel):
 #    역할: 검색 + intent 판별 + presented 카드 + cache_key 발급 (JSON 응답)
 #    경로: POST /api/chat/recommend
 # ──────────────────────────────────────────────────────────────────────────────
+async def _run_core(q: str) -> Dict[str, Any]:
+    try:
+        return await arun_product_core(q)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="응답 시간이 초과되었습니다. 잠시 후 다시 시도해 주세요.")
+
+
 @router.post("/recommend", response_model=RecommendRes)
-def recommend(req: RecommendReq):
+async def recommend(req: RecommendReq):
     q = (req.query or "").strip()
     if not q:
         raise HTTPException(status_code=400, detail="query is required")
@@ -86,7 +100,7 @@ def recommend(req: RecommendReq):
 
     # 2) 캐시가 없으면 새로 검색 실행
     if data is None:
-        data = run_product_core(q)
+        data = await _run_core(q)
         used_key = None  # intent 보고 아래에서 결정
 
     intent = data.get("intent", "GENERAL")
@@ -146,9 +160,9 @@ async def chat_finalize(req: FinalizeReq):
     토큰 스트림으로 요약만 생성하는 API.
 
     - 먼저 cache_key 에서 rows를 찾고,
-      없으면 run_product_core(query)를 다시 돌려서 rows 확보 (fallback).
+      없으면 arun_product_core(query)를 다시 돌려서 rows 확보 (fallback).
     - rows가 없으면 간단한 안내 문구만 스트리밍.
-    - rows가 있으면 stream_finalize_from_rag_texts()를 사용해
+    - rows가 있으면 astream_finalize_from_rag_texts()를 사용해
       OpenAI 토큰이 나오는 즉시 클라이언트로 흘려보낸다.
     """
     q = (req.query or "").strip()
@@ -164,7 +178,7 @@ async def chat_finalize(req: FinalizeReq):
 
     # 2) 캐시에 rows가 없으면 검색부터 다시 수행 (fallback)
     if not rows:
-        core = run_product_core(q)
+        core = await _run_core(q)
         rows = core.get("rows") or []
 
     # 3) 그래도 rows가 없으면 요약할 게 없음 → 한 줄 안내만 스트리밍
@@ -185,13 +199,10 @@ async def chat_finalize(req: FinalizeReq):
 
     # 4) 정상 케이스: 스트리밍 요약
     async def gen():
-        # stream_finalize_from_rag_texts는 sync generator이므로
-        # async 함수 안에서 그냥 for로 돌리면 된다.
-        for chunk in stream_finalize_from_rag_texts(q, rows):
+        # llm.astream 기반 async generator → 토큰 대기 중에도 이벤트 루프를 막지 않음
+        async for chunk in astream_finalize_from_rag_texts(q, rows):
             # chunk는 문자열 일부 (토큰/델타 누적)라고 가정
             yield chunk
-            # 이벤트 루프에 제어 넘겨서 UI가 반응성 있게 느끼도록
-            await asyncio.sleep(0)
 
     return StreamingResponse(
         gen(),
@@ -0,0 +1,482 @@
+# backend/routers/chat/vector_store.py
+# ============================================
+# 제품 특징 벡터 검색 백엔드 (rag-product 대체 가능)
+# - FEATURE_VECTOR_BACKEND=pinecone(기본) | local
+# - local: 프로세스 내 IVF 색인
+#   · 제품 임베딩을 L2 정규화 후 float16(또는 행별 스케일 int8)로 저장, np.load(mmap_mode="r") 로 메모리 매핑
+#   · 구축 시 구면 k-means 로 nlist 개 군집 → 벡터를 군집 순서로 재배열해 목록별로 연속 구간 읽기
+#   · 질의: 중심점 점수 순으로 목록을 열어 내적(=코사인) 계산
+#     최소 nprobe 개, 그리고 후보가 top_k × FEATURE_INDEX_CANDIDATE_FACTOR 개가 될 때까지
+#   · 메타데이터 사전 필터: brand / category ($eq, $in), price_krw ($gte, $lte, $gt, $lt)
+#     필터가 좁아 IVF 로 훑을 행이 조건에 맞는 행보다 많아지면 조건에 맞는 행만 정확 계산
+#   · Pinecone Index 와 같은 query / fetch 응답 형태 → recommender_core 변경 없이 교체
+#
+# 실행 (backend 디렉터리에서):
+#   python -m routers.chat.vector_store build [--dtype float16|int8] [--nlist N]   # Pinecone 벡터 → 로컬 색인
+#   python -m routers.chat.vector_store bench [--queries 200] [--top-k 800] [--nprobe 16] [--factor 4 8 16]
+# ============================================
+
+import argparse
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+BACKEND = os.getenv("FEATURE_VECTOR_BACKEND", "pinecone").strip().lower()
+INDEX_DIR = os.getenv(
+    "FEATURE_INDEX_DIR",
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        ".cache", "feature_index"
+    )
+)
+DEFAULT_NPROBE = int(os.getenv("FEATURE_INDEX_NPROBE", "16"))
+# 후보 수가 top_k 의 이 배수 이상이 될 때까지 목록을 더 연다 (top_k 가 큰 질의의 recall 을 좌우)
+DEFAULT_CANDIDATE_FACTOR = float(os.getenv("FEATURE_INDEX_CANDIDATE_FACTOR", "8"))
+
+_BLOCK_ROWS = 4096          # 브루트포스/배정/필터 정확 계산 시 한 번에 읽는 행 수
+_FETCH_BATCH = 100          # 구축 시 Pinecone fetch 배치 크기
+
+
+# ============================================
+# 메타데이터 필터
+# ============================================
+class _Column:
+    """문자열 메타데이터 열 (코드 배열 + 값 목록)"""
+
+    __slots__ = ("codes", "values", "code_of")
+
+    def __init__(self, codes: np.ndarray, values: List[str]):
+        self.codes = codes
+        self.values = values
+        self.code_of = {v: i for i, v in enumerate(values)}
+
+    def mask(self, allowed: Sequence[Any]) -> np.ndarray:
+        codes = [self.code_of[v] for v in allowed if v in self.code_of]
+        return np.isin(self.codes, np.asarray(codes, dtype=self.codes.dtype))
+
+
+class FetchedVector:
+    """Pinecone Vector 와 같은 속성 (recommender_core 는 .values 로 읽는다)"""
+
+    __slots__ = ("id", "values", "metadata")
+
+    def __init__(self, id: str, values: List[float], metadata: Dict[str, Any]):
+        self.id = id
+        self.values = values
+        self.metadata = metadata
+
+
+def _as_condition(cond) -> Dict[str, Any]:
+    return cond if isinstance(cond, dict) else {"$eq": cond}
+
+
+# ============================================
+# 로컬 IVF 색인
+# ============================================
+class LocalVectorIndex:
+    """rag-product 와 같은 query / fetch 인터페이스의 메모리 매핑 IVF 색인"""
+
+    supports_metadata_filter = True
+
+    def __init__(self, path: str = INDEX_DIR, nprobe: int = DEFAULT_NPROBE,
+                 candidate_factor: float = DEFAULT_CANDIDATE_FACTOR):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.path = path
+        self.nprobe = max(1, nprobe)
+        self.candidate_factor = max(1.0, candidate_factor)
+        self.dtype = self.meta["dtype"]
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.scales = (np.load(os.path.join(path, "scales.npy"), mmap_mode="r")
+                       if self.dtype == "int8" else None)
+        self.ids = np.load(os.path.join(path, "ids.npy"))
+        self.centroids = np.load(os.path.join(path, "centroids.npy"))
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        self.price = np.load(os.path.join(path, "price_krw.npy"))     # 가격 없음: -1
+        self.columns = {
+            name: _Column(np.load(os.path.join(path, f"{name}_codes.npy")), self.meta["columns"][name])
+            for name in ("brand", "category")
+        }
+        self.row_of = {int(pid): i for i, pid in enumerate(self.ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return int(self.vectors.shape[1])
+
+    # ---------- 내부 ----------
+    def _scores(self, start: int, end: int, q: np.ndarray) -> np.ndarray:
+        block = self.vectors[start:end]
+        if self.scales is not None:
+            return (block @ q) * self.scales[start:end]
+        return block.astype(np.float32) @ q
+
+    def _scores_rows(self, rows: np.ndarray, q: np.ndarray) -> np.ndarray:
+        """흩어진 행들의 점수 (필터 정확 계산용, 블록 단위로 읽음)"""
+        return np.concatenate([self._rows(rows[s:s + _BLOCK_ROWS]) @ q for s in range(0, len(rows), _BLOCK_ROWS)]
+                              or [np.zeros(0, dtype=np.float32)])
+
+    def _rows(self, rows: np.ndarray) -> np.ndarray:
+        """행 번호들의 float32 벡터 (정규화된 값)"""
+        vecs = np.asarray(self.vectors[rows], dtype=np.float32)
+        if self.scales is not None:
+            vecs *= np.asarray(self.scales[rows], dtype=np.float32)[:, None]
+        return vecs
+
+    def _filter_mask(self, flt: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        if not flt:
+            return None
+        mask = np.ones(len(self.ids), dtype=bool)
+        for field, cond in flt.items():
+            cond = _as_condition(cond)
+            if field == "price_krw":
+                has = self.price >= 0
+                for op, v in cond.items():
+                    if v is None:
+                        continue
+                    if op == "$gte":
+                        mask &= has & (self.price >= v)
+                    elif op == "$lte":
+                        mask &= has & (self.price <= v)
+                    elif op == "$gt":
+                        mask &= has & (self.price > v)
+                    elif op == "$lt":
+                        mask &= has & (self.price < v)
+                    elif op == "$eq":
+                        mask &= self.price == v
+                    else:
+                        raise ValueError(f"지원하지 않는 필터 연산: {field} {op}")
+            elif field in self.columns:
+                col = self.columns[field]
+                for op, v in cond.items():
+                    if op == "$eq":
+                        mask &= col.mask([v])
+                    elif op == "$in":
+                        mask &= col.mask(list(v))
+                    else:
+                        raise ValueError(f"지원하지 않는 필터 연산: {field} {op}")
+            else:
+                raise ValueError(f"지원하지 않는 필터 필드: {field}")
+        return mask
+
+    def _metadata(self, row: int) -> Dict[str, Any]:
+        out = {name: col.values[col.codes[row]] for name, col in self.columns.items() if col.codes[row] >= 0}
+        if self.price[row] >= 0:
+            out["price_krw"] = int(self.price[row])
+        return out
+
+    # ---------- 공개 ----------
+    def search(self, vector, top_k: int, flt: Optional[Dict[str, Any]] = None,
+               nprobe: Optional[int] = None, candidate_factor: Optional[float] = None) -> tuple:
+        """(행 번호 배열, 코사인 점수 배열) 점수 내림차순"""
+        q = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        if norm == 0.0 or top_k <= 0 or not len(self.ids):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        q = q / norm
+        mask = self._filter_mask(flt)
+        available = int(mask.sum()) if mask is not None else len(self.ids)
+        want = min(int(top_k * (candidate_factor or self.candidate_factor)), available)
+
+        # 필터 통과 비율이 p 면 IVF 는 대략 want / p 행을 훑는다 → 그보다 통과 행이 적으면 정확 계산
+        if mask is not None and available * available <= want * len(self.ids):
+            rows = np.nonzero(mask)[0]
+            return self._top(rows, self._scores_rows(rows, q).astype(np.float32), top_k)
+
+        order = np.argsort(-(self.centroids @ q))
+        probe = nprobe or self.nprobe
+        rows_parts, score_parts, found = [], [], 0
+        for rank, c in enumerate(order):
+            # nprobe 를 다 열었어도 후보가 부족하면 다음 목록까지 계속
+            if rank >= probe and found >= want:
+                break
+            start, end = int(self.offsets[c]), int(self.offsets[c + 1])
+            if start == end:
+                continue
+            rows = np.arange(start, end)
+            if mask is not None:
+                keep = mask[start:end]
+                if not keep.any():
+                    continue
+                rows = rows[keep]
+                scores = self._scores(start, end, q)[keep]
+            else:
+                scores = self._scores(start, end, q)
+            rows_parts.append(rows)
+            score_parts.append(scores)
+            found += len(rows)
+
+        if not rows_parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return self._top(np.concatenate(rows_parts), np.concatenate(score_parts).astype(np.float32), top_k)
+
+    def _top(self, rows: np.ndarray, scores: np.ndarray, top_k: int) -> tuple:
+        if len(rows) > top_k:
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+            rows, scores = rows[top], scores[top]
+        order = np.lexsort((self.ids[rows], -scores))
+        return rows[order], scores[order]
+
+    def brute_force(self, vector, top_k: int, flt: Optional[Dict[str, Any]] = None) -> tuple:
+        """전체 행 정확 계산 (벤치마크 기준값)"""
+        q = np.asarray(vector, dtype=np.float32)
+        q = q / (float(np.linalg.norm(q)) or 1.0)
+        scores = np.concatenate([self._scores(s, min(s + _BLOCK_ROWS, len(self.ids)), q)
+                                 for s in range(0, len(self.ids), _BLOCK_ROWS)]).astype(np.float32)
+        rows = np.arange(len(self.ids))
+        mask = self._filter_mask(flt)
+        if mask is not None:
+            rows, scores = rows[mask], scores[mask]
+        return self._top(rows, scores, top_k)
+
+    def query(self, vector, top_k: int = 10, include_metadata: bool = False,
+              include_values: bool = False, filter: Optional[Dict[str, Any]] = None, **_) -> Dict[str, Any]:
+        rows, scores = self.search(vector, top_k, filter)
+        matches = []
+        for r, s in zip(rows.tolist(), scores.tolist()):
+            m: Dict[str, Any] = {"id": str(int(self.ids[r])), "score": float(s)}
+            if include_metadata:
+                m["metadata"] = self._metadata(r)
+            matches.append(m)
+        if include_values and matches:
+            for m, vec in zip(matches, self._rows(rows)):
+                m["values"] = vec.tolist()
+        return {"matches": matches, "namespace": ""}
+
+    def fetch(self, ids: Sequence[str], **_) -> Dict[str, Any]:
+        found = [(str(i), self.row_of[int(i)]) for i in ids if str(i).isdigit() and int(i) in self.row_of]
+        if not found:
+            return {"vectors": {}, "namespace": ""}
+        vecs = self._rows(np.asarray([r for _, r in found], dtype=np.int64))
+        return {
+            "vectors": {
+                pid: FetchedVector(pid, vec.tolist(), self._metadata(r))
+                for (pid, r), vec in zip(found, vecs)
+            },
+            "namespace": "",
+        }
+
+
+def open_feature_index(pinecone_client, index_name: str):
+    """설정된 특징 벡터 백엔드 (local 적재 실패 시 Pinecone 으로 대체)"""
+    if BACKEND == "local":
+        try:
+            index = LocalVectorIndex(INDEX_DIR)
+            print(f"[VECTOR_STORE] 로컬 특징 색인 사용: {len(index)}개, dim={index.dim}, "
+                  f"{index.dtype}, nlist={len(index.centroids)}, nprobe={index.nprobe}")
+            return index
+        except Exception as e:
+            print(f"❌ 로컬 특징 색인 적재 실패(Pinecone {index_name} 사용): {e}")
+    return pinecone_client.Index(index_name)
+
+
+# ============================================
+# 구축
+# ============================================
+def _normalize_rows(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def _assign(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.concatenate([np.argmax(x[s:s + _BLOCK_ROWS] @ centroids.T, axis=1)
+                           for s in range(0, len(x), _BLOCK_ROWS)])
+
+
+def train_ivf(x: np.ndarray, nlist: int, iters: int = 15, sample: int = 50000, seed: int = 0) -> np.ndarray:
+    """정규화된 x 로 구면 k-means 중심점 (nlist, dim) 학습"""
+    rng = np.random.default_rng(seed)
+    train = x if len(x) <= sample else x[rng.choice(len(x), sample, replace=False)]
+    nlist = max(1, min(nlist, len(train)))
+    centroids = train[rng.choice(len(train), nlist, replace=False)].copy()
+    for _ in range(iters):
+        labels = _assign(train, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, train)
+        counts = np.bincount(labels, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            # 빈 군집은 임의 점으로 다시 시작
+            sums[empty] = train[rng.choice(len(train), int(empty.sum()), replace=False)]
+        centroids = _normalize_rows(sums)
+    return centroids.astype(np.float32)
+
+
+def write_index(path: str, pids: np.ndarray, vectors: np.ndarray, metadata: List[Dict[str, Any]],
+                dtype: str = "float16", nlist: Optional[int] = None, model: Optional[str] = None) -> Dict[str, Any]:
+    """
+    (pid, 벡터, 메타데이터) → path 에 색인 파일 기록.
+    임시 디렉터리에 쓰고 교체하므로 서비스 중인 프로세스의 메모리 매핑은 기존 파일을 계속 읽는다
+    """
+    if dtype not in ("float16", "int8"):
+        raise ValueError(f"지원하지 않는 dtype: {dtype}")
+    t0 = time.time()
+    x = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+    n = len(x)
+    nlist = nlist or max(1, min(4096, int(4 * np.sqrt(n))))
+    centroids = train_ivf(x, nlist)
+    labels = _assign(x, centroids)
+    order = np.argsort(labels, kind="stable")
+    offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(labels, minlength=len(centroids)), out=offsets[1:])
+
+    x = x[order]
+    pids = np.asarray(pids, dtype=np.int64)[order]
+    metadata = [metadata[i] for i in order]
+
+    tmp = path + ".building"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    if dtype == "int8":
+        scales = np.abs(x).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        np.save(os.path.join(tmp, "vectors.npy"), np.round(x / scales[:, None]).astype(np.int8))
+        np.save(os.path.join(tmp, "scales.npy"), scales.astype(np.float32))
+    else:
+        np.save(os.path.join(tmp, "vectors.npy"), x.astype(np.float16))
+    np.save(os.path.join(tmp, "ids.npy"), pids)
+    np.save(os.path.join(tmp, "centroids.npy"), centroids)
+    np.save(os.path.join(tmp, "offsets.npy"), offsets)
+    np.save(os.path.join(tmp, "price_krw.npy"), np.asarray(
+        [int(m["price_krw"]) if m.get("price_krw") is not None else -1 for m in metadata], dtype=np.int64))
+    columns = {}
+    for name in ("brand", "category"):
+        values = sorted({m[name] for m in metadata if m.get(name)})
+        code_of = {v: i for i, v in enumerate(values)}
+        np.save(os.path.join(tmp, f"{name}_codes.npy"),
+                np.asarray([code_of.get(m.get(name), -1) for m in metadata], dtype=np.int32))
+        columns[name] = values
+    meta = {
+        "count": n, "dim": int(x.shape[1]), "dtype": dtype, "nlist": len(centroids),
+        "model": model, "built_at": time.time(), "columns": columns,
+    }
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    old = path + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+    print(f"[VECTOR_STORE] 색인 구축: {n}개, dim={meta['dim']}, {dtype}, nlist={meta['nlist']} "
+          f"({time.time() - t0:.1f}s) → {path}")
+    return meta
+
+
+def _fetch_vectors(index, ids: List[str]) -> Dict[str, List[float]]:
+    res = index.fetch(ids=ids)
+    vectors = res.get("vectors") if hasattr(res, "get") else getattr(res, "vectors", None)
+    out = {}
+    for pid, vinfo in (vectors or {}).items():
+        vals = vinfo.get("values") if isinstance(vinfo, dict) else getattr(vinfo, "values", None)
+        if vals:
+            out[str(pid)] = list(vals)
+    return out
+
+
+def build_from_pinecone(path: str = INDEX_DIR, dtype: str = "float16", nlist: Optional[int] = None):
+    """product_data_chain 의 pid/메타데이터 + Pinecone rag-product 벡터로 로컬 색인 구축"""
+    from sqlalchemy import text
+    from db import engine, pinecone_client, RAG_PRODUCT_INDEX_NAME, EMBEDDING_MODEL
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT pid, brand, category, price_krw FROM product_data_chain ORDER BY pid"
+        )).fetchall()
+    meta_of = {str(r[0]): {"brand": r[1], "category": r[2], "price_krw": r[3]} for r in rows}
+
+    index = pinecone_client.Index(RAG_PRODUCT_INDEX_NAME)
+    ids = list(meta_of)
+    pids, vectors, metadata = [], [], []
+    t0 = time.time()
+    for i in range(0, len(ids), _FETCH_BATCH):
+        for pid, vals in _fetch_vectors(index, ids[i:i + _FETCH_BATCH]).items():
+            pids.append(int(pid))
+            vectors.append(vals)
+            metadata.append(meta_of[pid])
+        if (i // _FETCH_BATCH) % 20 == 0:
+            print(f"  fetch {min(i + _FETCH_BATCH, len(ids))}/{len(ids)} ({time.time() - t0:.0f}s)")
+    if not vectors:
+        raise RuntimeError("Pinecone 에서 가져온 벡터가 없습니다")
+    print(f"[VECTOR_STORE] 벡터 {len(vectors)}개 / 제품 {len(ids)}개")
+    return write_index(path, np.asarray(pids), np.asarray(vectors, dtype=np.float32), metadata,
+                       dtype=dtype, nlist=nlist, model=EMBEDDING_MODEL)
+
+
+# ============================================
+# 벤치마크 (IVF vs 브루트포스)
+# ============================================
+def _percentiles(ms: List[float]) -> str:
+    a = np.asarray(ms)
+    return f"p50 {np.percentile(a, 50):.2f}ms / p95 {np.percentile(a, 95):.2f}ms / p99 {np.percentile(a, 99):.2f}ms"
+
+
+def benchmark(index: LocalVectorIndex, queries: int = 200, top_k: int = 800, nprobes: Sequence[int] = (16,),
+              factors: Sequence[float] = (4, 8, 16), noise: float = 0.3, flt: Optional[Dict[str, Any]] = None,
+              seed: int = 0):
+    """
+    저장된 벡터에 잡음을 섞은 질의로 recall@k(브루트포스 기준)와 지연 분포 측정 (nprobe × 후보 배수 조합별).
+    실제 질의 분포와 다르므로 설정값은 운영 로그 질의로 다시 확인하는 것이 좋다
+    """
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(index), min(queries, len(index)), replace=False)
+    base = index._rows(np.sort(rows))
+    qs = _normalize_rows(base + noise * _normalize_rows(rng.standard_normal(base.shape).astype(np.float32)))
+
+    exact, brute_ms = [], []
+    for q in qs:
+        t0 = time.perf_counter()
+        r, _ = index.brute_force(q, top_k, flt)
+        brute_ms.append((time.perf_counter() - t0) * 1000)
+        exact.append(set(r.tolist()))
+    print(f"브루트포스: {_percentiles(brute_ms)}  (n={len(index)}, dim={index.dim}, {index.dtype}, top_k={top_k})")
+
+    for nprobe in nprobes:
+        for factor in factors:
+            recalls, ann_ms = [], []
+            for q, truth in zip(qs, exact):
+                t0 = time.perf_counter()
+                r, _ = index.search(q, top_k, flt, nprobe=nprobe, candidate_factor=factor)
+                ann_ms.append((time.perf_counter() - t0) * 1000)
+                if truth:
+                    recalls.append(len(truth.intersection(r.tolist())) / len(truth))
+            print(f"IVF nprobe={nprobe:<4} factor={factor:<5g} recall@{top_k} {np.mean(recalls):.4f} "
+                  f"(min {np.min(recalls):.4f})  {_percentiles(ann_ms)}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="제품 특징 벡터 로컬 색인 구축 / 벤치마크")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="Pinecone rag-product 벡터 → 로컬 IVF 색인")
+    b.add_argument("--path", default=INDEX_DIR)
+    b.add_argument("--dtype", choices=("float16", "int8"), default="float16")
+    b.add_argument("--nlist", type=int, default=None, help="군집 수 (기본 4·√N)")
+    bench = sub.add_parser("bench", help="IVF recall / 지연 vs 브루트포스")
+    bench.add_argument("--path", default=INDEX_DIR)
+    bench.add_argument("--queries", type=int, default=200)
+    bench.add_argument("--top-k", type=int, default=800)
+    bench.add_argument("--nprobe", type=int, nargs="+", default=[16])
+    bench.add_argument("--factor", type=float, nargs="+", default=[4, 8, 16], help="후보 배수 (top_k 대비)")
+    bench.add_argument("--noise", type=float, default=0.3, help="질의 생성 시 섞는 잡음 크기")
+    bench.add_argument("--category", default=None, help="category 사전 필터를 건 경우도 측정")
+    args = ap.parse_args()
+
+    if args.cmd == "build":
+        build_from_pinecone(args.path, dtype=args.dtype, nlist=args.nlist)
+    else:
+        index = LocalVectorIndex(args.path)
+        flt = {"category": {"$eq": args.category}} if args.category else None
+        benchmark(index, queries=args.queries, top_k=args.top_k, nprobes=args.nprobe, factors=args.factor,
+                  noise=args.noise, flt=flt)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# backend/routers/image_preprocess.py
+# ============================================
+# Vision 업로드 전 이미지 전처리
+# - EXIF 회전 보정 → 긴 변 축소 → 그레이스케일 → JPEG 재압축
+# - 선택: 텍스트 영역 자동 크롭 (OCR_AUTOCROP=1)
+# - 디코딩 실패(HEIC 미지원 등)나 결과가 더 커지면 원본 바이트를 그대로 사용
+#
+# 벤치마크 (backend 디렉터리에서):
+#   python -m routers.image_preprocess ../images/ocr_test_image.jpg [더 많은 이미지...] [--vision]
+# ============================================
+
+import argparse
+import io
+import os
+import time
+from typing import Any, Dict, NamedTuple, Optional, Union
+
+from PIL import Image, ImageFilter, ImageOps
+
+try:  # HEIC 업로드 지원 (설치된 경우에만)
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+except ImportError:
+    pass
+
+ENABLED = os.getenv("OCR_PREPROCESS", "1") == "1"
+MAX_LONG_EDGE = int(os.getenv("OCR_MAX_LONG_EDGE", "2048"))
+GRAYSCALE = os.getenv("OCR_GRAYSCALE", "1") == "1"
+JPEG_QUALITY = int(os.getenv("OCR_JPEG_QUALITY", "85"))
+AUTOCROP = os.getenv("OCR_AUTOCROP", "0") == "1"
+
+# 자동 크롭: 엣지 밝기 임계값 / 여백 비율 / 이 비율 이상이면 크롭하지 않음
+_CROP_EDGE_THRESHOLD = 40
+_CROP_MARGIN = 0.03
+_CROP_MIN_GAIN = 0.9
+
+
+class PreprocessResult(NamedTuple):
+    data: Union[bytes, memoryview]   # 전처리하지 못하면 입력 버퍼 그대로
+    metrics: Dict[str, Any]
+
+
+def _text_bbox(img: Image.Image) -> Optional[tuple]:
+    """엣지가 몰린 영역의 bbox (작은 사본에서 계산 후 원본 좌표로 환산)"""
+    small = img.convert("L")
+    scale = 1.0
+    if max(small.size) > 512:
+        scale = 512 / max(small.size)
+        small = small.resize((max(1, int(small.width * scale)), max(1, int(small.height * scale))))
+    edges = small.filter(ImageFilter.FIND_EDGES).point(lambda v: 255 if v > _CROP_EDGE_THRESHOLD else 0)
+    bbox = edges.getbbox()
+    if not bbox:
+        return None
+    mx, my = int(small.width * _CROP_MARGIN), int(small.height * _CROP_MARGIN)
+    left, top = max(0, bbox[0] - mx), max(0, bbox[1] - my)
+    right, bottom = min(small.width, bbox[2] + mx), min(small.height, bbox[3] + my)
+    if (right - left) * (bottom - top) >= _CROP_MIN_GAIN * small.width * small.height:
+        return None
+    return (int(left / scale), int(top / scale), int(right / scale), int(bottom / scale))
+
+
+def preprocess_image(
+    data: Union[bytes, memoryview],
+    max_long_edge: int = MAX_LONG_EDGE,
+    grayscale: bool = GRAYSCALE,
+    quality: int = JPEG_QUALITY,
+    autocrop: bool = AUTOCROP,
+) -> PreprocessResult:
+    """Vision 에 보낼 축소 바이트 + 단계별 지표"""
+    t0 = time.perf_counter()
+    metrics: Dict[str, Any] = {"input_bytes": len(data)}
+    if not ENABLED:
+        metrics.update(output_bytes=len(data), skipped="disabled", total_ms=0.0)
+        return PreprocessResult(data, metrics)
+
+    try:
+        img = Image.open(io.BytesIO(data))
+        metrics["input_size"] = img.size
+        metrics["format"] = img.format
+        # JPEG 는 디코딩 단계에서 DCT 축소 (큰 사진 디코딩 비용 절감)
+        if img.format == "JPEG" and max(img.size) > max_long_edge:
+            img.draft("L" if grayscale else "RGB", (max_long_edge, max_long_edge))
+        img = ImageOps.exif_transpose(img)
+        img.load()
+    except Exception as e:
+        metrics.update(output_bytes=len(data), skipped=f"decode_failed: {e}",
+                       total_ms=round((time.perf_counter() - t0) * 1000, 1))
+        return PreprocessResult(data, metrics)
+    metrics["decode_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+
+    t1 = time.perf_counter()
+    if autocrop:
+        bbox = _text_bbox(img)
+        if bbox:
+            img = img.crop(bbox)
+            metrics["crop"] = bbox
+    if max(img.size) > max_long_edge:
+        img.thumbnail((max_long_edge, max_long_edge), Image.LANCZOS)
+    img = img.convert("L") if grayscale else img.convert("RGB")
+    metrics["transform_ms"] = round((time.perf_counter() - t1) * 1000, 1)
+
+    t2 = time.perf_counter()
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality, optimize=True)
+    out = buf.getvalue()
+    metrics["encode_ms"] = round((time.perf_counter() - t2) * 1000, 1)
+    metrics["output_size"] = img.size
+
+    if len(out) >= len(data):
+        # 이미 충분히 작은 이미지: 원본 유지
+        out = data
+        metrics["skipped"] = "not_smaller"
+    metrics["output_bytes"] = len(out)
+    metrics["total_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return PreprocessResult(out, metrics)
+
+
+def prepare_for_vision(data: Union[bytes, memoryview]) -> bytes:
+    """Vision 호출 직전 사용: 전처리 실패 시에도 항상 보낼 바이트를 반환"""
+    result = preprocess_image(data)
+    m = result.metrics
+    print(f"[OCR_PREPROCESS] {m.get('input_bytes')}B → {m.get('output_bytes')}B "
+          f"({m.get('total_ms')}ms{', ' + m['skipped'] if m.get('skipped') else ''})")
+    data = result.data
+    return data if isinstance(data, bytes) else bytes(data)
+
+
+# ============================================
+# 벤치마크
+# ============================================
+def _bench_vision(data: bytes) -> float:
+    from google.cloud import vision
+    client = vision.ImageAnnotatorClient()
+    t0 = time.perf_counter()
+    resp = client.text_detection(image=vision.Image(content=data))
+    if resp.error.message:
+        raise RuntimeError(resp.error.message)
+    return (time.perf_counter() - t0) * 1000
+
+
+def main():
+    default = os.path.join(os.path.dirname(__file__), "..", "..", "images", "ocr_test_image.jpg")
+    ap = argparse.ArgumentParser(description="OCR 이미지 전처리 벤치마크")
+    ap.add_argument("images", nargs="*", default=[default])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--vision", action="store_true",
+                    help="원본/전처리 이미지로 Vision text_detection 지연도 측정 (GOOGLE_APPLICATION_CREDENTIALS 필요)")
+    args = ap.parse_args()
+
+    total_in = total_out = 0
+    for path in args.images:
+        with open(path, "rb") as f:
+            data = f.read()
+        runs = [preprocess_image(data) for _ in range(max(1, args.repeat))]
+        out = runs[-1]
+        best_ms = min(r.metrics["total_ms"] for r in runs)
+        total_in += len(data)
+        total_out += len(out.data)
+        print(f"{os.path.basename(path)}: {len(data) / 1024:.0f}KB → {len(out.data) / 1024:.0f}KB "
+              f"({100 * (1 - len(out.data) / len(data)):.0f}% 감소), "
+              f"{out.metrics.get('input_size')} → {out.metrics.get('output_size')}, "
+              f"전처리 best {best_ms}ms")
+        if args.vision:
+            t_orig = _bench_vision(data)
+            t_prep = _bench_vision(out.data)
+            print(f"  Vision: 원본 {t_orig:.0f}ms / 전처리 {t_prep:.0f}ms (+전처리 {best_ms}ms)")
+    if total_in:
+        print(f"합계: {total_in / 1024:.0f}KB → {total_out / 1024:.0f}KB "
+              f"({100 * (1 - total_out / total_in):.0f}% 감소)")
+
+
+if __name__ == "__main__":
+    main()
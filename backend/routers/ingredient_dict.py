@@ -0,0 +1,261 @@
+# backend/routers/ingredient_dict.py
+# ============================================
+# 성분 사전 인메모리 스냅샷
+# - KCIA_ingredients / ingredients_6keyword / ingredients / caution_ingredients 를
+#   한 번에 읽어 정규화 이름 기준 해시맵으로 보관 (+ baumann_weights 피부타입별 가중치)
+# - 버전(행 수/최대 id/UPDATE_TIME) 변경 시에만 백그라운드에서 재적재 후 원자적 교체
+# - 분석 매칭 함수는 DB 왕복 없이 이 스냅샷만 조회한다
+# ============================================
+
+import hashlib
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from sqlalchemy import text
+
+from db import engine
+from .caution_table import _name_key as caution_name_key
+
+# 스냅샷 대상 테이블 (버전 계산에도 사용)
+DICT_TABLES = ("KCIA_ingredients", "ingredients_6keyword", "ingredients", "caution_ingredients",
+               "baumann_weights")
+
+# 백그라운드 버전 확인 주기(초)
+REFRESH_INTERVAL_SEC = int(os.getenv("INGREDIENT_DICT_REFRESH_SEC", "300"))
+
+
+def normalize_name(name):
+    if not name: return None
+    return name.strip().lower().replace(' ', '').replace('-', '')
+
+
+class IngredientMatch:
+    """
+    성분 토큰 1개의 사전 조회 결과 (한 번만 조회해 키워드/검증/주의 집계에 재사용)
+    """
+
+    __slots__ = ("surface", "norm", "kcia", "exact_korean", "keywords", "purpose",
+                 "has_caution", "cautions")
+
+    def __init__(self, surface, norm, kcia, exact_korean, keywords, purpose, has_caution, cautions):
+        self.surface = surface
+        self.norm = norm
+        self.kcia = kcia                    # KCIA 정규화 일치
+        self.exact_korean = exact_korean    # ingredients 국문 정확일치
+        self.keywords = keywords            # 6keyword 키워드 집합 (없으면 None)
+        self.purpose = purpose              # KCIA 배합목적 (없으면 '미확인')
+        self.has_caution = has_caution      # caution_ingredients 국문 일치 (대소문자/앞뒤 공백 무시)
+        self.cautions = cautions            # 일치한 caution_ingredients 행 ((korean_name, caution_grade), ...)
+
+    @property
+    def verified(self) -> bool:
+        return self.kcia or self.exact_korean
+
+    @property
+    def verified_key(self) -> str:
+        """검증 성분 중복 제거 키 (KCIA 는 정규화 이름, 국문 정확일치는 원문)"""
+        return self.norm if self.kcia else f"EXACT::{self.surface}"
+
+
+class IngredientDictSnapshot:
+    """
+    불변 스냅샷. 교체는 모듈 전역 참조를 통째로 바꾸는 방식으로만 이뤄지므로
+    요청 처리 중에는 get_snapshot()으로 얻은 객체 하나만 계속 사용하면 된다.
+    """
+
+    __slots__ = ("version", "loaded_at", "kcia_names", "kcia_purpose",
+                 "keywords", "korean_exact", "caution_rows", "weights")
+
+    def __init__(
+        self,
+        version: str,
+        kcia_purpose: Dict[str, Optional[str]],
+        keywords: Dict[str, FrozenSet[str]],
+        korean_exact: FrozenSet[str],
+        caution_rows: Dict[str, Tuple[Tuple[str, Optional[str]], ...]],
+        weights: Dict[str, Dict[str, dict]],
+    ):
+        self.version = version
+        self.loaded_at = time.time()
+        self.kcia_purpose = kcia_purpose          # KCIA.name_normalized → purpose
+        self.kcia_names = frozenset(kcia_purpose)  # KCIA 정규화 이름 집합
+        self.keywords = keywords                  # 6keyword.name_normalized → {keyword}
+        self.korean_exact = korean_exact          # ingredients.korean_name (원문 정확일치용)
+        # caution_name_key(korean_name) → 같은 이름의 모든 (korean_name, caution_grade) 행
+        # (기존 _ci 콜레이션 IN 비교처럼 대소문자/앞뒤 공백 무시, 중복 이름 행도 모두 유지)
+        self.caution_rows = caution_rows
+        self.weights = weights                    # skin_type → {keyword(국문): {importance, target_range}}
+
+    def is_verified(self, original: str, normalized: Optional[str]) -> bool:
+        """KCIA 정규화 일치 또는 ingredients 국문 정확일치 여부"""
+        return (normalized in self.kcia_names) or (original in self.korean_exact)
+
+    def resolve(self, surface: str, normalized: Optional[str]) -> IngredientMatch:
+        """토큰 1개를 모든 사전에 한 번에 조회"""
+        cautions = self.caution_rows.get(caution_name_key(surface), ())
+        return IngredientMatch(
+            surface, normalized,
+            normalized in self.kcia_names,
+            surface in self.korean_exact,
+            self.keywords.get(normalized) if normalized else None,
+            self.kcia_purpose.get(normalized, '미확인'),
+            bool(cautions),
+            cautions,
+        )
+
+
+# ============================================
+# 적재 / 버전 확인
+# ============================================
+def _fetch_version(conn) -> str:
+    """
+    사전 테이블의 변경 여부를 싸게 판별하기 위한 서명.
+    - 행 수 + 최대 id (추가/삭제 감지)
+    - information_schema.TABLES.UPDATE_TIME (제자리 수정 감지, 엔진이 지원하는 경우)
+    """
+    parts = []
+    for tbl in DICT_TABLES:
+        if tbl == "caution_ingredients":
+            row = conn.execute(text(f"SELECT COUNT(*), NULL FROM {tbl}")).fetchone()
+        else:
+            row = conn.execute(text(f"SELECT COUNT(*), MAX(id) FROM {tbl}")).fetchone()
+        parts.append(f"{tbl}:{row[0]}:{row[1]}")
+
+    try:
+        names = ",".join(f"'{t}'" for t in DICT_TABLES)
+        rows = conn.execute(text(f"""
+            SELECT TABLE_NAME, UPDATE_TIME
+            FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({names})
+            ORDER BY TABLE_NAME
+        """)).fetchall()
+        parts.extend(f"{r[0]}@{r[1]}" for r in rows)
+    except Exception as e:
+        print(f"⚠️ 성분 사전 UPDATE_TIME 조회 실패(행 수 기준으로만 판별): {e}")
+
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _load_snapshot(conn, version: str) -> IngredientDictSnapshot:
+    kcia_purpose: Dict[str, Optional[str]] = {}
+    for norm_name, purpose in conn.execute(text(
+        "SELECT name_normalized, purpose FROM KCIA_ingredients WHERE name_normalized IS NOT NULL"
+    )):
+        kcia_purpose[norm_name] = purpose
+
+    keyword_sets = defaultdict(set)
+    for norm_name, kw in conn.execute(text(
+        "SELECT name_normalized, keyword FROM ingredients_6keyword WHERE name_normalized IS NOT NULL"
+    )):
+        keyword_sets[norm_name].add(kw)
+    keywords = {k: frozenset(v) for k, v in keyword_sets.items()}
+
+    korean_exact = frozenset(
+        r[0] for r in conn.execute(text(
+            "SELECT korean_name FROM ingredients WHERE korean_name IS NOT NULL"
+        )) if r[0]
+    )
+
+    caution_lists: Dict[str, list] = defaultdict(list)
+    for kor_name, grade in conn.execute(text(
+        "SELECT korean_name, caution_grade FROM caution_ingredients"
+    )):
+        key = caution_name_key(kor_name)
+        if key:
+            caution_lists[key].append((kor_name, grade))
+    caution_rows = {k: tuple(v) for k, v in caution_lists.items()}
+
+    # baumann_weights: calculate_score_final 이 받는 user_weights_dict 형태 그대로 보관
+    weights: Dict[str, Dict[str, dict]] = defaultdict(dict)
+    for skin_type, kw, importance, target_min, target_max in conn.execute(text(
+        "SELECT skin_type, keyword, importance, target_min, target_max FROM baumann_weights ORDER BY id"
+    )):
+        weights[skin_type][kw] = {
+            "importance": importance,
+            "target_range": [target_min, target_max]
+        }
+
+    return IngredientDictSnapshot(
+        version=version,
+        kcia_purpose=kcia_purpose,
+        keywords=keywords,
+        korean_exact=korean_exact,
+        caution_rows=caution_rows,
+        weights=dict(weights),
+    )
+
+
+# ============================================
+# 전역 스냅샷 (원자적 교체)
+# ============================================
+_SNAPSHOT: Optional[IngredientDictSnapshot] = None
+_LOAD_LOCK = threading.Lock()
+_STOP_EVENT = threading.Event()
+_REFRESH_THREAD: Optional[threading.Thread] = None
+
+
+def refresh_snapshot(force: bool = False) -> bool:
+    """
+    버전이 바뀌었을 때만 새 스냅샷을 만들어 교체한다.
+    반환: 교체가 일어났는지 여부
+    """
+    global _SNAPSHOT
+    with _LOAD_LOCK:
+        with engine.connect() as conn:
+            version = _fetch_version(conn)
+            current = _SNAPSHOT
+            if not force and current is not None and current.version == version:
+                return False
+            t0 = time.time()
+            snap = _load_snapshot(conn, version)
+        _SNAPSHOT = snap
+        print(
+            f"[INGREDIENT_DICT] 스냅샷 적재 version={version} "
+            f"kcia={len(snap.kcia_names)} keyword={len(snap.keywords)} "
+            f"ingredients={len(snap.korean_exact)} caution={len(snap.caution_rows)} "
+            f"skin_types={len(snap.weights)} "
+            f"({(time.time() - t0) * 1000:.0f}ms)"
+        )
+        return True
+
+
+def get_snapshot() -> IngredientDictSnapshot:
+    """현재 스냅샷 반환. 아직 적재 전이면 동기적으로 한 번 적재한다."""
+    snap = _SNAPSHOT
+    if snap is None:
+        refresh_snapshot()
+        snap = _SNAPSHOT
+    return snap
+
+
+def _refresh_loop(interval: int):
+    while not _STOP_EVENT.wait(interval):
+        try:
+            refresh_snapshot()
+        except Exception as e:
+            # 갱신 실패 시 기존 스냅샷을 계속 사용
+            print(f"❌ 성분 사전 갱신 실패(기존 스냅샷 유지): {e}")
+
+
+def start_background_refresh(interval: int = REFRESH_INTERVAL_SEC):
+    """서버 시작 시 1회 적재 + 주기적 버전 확인 스레드 기동"""
+    global _REFRESH_THREAD
+    try:
+        refresh_snapshot()
+    except Exception as e:
+        print(f"❌ 성분 사전 초기 적재 실패(첫 요청 시 재시도): {e}")
+
+    if _REFRESH_THREAD is not None and _REFRESH_THREAD.is_alive():
+        return
+    _STOP_EVENT.clear()
+    _REFRESH_THREAD = threading.Thread(
+        target=_refresh_loop, args=(interval,), name="ingredient-dict-refresh", daemon=True
+    )
+    _REFRESH_THREAD.start()
+
+
+def stop_background_refresh():
+    _STOP_EVENT.set()
@@ -0,0 +1,137 @@
+# backend/routers/ingredient_scanner.py
+# ============================================
+# OCR 텍스트 성분 스캐너 (사전 트라이 기반 최장 일치)
+# - 성분 사전 스냅샷의 KCIA 정규화 이름 + ingredients 국문명(정규화)으로 트라이 구성
+# - OCR 텍스트를 normalize_name 과 같은 규칙(공백/하이픈 제거, 소문자)으로 한 번 훑으며
+#   단어 경계에서 시작·끝나는 최장 일치 구간만 방출 → 여러 단어 성분명
+#   ("Sodium Hyaluronate", 띄어 쓴 국문명)도 매칭된다
+# - 스냅샷 버전별로 1회 구성 후 재사용 (DB 조회 없음)
+# ============================================
+
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .ingredient_dict import IngredientDictSnapshot, get_snapshot, normalize_name
+
+# 기존 단어 추출 규칙과 같은 최소 길이
+MIN_PATTERN_LEN = 2
+
+_TERMINAL = ""  # 트라이 노드에서 패턴 id 를 담는 키 (문자 키와 겹치지 않음)
+
+
+class IngredientSpan(NamedTuple):
+    start: int                  # 원문 시작 인덱스
+    end: int                    # 원문 끝 인덱스 (exclusive)
+    text: str                   # 원문 구간 (연속 공백은 하나로)
+    norm: str                   # 사전 정규화 키
+    pattern_id: int             # 스캐너 패턴 id (같은 스냅샷 내에서 고정)
+    korean_name: Optional[str]  # ingredients 국문명 패턴이면 그 원문 표기
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum()
+
+
+def _is_skipped(ch: str) -> bool:
+    """normalize_name 에서 제거되는 문자 (+ OCR 줄바꿈/탭)"""
+    return ch == '-' or ch.isspace()
+
+
+def _starts_word(text: str, i: int) -> bool:
+    """i 가 단어 시작인지 (하이픈으로 이어진 앞 단어가 있으면 아님: 'PEG-100')"""
+    k = i - 1
+    while k >= 0 and text[k] == '-':
+        k -= 1
+    return k < 0 or not (_is_word_char(text[k]) and _is_word_char(text[i]))
+
+
+def _ends_word(text: str, end: int) -> bool:
+    """end(exclusive) 가 단어 끝인지 (하이픈으로 이어진 뒷 단어가 있으면 아님: '폴리글리세린-3')"""
+    k = end
+    while k < len(text) and text[k] == '-':
+        k += 1
+    return k >= len(text) or not (_is_word_char(text[end - 1]) and _is_word_char(text[k]))
+
+
+class IngredientScanner:
+    def __init__(self, snap: IngredientDictSnapshot):
+        t0 = time.time()
+        self.version = snap.version
+        self.patterns: List[Tuple[str, Optional[str]]] = []   # pattern_id → (norm, korean_name)
+        self._root: Dict = {}
+
+        korean_by_norm: Dict[str, str] = {}
+        for name in sorted(snap.korean_exact):
+            n = normalize_name(name)
+            if n and len(n) >= MIN_PATTERN_LEN:
+                korean_by_norm.setdefault(n, name)
+
+        for n in sorted(set(snap.kcia_names) | set(korean_by_norm)):
+            if not n or len(n) < MIN_PATTERN_LEN:
+                continue
+            node = self._root
+            for ch in n:
+                node = node.setdefault(ch, {})
+            node[_TERMINAL] = len(self.patterns)
+            self.patterns.append((n, korean_by_norm.get(n)))
+
+        print(f"[INGREDIENT_SCANNER] 패턴 {len(self.patterns)}개 구성 ({(time.time() - t0) * 1000:.0f}ms)")
+
+    def scan(self, text: str) -> List[IngredientSpan]:
+        """단어 경계에서 시작·끝나는 최장 일치 구간을 왼쪽부터 겹치지 않게 반환"""
+        if not text:
+            return []
+        # 정규화 스트림 (문자, 원문 인덱스)
+        chars: List[str] = []
+        origin: List[int] = []
+        for i, ch in enumerate(text):
+            if not _is_skipped(ch):
+                chars.append(ch.lower())
+                origin.append(i)
+
+        spans: List[IngredientSpan] = []
+        s = 0
+        n = len(chars)
+        while s < n:
+            start = origin[s]
+            if not _starts_word(text, start):
+                s += 1
+                continue
+            node = self._root
+            best: Optional[Tuple[int, int]] = None   # (스트림 끝 인덱스, pattern_id)
+            j = s
+            while j < n:
+                node = node.get(chars[j])
+                if node is None:
+                    break
+                j += 1
+                pid = node.get(_TERMINAL)
+                if pid is not None and _ends_word(text, origin[j - 1] + 1):
+                    best = (j, pid)
+            if best is None:
+                s += 1
+                continue
+            j, pid = best
+            end = origin[j - 1] + 1
+            norm, korean_name = self.patterns[pid]
+            spans.append(IngredientSpan(start, end, " ".join(text[start:end].split()), norm, pid, korean_name))
+            s = j
+        return spans
+
+
+_SCANNER: Optional[IngredientScanner] = None
+_BUILD_LOCK = threading.Lock()
+
+
+def get_scanner(snap: Optional[IngredientDictSnapshot] = None) -> IngredientScanner:
+    """현재 스냅샷 버전의 스캐너 (버전이 바뀌면 다시 구성)"""
+    global _SCANNER
+    snap = snap or get_snapshot()
+    scanner = _SCANNER
+    if scanner is not None and scanner.version == snap.version:
+        return scanner
+    with _BUILD_LOCK:
+        if _SCANNER is None or _SCANNER.version != snap.version:
+            _SCANNER = IngredientScanner(snap)
+        return _SCANNER
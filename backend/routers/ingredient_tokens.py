@@ -0,0 +1,327 @@
+# backend/routers/ingredient_tokens.py
+# ============================================
+# 제품 성분 사전 토큰화 (product_data.p_ingredients → 토큰 ID 목록)
+# - ingredient_token_vocab       : 정규화 성분명 ↔ 정수 ID (인턴 테이블)
+# - product_ingredient_tokens    : pid 별 토큰 ID 목록(uint32 packed) + 원문 표기(JSON) + 원문 지문
+# - 수집(ingestion) 단계에서 한 번만 split/strip/normalize 하고,
+#   분석/OCR/챗 경로는 프로세스 내 TokenStore 에서 토큰 형태를 그대로 꺼내 쓴다
+#
+# 실행 (backend 디렉터리에서):
+#   python -m routers.ingredient_tokens          # 변경분 동기화
+#   python -m routers.ingredient_tokens --full   # 전체 재토큰화
+# ============================================
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, String, Text, text
+from sqlalchemy.orm import declarative_base
+
+from db import engine
+from .ingredient_dict import normalize_name
+
+Base = declarative_base()
+
+TBL_VOCAB = "ingredient_token_vocab"
+TBL_TOKENS = "product_ingredient_tokens"
+VOCAB_NAME_MAX = 512
+WRITE_BATCH = 500
+
+# 각 워커의 TokenStore 증분 갱신 주기(초)
+STORE_REFRESH_SEC = int(os.getenv("TOKEN_STORE_REFRESH_SEC", "120"))
+
+
+class IngredientTokenVocab(Base):
+    __tablename__ = TBL_VOCAB
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name_normalized = Column(String(VOCAB_NAME_MAX), unique=True, nullable=False)
+
+
+class ProductIngredientTokens(Base):
+    __tablename__ = TBL_TOKENS
+    pid = Column(Integer, primary_key=True)
+    token_ids = Column(LargeBinary)        # array('I') little-endian, 0 = 사전 밖(정규화 결과 없음/과대 길이)
+    surfaces = Column(Text)                # JSON: 원문 표기 목록 (token_ids 와 같은 순서)
+    source_hash = Column(String(16), index=True)
+    updated_at = Column(DateTime, index=True)
+
+
+# ============================================
+# 토큰 표현
+# ============================================
+class ProductTokens:
+    """
+    한 제품의 성분 토큰. surfaces / norms / ids 는 같은 길이, 같은 순서.
+    - surfaces : 원문 표기 (split(',') → strip → strip('"'))
+    - norms    : normalize_name 결과 (인턴된 문자열, 없으면 None)
+    - ids      : ingredient_token_vocab.id (없으면 0)
+    """
+
+    __slots__ = ("surfaces", "norms", "ids", "source_hash")
+
+    def __init__(self, surfaces: Sequence[str], norms: Sequence[Optional[str]],
+                 ids: Optional[array] = None, source_hash: Optional[str] = None):
+        self.surfaces = tuple(surfaces)
+        self.norms = tuple(norms)
+        self.ids = ids if ids is not None else array("I", [0] * len(self.surfaces))
+        self.source_hash = source_hash
+
+    def __len__(self) -> int:
+        return len(self.surfaces)
+
+    def __iter__(self):
+        return zip(self.surfaces, self.norms)
+
+    def norm_set(self) -> frozenset:
+        return frozenset(n for n in self.norms if n)
+
+
+def source_hash(ingredients_str: Optional[str]) -> str:
+    return hashlib.sha1((ingredients_str or "").encode("utf-8")).hexdigest()[:16]
+
+
+def _intern(s: Optional[str]) -> Optional[str]:
+    return sys.intern(s) if s else s
+
+
+def split_ingredients(ingredients_str: Optional[str]) -> List[str]:
+    """p_ingredients 표준 분할 규칙 (기존 분석 코드와 동일)"""
+    return [ing.strip().strip('"') for ing in (ingredients_str or "").split(',') if ing.strip()]
+
+
+def tokens_from_surfaces(surfaces: Iterable[str], src_hash: Optional[str] = None) -> ProductTokens:
+    surfaces = [_intern(s) for s in surfaces]
+    return ProductTokens(surfaces, [_intern(normalize_name(s)) for s in surfaces], source_hash=src_hash)
+
+
+def tokenize_ingredients(ingredients_str: Optional[str]) -> ProductTokens:
+    """문자열을 즉석에서 토큰화 (스토어에 없을 때의 폴백)"""
+    return tokens_from_surfaces(split_ingredients(ingredients_str), source_hash(ingredients_str))
+
+
+def as_tokens(ingredients) -> ProductTokens:
+    """ProductTokens 는 그대로, 문자열/리스트는 토큰화해서 반환"""
+    if isinstance(ingredients, ProductTokens):
+        return ingredients
+    if isinstance(ingredients, (list, tuple)):
+        return tokens_from_surfaces(ingredients)
+    return tokenize_ingredients(ingredients)
+
+
+def _pack_ids(ids: Sequence[int]) -> bytes:
+    a = array("I", ids)
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a.tobytes()
+
+
+def _unpack_ids(blob: Optional[bytes]) -> array:
+    a = array("I")
+    if blob:
+        a.frombytes(blob)
+        if sys.byteorder != "little":
+            a.byteswap()
+    return a
+
+
+# ============================================
+# 수집(ingestion): product_data → 토큰 테이블 동기화
+# ============================================
+def ensure_tables():
+    Base.metadata.create_all(
+        engine, tables=[IngredientTokenVocab.__table__, ProductIngredientTokens.__table__], checkfirst=True
+    )
+
+
+def _load_vocab(conn) -> Dict[str, int]:
+    return {name: vid for vid, name in conn.execute(text(f"SELECT id, name_normalized FROM {TBL_VOCAB}"))}
+
+
+def _intern_names(conn, vocab: Dict[str, int], names: Iterable[str]) -> Dict[str, int]:
+    """vocab 에 없는 정규화 이름을 추가하고 갱신된 vocab 반환"""
+    new_names = sorted({n for n in names if n and len(n) <= VOCAB_NAME_MAX and n not in vocab})
+    if not new_names:
+        return vocab
+    ins = text(f"INSERT IGNORE INTO {TBL_VOCAB} (name_normalized) VALUES (:n)")
+    for start in range(0, len(new_names), WRITE_BATCH):
+        conn.execute(ins, [{"n": n} for n in new_names[start:start + WRITE_BATCH]])
+    return _load_vocab(conn)
+
+
+def sync_product_tokens(full: bool = False) -> Dict[str, int]:
+    """
+    p_ingredients 지문이 바뀐 제품만 다시 토큰화해 저장하고, 사라진 제품 행은 삭제한다.
+    """
+    t0 = time.time()
+    ensure_tables()
+    with engine.begin() as conn:
+        products = conn.execute(text("SELECT pid, p_ingredients FROM product_data")).fetchall()
+        existing = {} if full else {
+            pid: h for pid, h in conn.execute(text(f"SELECT pid, source_hash FROM {TBL_TOKENS}"))
+        }
+
+        changed: List[Tuple[int, str, ProductTokens]] = []
+        for pid, ing_str in products:
+            h = source_hash(ing_str)
+            if existing.get(pid) != h:
+                changed.append((pid, h, tokenize_ingredients(ing_str)))
+
+        vocab = _intern_names(conn, _load_vocab(conn), (n for _, _, t in changed for n in t.norms))
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        upsert = text(f"""
+            INSERT INTO {TBL_TOKENS} (pid, token_ids, surfaces, source_hash, updated_at)
+            VALUES (:pid, :ids, :surfaces, :h, :now)
+            ON DUPLICATE KEY UPDATE
+                token_ids = VALUES(token_ids), surfaces = VALUES(surfaces),
+                source_hash = VALUES(source_hash), updated_at = VALUES(updated_at)
+        """)
+        payload = [{
+            "pid": pid,
+            "ids": _pack_ids([vocab.get(n, 0) if n else 0 for n in toks.norms]),
+            "surfaces": json.dumps(list(toks.surfaces), ensure_ascii=False),
+            "h": h, "now": now,
+        } for pid, h, toks in changed]
+        for start in range(0, len(payload), WRITE_BATCH):
+            conn.execute(upsert, payload[start:start + WRITE_BATCH])
+
+        live = {pid for pid, _ in products}
+        removed = [pid for pid in existing if pid not in live]
+        for pid in removed:
+            conn.execute(text(f"DELETE FROM {TBL_TOKENS} WHERE pid = :pid"), {"pid": pid})
+
+    stats = {"products": len(products), "tokenized": len(changed), "removed": len(removed),
+             "vocab": len(vocab), "ms": int((time.time() - t0) * 1000)}
+    print(f"[INGREDIENT_TOKENS] {stats}")
+    return stats
+
+
+# ============================================
+# 프로세스 내 토큰 스토어 (pid → ProductTokens)
+# ============================================
+class TokenStore:
+    def __init__(self):
+        self._tokens: Dict[int, ProductTokens] = {}
+        self._vocab_by_id: Dict[int, str] = {}
+        self._last_updated = None
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def refresh(self):
+        """updated_at 이후 변경분만 읽어 반영 (첫 호출은 전체 적재)"""
+        with self._lock:
+            with engine.connect() as conn:
+                vocab_rows = conn.execute(text(f"SELECT id, name_normalized FROM {TBL_VOCAB}")).fetchall()
+                if self._last_updated is None:
+                    rows = conn.execute(text(
+                        f"SELECT pid, token_ids, surfaces, source_hash, updated_at FROM {TBL_TOKENS}"
+                    )).fetchall()
+                else:
+                    rows = conn.execute(text(f"""
+                        SELECT pid, token_ids, surfaces, source_hash, updated_at
+                        FROM {TBL_TOKENS} WHERE updated_at >= :ts
+                    """), {"ts": self._last_updated}).fetchall()
+
+            vocab_by_id = {vid: sys.intern(name) for vid, name in vocab_rows}
+            tokens = dict(self._tokens)
+            last = self._last_updated
+            for pid, blob, surfaces_json, h, updated_at in rows:
+                ids = _unpack_ids(blob)
+                surfaces = [_intern(s) for s in json.loads(surfaces_json or "[]")]
+                norms = [vocab_by_id.get(i) if i else _intern(normalize_name(s))
+                         for i, s in zip(ids, surfaces)]
+                tokens[pid] = ProductTokens(surfaces, norms, ids, h)
+                if updated_at is not None and (last is None or updated_at > last):
+                    last = updated_at
+
+            # 참조 교체로 원자적 반영
+            self._vocab_by_id = vocab_by_id
+            self._tokens = tokens
+            self._last_updated = last
+            self.loaded = True
+            return len(rows)
+
+    def get(self, pid: Optional[int], ingredients_str: Optional[str] = None) -> Optional[ProductTokens]:
+        """
+        저장된 토큰 반환. ingredients_str 이 주어지면 지문이 같을 때만 반환(동기화 전 변경 방지).
+        """
+        if pid is None:
+            return None
+        toks = self._tokens.get(pid)
+        if toks is None:
+            return None
+        if ingredients_str is not None and toks.source_hash != source_hash(ingredients_str):
+            return None
+        return toks
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+
+_STORE = TokenStore()
+_STOP_EVENT = threading.Event()
+
+
+def get_token_store() -> TokenStore:
+    return _STORE
+
+
+def get_product_tokens(pid: Optional[int], ingredients_str: Optional[str] = None) -> ProductTokens:
+    """스토어 우선, 없으면 즉석 토큰화 폴백"""
+    toks = _STORE.get(pid, ingredients_str)
+    if toks is not None:
+        return toks
+    return tokenize_ingredients(ingredients_str)
+
+
+def product_surfaces(pid: Optional[int], raw_ingredients: Optional[str] = None) -> Optional[List[str]]:
+    """
+    챗/OCR 등 원문 표기만 필요한 곳용.
+    raw_ingredients 가 주어지면 그 문자열과 지문이 같은 경우에만 반환 (다른 컬럼/테이블 보호)
+    스토어에 없으면 None → 호출부 기존 분할 로직 사용
+    """
+    toks = _STORE.get(pid, raw_ingredients)
+    return list(toks.surfaces) if toks is not None else None
+
+
+_REFRESH_THREAD: Optional[threading.Thread] = None
+
+
+def start_background_refresh(interval: int = STORE_REFRESH_SEC):
+    """서버 시작 시 1회 적재 + 주기적 증분 갱신 스레드 기동"""
+    global _REFRESH_THREAD
+    try:
+        n = _STORE.refresh()
+        print(f"[INGREDIENT_TOKENS] 토큰 스토어 적재: {n}개 제품")
+    except Exception as e:
+        print(f"⚠️ 토큰 스토어 적재 실패(문자열 즉석 분할로 대체): {e}")
+
+    def _loop():
+        while not _STOP_EVENT.wait(interval):
+            try:
+                _STORE.refresh()
+            except Exception as e:
+                print(f"❌ 토큰 스토어 갱신 실패: {e}")
+
+    if _REFRESH_THREAD is not None and _REFRESH_THREAD.is_alive():
+        return
+    _STOP_EVENT.clear()
+    _REFRESH_THREAD = threading.Thread(target=_loop, name="ingredient-token-store", daemon=True)
+    _REFRESH_THREAD.start()
+
+
+def stop_background_refresh():
+    _STOP_EVENT.set()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="product_ingredient_tokens 동기화")
+    ap.add_argument("--full", action="store_true", help="지문과 무관하게 전체 재토큰화")
+    args = ap.parse_args()
+    sync_product_tokens(full=args.full)
@@ -8,74 +8,139 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Body
 from fastapi.responses import JSONResponse
 import os
-import io
 import re
 import difflib
-import tempfile
 from typing import Dict, List, Optional, Any
 
 from dotenv import load_dotenv, find_dotenv
 from google.cloud import vision
 from PIL import Image  # 사용 가능성 대비
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.engine import Engine
-from urllib.parse import quote_plus
+
+from db import engine as shared_engine
+
+from .ingredient_tokens import product_surfaces
+from .caution_table import FLAG_KEYS, FLAG_MESSAGES, get_caution_table
+from .caution_table import summarize as summarize_caution
+from .ocr_executor import run_ocr
+from .product_name_index import get_product_index, identify_product
+from .ocr_upload import ImageInput, load_image_bytes, read_upload
+from .image_preprocess import prepare_for_vision
+from .ocr_layout import (OcrLayout, cached_layout, cached_layouts, ingredient_block_text,
+                         layout_from_annotation, merge_layouts)
 
 router = APIRouter(prefix="/ocr", tags=["ocr"])
 
+# 다중 이미지 OCR 한 번에 받을 최대 장수 (Vision 배치 요청 1회 = 최대 16장)
+MAX_BATCH_IMAGES = min(16, int(os.getenv("OCR_MAX_BATCH_IMAGES", "6")))
+
 # ============================================
-# DB 연결 (프로토 동일)
+# DB 연결: db.py 의 프로세스 공용 엔진(커넥션 풀) 재사용
 # ============================================
 def get_engine() -> Engine:
-    load_dotenv()
-    dialect = os.getenv("DB_DIALECT", "{DB_DIALECT}")
-    host    = os.getenv("DB_HOST", "{DB_HOST}")
-    port    = os.getenv("DB_PORT", "{DB_PORT}")
-    user    = os.getenv("DB_USER", "{DB_USER}")
-    pw      = os.getenv("DB_PASSWORD", "{DB_PASSWORD}")
-    name    = os.getenv("DB_NAME", "{DB_NAME}")
-    dsn = f"{dialect}://{quote_plus(user)}:{quote_plus(pw)}@{host}:{port}/{quote_plus(name)}?charset=utf8mb4"
-    return create_engine(dsn, pool_pre_ping=True, future=True)
+    return shared_engine
+
+def _ingredient_list(pid, raw: Optional[str]) -> List[str]:
+    """사전 토큰화된 성분(product_ingredient_tokens) 우선, 없으면 기존 콤마 분할"""
+    if not raw:
+        return []
+    surfaces = product_surfaces(pid, raw)
+    return surfaces if surfaces is not None else raw.split(",")
+
+def _product_dict(row) -> Dict[str, Any]:
+    """(product_name, brand, image_url, price_krw, capacity, ingredients, ..., pid) 행 → 결과 dict"""
+    return {
+        "product_name": row[0], "brand": row[1], "image_url": row[2],
+        "price_krw": row[3], "capacity": row[4],
+        "ingredients": _ingredient_list(row[-1], row[5])
+    }
 
 # ============================================
 # OCR + 검증 (프로토 동일)
 # ============================================
-def extract_text_from_image(image_path: str) -> Optional[str]:
+def extract_layout_from_image(image: ImageInput) -> Optional[OcrLayout]:
+    """
+    image: 파일 경로 또는 bytes/memoryview (업로드 버퍼를 복사 없이 그대로 받음)
+    같은 이미지(SHA-256, 선택적으로 dHash)는 OCR 캐시에서, 아니면 Vision document_text_detection
+    반환: 전체 텍스트 + 블록/문단 레이아웃
+    """
     try:
-        # 1) .env 있으면 로드, 없어도 통과
-        base_dir = ""
-        try:
-            dotenv_path = find_dotenv()
-            if dotenv_path:
-                load_dotenv(dotenv_path)
-                base_dir = os.path.dirname(dotenv_path)
-        except Exception:
-            pass  # .env 강제 의존 제거
+        content = load_image_bytes(image)
+    except Exception as e:
+        print(f"OCR 추출 오류: {e}")
+        return None
+    return cached_layout("document_layout", content, lambda: _vision_document_layout(content))
 
-        # 2) 환경변수 우선
-        json_path = (os.getenv("GOOGLE_APPLICATION_CREDENTIALS") or "").strip()
-        if not json_path:
-            raise Exception("GOOGLE_APPLICATION_CREDENTIALS not set")
+def extract_text_from_image(image: ImageInput) -> Optional[str]:
+    layout = extract_layout_from_image(image)
+    return layout.text if layout else None
+
+def _vision_client() -> vision.ImageAnnotatorClient:
+    # 1) .env 있으면 로드, 없어도 통과
+    base_dir = ""
+    try:
+        dotenv_path = find_dotenv()
+        if dotenv_path:
+            load_dotenv(dotenv_path)
+            base_dir = os.path.dirname(dotenv_path)
+    except Exception:
+        pass  # .env 강제 의존 제거
 
-        # 3) 상대경로면 .env 기준으로 보정
-        if not os.path.isabs(json_path) and base_dir:
-            json_path = os.path.join(base_dir, json_path)
+    # 2) 환경변수 우선
+    json_path = (os.getenv("GOOGLE_APPLICATION_CREDENTIALS") or "").strip()
+    if not json_path:
+        raise Exception("GOOGLE_APPLICATION_CREDENTIALS not set")
 
-        if not os.path.exists(json_path):
-            raise Exception(f"서비스키 파일이 없습니다: {json_path}")
+    # 3) 상대경로면 .env 기준으로 보정
+    if not os.path.isabs(json_path) and base_dir:
+        json_path = os.path.join(base_dir, json_path)
 
-        client = vision.ImageAnnotatorClient.from_service_account_json(json_path)
-        with io.open(image_path, "rb") as f:
-            content = f.read()
-        image = vision.Image(content=content)
+    if not os.path.exists(json_path):
+        raise Exception(f"서비스키 파일이 없습니다: {json_path}")
+
+    return vision.ImageAnnotatorClient.from_service_account_json(json_path)
+
+def _vision_document_layout(content) -> Optional[OcrLayout]:
+    try:
+        client = _vision_client()
+        image = vision.Image(content=prepare_for_vision(content))
         resp = client.document_text_detection(image=image)
         if resp.error.message:
             raise Exception(f"Vision API 오류: {resp.error.message}")
-        return resp.full_text_annotation.text
+        return layout_from_annotation(resp.full_text_annotation)
     except Exception as e:
         print(f"OCR 추출 오류: {e}")
         return None
 
+def _vision_document_layouts(contents: List) -> List[Optional[OcrLayout]]:
+    """여러 이미지를 batch_annotate_images 요청 1회로 (이미지별 실패는 None)"""
+    try:
+        client = _vision_client()
+        feature = vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
+        requests = [
+            vision.AnnotateImageRequest(image=vision.Image(content=prepare_for_vision(c)), features=[feature])
+            for c in contents
+        ]
+        resp = client.batch_annotate_images(requests=requests)
+    except Exception as e:
+        print(f"OCR 배치 추출 오류: {e}")
+        return [None] * len(contents)
+
+    layouts: List[Optional[OcrLayout]] = []
+    for i, r in enumerate(resp.responses):
+        if r.error.message:
+            print(f"OCR 추출 오류 (이미지 {i + 1}): Vision API 오류: {r.error.message}")
+            layouts.append(None)
+        else:
+            layouts.append(layout_from_annotation(r.full_text_annotation))
+    return layouts + [None] * (len(contents) - len(layouts))
+
+def extract_layouts_from_images(images: List[ImageInput]) -> List[Optional[OcrLayout]]:
+    """여러 이미지의 레이아웃 (캐시 적중분 제외하고 Vision 배치 요청 1회)"""
+    contents = [load_image_bytes(img) for img in images]
+    return cached_layouts("document_layout", contents, _vision_document_layouts)
+
 def validate_cosmetic_image(ocr_text: str) -> Dict[str, Any]:
     if not ocr_text or len(ocr_text.strip()) < 10:
         return {
@@ -98,10 +163,10 @@ def validate_cosmetic_image(ocr_text: str) -> Dict[str, Any]:
 # 분석기 (프로토 동일)
 # ============================================
 class CosmeticAnalyzer:
-    def __init__(self):
-        self.engine = get_engine()
+    def __init__(self, engine: Optional[Engine] = None):
+        self.engine = engine or get_engine()
 
-    def analyze_from_text(self, ocr_text: str) -> Optional[Dict[str, Any]]:
+    def analyze_from_text(self, ocr_text: str, layout: Optional[OcrLayout] = None) -> Optional[Dict[str, Any]]:
         validation = validate_cosmetic_image(ocr_text)
         if not validation["is_valid"]:
             pass
@@ -118,20 +183,30 @@ class CosmeticAnalyzer:
                 product_candidates.append(line)
 
         product_data = None
-        clean_search_text = " ".join(product_candidates)
-        print(f"[DEBUG] FTS Search Text: '{clean_search_text}'")
-        if clean_search_text:
-            product_data = self._fuzzy_search_product(clean_search_text)
-
-        if not product_data:
-            print("[DEBUG] FTS Failed. Falling back to LIKE search...")
-            for c in product_candidates:
-                product_data = self._search_product_by_name(c, use_fts=False)
-                if product_data:
-                    break
+        if get_product_index().loaded:
+            # 인메모리 3-gram 색인으로 전체 카탈로그와 한 번에 대조 (DB 스캔 없음)
+            match = identify_product(product_candidates)
+            if match:
+                print(f"[DEBUG] Product Index Match: '{match.product_name}' "
+                      f"(score {match.score:.2f}, dice {match.dice:.0%}, query '{match.query}')")
+                product_data = self._fetch_product_by_pid(match.pid)
+            else:
+                print("[DEBUG] Product Index: no match")
+        else:
+            clean_search_text = " ".join(product_candidates)
+            print(f"[DEBUG] FTS Search Text: '{clean_search_text}'")
+            if clean_search_text:
+                product_data = self._fuzzy_search_product(clean_search_text)
+
+            if not product_data:
+                print("[DEBUG] FTS Failed. Falling back to LIKE search...")
+                for c in product_candidates:
+                    product_data = self._search_product_by_name(c, use_fts=False)
+                    if product_data:
+                        break
 
         if not product_data:
-            ocr_ingredients = self._extract_ingredients_from_ocr(ocr_text)
+            ocr_ingredients = self._extract_ingredients_from_ocr(ocr_text, layout)
             caution = self._query_caution_ingredients(ocr_ingredients)
             return {
                 "source":"ocr_direct_analysis",
@@ -155,10 +230,14 @@ class CosmeticAnalyzer:
             "validation": validation
         }
 
-    def _extract_ingredients_from_ocr(self, ocr_text: str) -> List[str]:
+    def _extract_ingredients_from_ocr(self, ocr_text: str, layout: Optional[OcrLayout] = None) -> List[str]:
         try:
-            m = re.search(r"전성분|ingredients", ocr_text, re.IGNORECASE)
-            if m:
+            # 레이아웃이 있으면 전성분 영역만 사용 (광고 문구/사용법/주의사항 제외)
+            block = ingredient_block_text(layout)
+            m = None if block else re.search(r"전성분|ingredients", ocr_text, re.IGNORECASE)
+            if block:
+                s = block
+            elif m:
                 s = ocr_text[m.end():].strip(": \n")
             else:
                 s = ocr_text
@@ -191,7 +270,8 @@ class CosmeticAnalyzer:
                 if use_fts:
                     q_fts = text("""
                         SELECT product_name,brand,image_url,price_krw,capacity,ingredients,
-                               MATCH(product_name) AGAINST(:name IN NATURAL LANGUAGE MODE) AS relevance_score
+                               MATCH(product_name) AGAINST(:name IN NATURAL LANGUAGE MODE) AS relevance_score,
+                               pid
                         FROM product_data
                         WHERE MATCH(product_name) AGAINST(:name IN NATURAL LANGUAGE MODE)
                         ORDER BY relevance_score DESC
@@ -202,30 +282,38 @@ class CosmeticAnalyzer:
                         result = r
                 if not result:
                     q_like = text("""
-                        SELECT product_name,brand,image_url,price_krw,capacity,ingredients
+                        SELECT product_name,brand,image_url,price_krw,capacity,ingredients,pid
                         FROM product_data
                         WHERE product_name LIKE :name
                         LIMIT 1
                     """)
                     r = conn.execute(q_like, {"name": f"%{product_name}%"}).fetchone()
                     result = r
-                if result:
-                    return {
-                        "product_name": result[0], "brand": result[1], "image_url": result[2],
-                        "price_krw": result[3], "capacity": result[4],
-                        "ingredients": result[5].split(",") if result[5] else []
-                    }
-                return None
+                return _product_dict(result) if result else None
         except Exception as e:
             print(f"DB 검색 오류 (_search_product_by_name): {e}")
             return None
 
+    def _fetch_product_by_pid(self, pid: int) -> Optional[Dict[str, Any]]:
+        try:
+            with self.engine.connect() as conn:
+                row = conn.execute(text("""
+                    SELECT product_name,brand,image_url,price_krw,capacity,ingredients,pid
+                    FROM product_data
+                    WHERE pid = :pid
+                """), {"pid": pid}).fetchone()
+                return _product_dict(row) if row else None
+        except Exception as e:
+            print(f"DB 검색 오류 (_fetch_product_by_pid): {e}")
+            return None
+
     def _fuzzy_search_product(self, clean_search_text: str) -> Optional[Dict[str, Any]]:
         try:
             with self.engine.connect() as conn:
                 q = text("""
                     SELECT product_name,brand,image_url,price_krw,capacity,ingredients,
-                           MATCH(product_name) AGAINST(:text IN NATURAL LANGUAGE MODE) AS relevance_score
+                           MATCH(product_name) AGAINST(:text IN NATURAL LANGUAGE MODE) AS relevance_score,
+                           pid
                     FROM product_data
                     WHERE MATCH(product_name) AGAINST(:text IN NATURAL LANGUAGE MODE)
                     ORDER BY relevance_score DESC
@@ -245,11 +333,7 @@ class CosmeticAnalyzer:
                         best = row
                 if best and best_ratio >= 0.6:
                     print(f"[DEBUG] FTS Best Match Found (SimRatio: {best_ratio:.0%})")
-                    return {
-                        "product_name": best[0], "brand": best[1], "image_url": best[2],
-                        "price_krw": best[3], "capacity": best[4],
-                        "ingredients": best[5].split(",") if best[5] else []
-                    }
+                    return _product_dict(best)
                 else:
                     print(f"[DEBUG] FTS Failed (Best SimRatio {best_ratio:.0%} < 60%)")
                     return None
@@ -260,6 +344,14 @@ class CosmeticAnalyzer:
     def _query_caution_ingredients(self, ingredients: List[str]) -> Dict[str, List[Dict[str, Any]]]:
         if not ingredients:
             return {"official": [], "ml_predicted": []}
+        try:
+            # 메모리 테이블 조회 (공식 + ML 한 번에)
+            return get_caution_table().query(ingredients)
+        except Exception as e:
+            print(f"⚠️ 주의 성분 테이블 사용 불가(DB 조회로 대체): {e}")
+        return self._query_caution_ingredients_db(ingredients)
+
+    def _query_caution_ingredients_db(self, ingredients: List[str]) -> Dict[str, List[Dict[str, Any]]]:
         try:
             with self.engine.connect() as conn:
                 ph = ",".join([":ing"+str(i) for i in range(len(ingredients))])
@@ -362,113 +454,18 @@ def format_analysis_for_chat(analysis_result: Dict[str, Any]) -> Dict[str, Any]:
                 out.append(f"  {desc}")
         out.append("\n")
 
-        # ─────────────────────────────────────────
-    # 🧾 과학적 요약 (주의 성분 개수·등급·종류 기반)
     # ─────────────────────────────────────────
-    def _grade_to_score(g: str) -> float:
-        """
-        caution_grade를 0~3 점수로 정규화.
-        - 문자열 등급(주의, 비안전 등) + 숫자(0~10) 모두 대응
-        """
-        if g is None:
-            return 0.0
-
-        # 원본 문자열 정리
-        s = str(g).strip().lower()
-
-        # 흔한 포맷 제거: "등급: xxx", "예측 등급: xxx", 대괄호 등
-        for prefix in ["등급:", "예측 등급:", "grade:", "predicted:"]:
-            if s.startswith(prefix):
-                s = s[len(prefix):].strip()
-        s = s.replace("[", "").replace("]", "").strip()
-
-        # 1) 키워드 기반 분류 (부분 포함으로 판정)
-        #   - 최상위 위험 → 3.0
-        if any(k in s for k in ["고위험", "매우위험", "very high", "high risk"]):
-            return 3.0
-        if any(k in s for k in ["위험", "high"]):
-            return 3.0
-
-        #   - 중간~주의 수준 → 2.0
-        if any(k in s for k in ["비안전", "주의", "중간", "보통", "moderate", "medium"]):
-            return 2.0
-
-        #   - 낮은 위험·대체로 안전 → 0.5
-        if any(k in s for k in ["저위험", "낮음", "low", "안전"]):
-            return 0.5
-
-        # 2) 숫자 등급(예: "7", "7.5") → 0~3 스케일링
-        tmp = s.replace(".", "", 1)
-        if tmp.isdigit():
-            val = float(s)
-            return max(0.0, min(3.0, (val / 10.0) * 3.0))
-
-        # 3) 그 외는 정보 부족 → 0점
-        return 0.0
-
-
-    def _tag_flags(name: str) -> dict:
-        """성분명 키워드로 특성 플래그 추출"""
-        n = (name or "").lower()
-        return {
-            "fragrance": any(k in n for k in ["fragrance", "향료", "퍼퓸", "리모넨", "리날룰", "제라니올", "시트로넬롤"]),
-            "alcohol": any(k in n for k in ["alcohol", "에탄올"]),
-            "acid": any(k in n for k in ["aha", "bha", "pha", "salicylic", "glycolic", "lactic", "mandelic", "아하", "비하", "살리실"]),
-            "retinoid": any(k in n for k in ["retinol", "retinal", "비타민 a"]),
-            "oil": any(k in n for k in ["oil", "오일", "essential oil", "정유"]),
-            "silicone": any(k in n for k in ["siloxane", "silicone", "디메치콘", "디메티콘"]),
-        }
-
-    # 공식/ML 합치되, 신뢰도 가중치 부여(ML은 0.7배)
-    weighted = []
-    flags_acc = {"fragrance":0, "alcohol":0, "acid":0, "retinoid":0, "oil":0, "silicone":0}
-
-    for ing in official:
-        sc = _grade_to_score(ing.get("caution_grade"))
-        nm = ing.get("korean_name") or ""
-        flags = _tag_flags(nm)
-        for k,v in flags.items():
-            flags_acc[k] += int(v)
-        weighted.append(("official", nm, sc))
-
-    for ing in mlp:
-        sc = _grade_to_score(ing.get("caution_grade")) * 0.7  # ML은 신뢰도 70%
-        nm = ing.get("korean_name") or ""
-        flags = _tag_flags(nm)
-        for k,v in flags.items():
-            flags_acc[k] += int(v)
-        weighted.append(("ml", nm, sc))
-
-    total_cnt = len(weighted)
-    avg_score = (sum(x[2] for x in weighted) / total_cnt) if total_cnt else 0.0
-    max_score = max([x[2] for x in weighted], default=0.0)
-
-    # 위험도 판단(평균 + 최대치 함께 고려)
-    # - max가 높으면 국소 자극 위험, avg가 높으면 전반적 리스크 증가
-    if total_cnt == 0:
-        risk_level = "낮음"
-    else:
-        if max_score >= 2.5 or avg_score >= 2.0:
-            risk_level = "높음"
-        elif max_score >= 1.5 or avg_score >= 1.0:
-            risk_level = "중간"
-        else:
-            risk_level = "낮음"
+    # 🧾 과학적 요약 (주의 성분 개수·등급·종류 기반, 사전 컴파일 테이블 집계)
+    # ─────────────────────────────────────────
+    summary = summarize_caution(official, mlp)
+    total_cnt = summary["total_count"]
+    avg_score = summary["avg_score"]
+    max_score = summary["max_score"]
+    risk_level = summary["risk_level"]
+    flags_acc = summary["flags"]
 
     # 특성 플래그 문장 생성
-    flag_msgs = []
-    if flags_acc["fragrance"] > 0:
-        flag_msgs.append("향료/에센셜오일 성분 포함")
-    if flags_acc["alcohol"] > 0:
-        flag_msgs.append("알코올계 성분 포함")
-    if flags_acc["acid"] > 0:
-        flag_msgs.append("AHA/BHA 등 각질 케어 성분 포함")
-    if flags_acc["retinoid"] > 0:
-        flag_msgs.append("레티노이드(비타민 A 계열) 포함")
-    if flags_acc["oil"] > 0:
-        flag_msgs.append("오일 성분 다수")
-    if flags_acc["silicone"] > 0:
-        flag_msgs.append("실리콘계 성분 포함")
+    flag_msgs = [FLAG_MESSAGES[k] for k in FLAG_KEYS if flags_acc[k] > 0]
 
     # 요약 헤더
     out.append("### 🧾 분석 요약")
@@ -507,21 +504,49 @@ def format_analysis_for_chat(analysis_result: Dict[str, Any]) -> Dict[str, Any]:
     return {"text": "\n".join(out), "image_url": img_url}
 
 
+_ANALYZER: Optional[CosmeticAnalyzer] = None
+
+def get_analyzer() -> CosmeticAnalyzer:
+    """요청마다 새로 만들지 않고 재사용하는 분석기 (상태 없음, 공용 엔진 사용)"""
+    global _ANALYZER
+    if _ANALYZER is None:
+        _ANALYZER = CosmeticAnalyzer()
+    return _ANALYZER
+
 # ============================================
 # 메인 처리/검색 (프로토 동일)
 # ============================================
-def process_cosmetic_image(image_path: str) -> Dict[str, Any]:
-    txt = extract_text_from_image(image_path)
+def process_cosmetic_image(image: ImageInput) -> Dict[str, Any]:
+    layout = extract_layout_from_image(image)
+    txt = layout.text if layout else None
     if not txt:
         return {"success": False, "error": "OCR 텍스트 추출 실패", "data": None}
-    analyzer = CosmeticAnalyzer()
-    res = analyzer.analyze_from_text(txt)
+    analyzer = get_analyzer()
+    res = analyzer.analyze_from_text(txt, layout)
+    if res:
+        return {"success": True, "error": None, "data": res}
+    return {"success": False, "error": "화장품 정보를 찾을 수 없습니다.", "data": None}
+
+def process_cosmetic_images(images: List[ImageInput]) -> Dict[str, Any]:
+    """
+    앞면/뒷면 등 여러 장을 한 제품으로 분석.
+    전성분 영역이 없는 장(앞면 라벨)을 앞에 두어 제품명 후보로 쓰고,
+    합친 레이아웃에서 전성분 영역(뒷면 라벨)을 추출해 분석 1회
+    """
+    layouts = [l for l in extract_layouts_from_images(images) if l and l.text]
+    if not layouts:
+        return {"success": False, "error": "OCR 텍스트 추출 실패", "data": None}
+    layouts.sort(key=lambda l: ingredient_block_text(l) is not None)
+    merged = merge_layouts(layouts)
+    analyzer = get_analyzer()
+    res = analyzer.analyze_from_text(merged.text, merged)
     if res:
+        res["image_count"] = len(layouts)
         return {"success": True, "error": None, "data": res}
     return {"success": False, "error": "화장품 정보를 찾을 수 없습니다.", "data": None}
 
 def search_product_by_name(product_name: str) -> Dict[str, Any]:
-    analyzer = CosmeticAnalyzer()
+    analyzer = get_analyzer()
     res = analyzer.analyze_from_product_name(product_name)
     if res:
         return {"success": True, "error": None, "data": res}
@@ -531,27 +556,51 @@ def search_product_by_name(product_name: str) -> Dict[str, Any]:
 # FastAPI Endpoints (프론트에서 호출)
 # ============================================
 
+def _process_and_format(image: ImageInput):
+    result = process_cosmetic_image(image)
+    return result, format_analysis_for_chat(result)
+
+def _process_many_and_format(images: List[ImageInput]):
+    result = process_cosmetic_images(images)
+    return result, format_analysis_for_chat(result)
+
+def _search_and_format(product_name: str):
+    result = search_product_by_name(product_name)
+    return result, format_analysis_for_chat(result)
+
 @router.post("/upload")
 async def ocr_upload(image: UploadFile = File(...)):
     if not image.content_type or not image.content_type.startswith("image/"):
         raise HTTPException(400, "image 파일을 업로드해주세요.")
-    # 임시 저장
-    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(image.filename or "")[-1]) as tmp:
-        content = await image.read()
-        tmp.write(content)
-        tmp_path = tmp.name
-    try:
-        result = process_cosmetic_image(tmp_path)
-        formatted = format_analysis_for_chat(result)
-        return JSONResponse({
-            "success": result.get("success", False),
-            "markdown": formatted.get("text"),
-            "image_url": formatted.get("image_url"),
-            "raw": result
-        })
-    finally:
-        try: os.remove(tmp_path)
-        except: pass
+    # 임시 파일 없이 메모리 버퍼로 (크기 상한 초과 시 413)
+    content = await read_upload(image)
+    # Vision 호출 + DB 검색은 OCR 전용 실행기에서 (이벤트 루프 차단 방지)
+    result, formatted = await run_ocr(_process_and_format, content)
+    return JSONResponse({
+        "success": result.get("success", False),
+        "markdown": formatted.get("text"),
+        "image_url": formatted.get("image_url"),
+        "raw": result
+    })
+
+@router.post("/upload-multi")
+async def ocr_upload_multi(images: List[UploadFile] = File(...)):
+    """앞면/뒷면 라벨 등 여러 장을 Vision 배치 요청 1회 + 분석 1회로"""
+    if not images:
+        raise HTTPException(400, "image 파일을 업로드해주세요.")
+    if len(images) > MAX_BATCH_IMAGES:
+        raise HTTPException(400, f"이미지는 최대 {MAX_BATCH_IMAGES}장까지 업로드할 수 있습니다.")
+    for image in images:
+        if not image.content_type or not image.content_type.startswith("image/"):
+            raise HTTPException(400, "image 파일을 업로드해주세요.")
+    contents = [await read_upload(image) for image in images]
+    result, formatted = await run_ocr(_process_many_and_format, contents)
+    return JSONResponse({
+        "success": result.get("success", False),
+        "markdown": formatted.get("text"),
+        "image_url": formatted.get("image_url"),
+        "raw": result
+    })
 
 @router.post("/by-name")
 async def ocr_by_name(
@@ -566,8 +615,7 @@ async def ocr_by_name(
     if not product_name or not product_name.strip():
         raise HTTPException(400, "product_name is required")
 
-    result = search_product_by_name(product_name.strip())
-    formatted = format_analysis_for_chat(result)
+    result, formatted = await run_ocr(_search_and_format, product_name.strip())
     return JSONResponse({
         "success": result.get("success", False),
         "markdown": formatted.get("text"),
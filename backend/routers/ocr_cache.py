@@ -0,0 +1,241 @@
+# backend/routers/ocr_cache.py
+# ============================================
+# OCR 결과(Vision 전체 텍스트) 캐시
+# - 키: (호출 종류, 업로드 바이트 SHA-256)
+# - 선택: dHash(64bit) 해밍 거리로 재인코딩된 같은 사진도 적중 (OCR_CACHE_PHASH=1)
+# - 1차: 프로세스 메모리 LRU+TTL, 2차: sqlite 디스크 (워커 재시작 후에도 유지)
+# 적중 시 Vision 호출을 완전히 건너뛴다
+# ============================================
+
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+from .ttl_cache import TTLCache
+
+MEM_SIZE = int(os.getenv("OCR_CACHE_SIZE", "512"))
+TTL_SEC = float(os.getenv("OCR_CACHE_TTL_SEC", str(7 * 24 * 3600)))
+DISK_MAX_ROWS = int(os.getenv("OCR_CACHE_DISK_MAX", "20000"))
+DISK_PATH = os.getenv(
+    "OCR_CACHE_DB",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "ocr_cache.sqlite3")
+)
+PHASH_ENABLED = os.getenv("OCR_CACHE_PHASH", "0") == "1"
+PHASH_MAX_DIST = int(os.getenv("OCR_CACHE_PHASH_MAX_DIST", "2"))
+_PRUNE_EVERY = 200   # 디스크 행 수 확인 주기 (저장 횟수)
+
+_MEM = TTLCache(maxsize=MEM_SIZE, ttl=TTL_SEC)
+_DISK_LOCK = threading.Lock()
+_disk_ready = False
+_disk_disabled = False
+_puts = 0
+_puts_lock = threading.Lock()
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def dhash(data: bytes) -> Optional[int]:
+    """9x8 그레이스케일 차분 해시 (디코딩 실패 시 None)"""
+    try:
+        from PIL import Image
+        with Image.open(io.BytesIO(data)) as img:
+            px = list(img.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    except Exception:
+        return None
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (1 if px[row * 9 + col] > px[row * 9 + col + 1] else 0)
+    return value
+
+
+class ImageKey:
+    """업로드 1건의 캐시 키 (SHA-256 은 즉시, dHash 는 처음 필요할 때 1회만 디코딩)"""
+
+    __slots__ = ("data", "sha", "_dh", "_dh_done")
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.sha = content_hash(data)
+        self._dh: Optional[int] = None
+        self._dh_done = False
+
+    def dhash(self) -> Optional[int]:
+        if not self._dh_done:
+            self._dh = dhash(self.data)
+            self._dh_done = True
+        return self._dh
+
+
+def _to_signed64(v: int) -> int:
+    # sqlite INTEGER 는 부호 있는 64bit
+    return v - (1 << 64) if v >= (1 << 63) else v
+
+
+def _from_signed64(v: int) -> int:
+    return v + (1 << 64) if v < 0 else v
+
+
+# ============================================
+# 디스크 계층 (sqlite)
+# ============================================
+def _connect() -> Optional[sqlite3.Connection]:
+    global _disk_ready, _disk_disabled
+    if _disk_disabled:
+        return None
+    try:
+        if not _disk_ready:
+            os.makedirs(os.path.dirname(DISK_PATH), exist_ok=True)
+        conn = sqlite3.connect(DISK_PATH, timeout=5)
+        if not _disk_ready:
+            with _DISK_LOCK:
+                if not _disk_ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS ocr_text (
+                            kind TEXT NOT NULL,
+                            sha256 TEXT NOT NULL,
+                            dhash INTEGER,
+                            text TEXT NOT NULL,
+                            created_at REAL NOT NULL,
+                            PRIMARY KEY (kind, sha256)
+                        )
+                    """)
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_text_created ON ocr_text (created_at)")
+                    conn.commit()
+                    _disk_ready = True
+        return conn
+    except Exception as e:
+        print(f"⚠️ OCR 디스크 캐시 사용 불가(메모리 캐시만 사용): {e}")
+        _disk_disabled = True
+        return None
+
+
+def _disk_get(kind: str, sha: str) -> Optional[str]:
+    conn = _connect()
+    if conn is None:
+        return None
+    try:
+        row = conn.execute(
+            "SELECT text, created_at FROM ocr_text WHERE kind = ? AND sha256 = ?", (kind, sha)
+        ).fetchone()
+    except Exception as e:
+        print(f"⚠️ OCR 디스크 캐시 조회 실패(미적중 처리): {e}")
+        return None
+    finally:
+        conn.close()
+    if row and (not TTL_SEC or time.time() - row[1] <= TTL_SEC):
+        return row[0]
+    return None
+
+
+def _disk_find_similar(kind: str, dh: int) -> Optional[Tuple[str, str]]:
+    """해밍 거리 PHASH_MAX_DIST 이하인 가장 가까운 항목 (sha256, text)"""
+    conn = _connect()
+    if conn is None:
+        return None
+    try:
+        # 해시만 읽어 비교하고, 텍스트(레이아웃 JSON)는 가장 가까운 1건만 조회
+        best = None
+        for sha, stored in conn.execute(
+            "SELECT sha256, dhash FROM ocr_text WHERE kind = ? AND dhash IS NOT NULL AND created_at >= ?",
+            (kind, time.time() - TTL_SEC if TTL_SEC else 0)
+        ):
+            dist = bin(_from_signed64(stored) ^ dh).count("1")
+            if dist <= PHASH_MAX_DIST and (best is None or dist < best[0]):
+                best = (dist, sha)
+        if best is None:
+            return None
+        row = conn.execute(
+            "SELECT text FROM ocr_text WHERE kind = ? AND sha256 = ?", (kind, best[1])
+        ).fetchone()
+    except Exception as e:
+        print(f"⚠️ OCR 디스크 캐시 유사 이미지 조회 실패(미적중 처리): {e}")
+        return None
+    finally:
+        conn.close()
+    return (best[1], row[0]) if row else None
+
+
+def _disk_put(kind: str, sha: str, dh: Optional[int], text: str):
+    global _puts
+    conn = _connect()
+    if conn is None:
+        return
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO ocr_text (kind, sha256, dhash, text, created_at) VALUES (?, ?, ?, ?, ?)",
+            (kind, sha, _to_signed64(dh) if dh is not None else None, text, time.time())
+        )
+        with _puts_lock:
+            _puts += 1
+            check = _puts % _PRUNE_EVERY == 0
+        if check:
+            # 행 수 상한: 오래된 항목부터 정리
+            (count,) = conn.execute("SELECT COUNT(*) FROM ocr_text").fetchone()
+            if count > DISK_MAX_ROWS:
+                conn.execute("""
+                    DELETE FROM ocr_text WHERE rowid IN (
+                        SELECT rowid FROM ocr_text ORDER BY created_at ASC LIMIT ?
+                    )
+                """, (count - DISK_MAX_ROWS,))
+        conn.commit()
+    except Exception as e:
+        print(f"⚠️ OCR 디스크 캐시 저장 실패: {e}")
+    finally:
+        conn.close()
+
+
+# ============================================
+# 공개 API
+# ============================================
+def lookup(kind: str, data: bytes, key: Optional[ImageKey] = None) -> Optional[str]:
+    """캐시된 OCR 텍스트 (없으면 None). 같은 업로드로 store 할 예정이면 key 를 넘겨 해시 재계산을 피한다"""
+    key = key or ImageKey(data)
+    sha = key.sha
+    text = _MEM.get((kind, sha))
+    if text is not None:
+        return text
+    text = _disk_get(kind, sha)
+    if text is None and PHASH_ENABLED:
+        dh = key.dhash()
+        if dh is not None:
+            similar = _disk_find_similar(kind, dh)
+            if similar:
+                print(f"[OCR_CACHE] 지각 해시 적중 ({kind}) {sha[:12]} ≈ {similar[0][:12]}")
+                text = similar[1]
+    if text is not None:
+        _MEM.set((kind, sha), text)
+    return text
+
+
+def store(kind: str, data: bytes, text: str, key: Optional[ImageKey] = None):
+    key = key or ImageKey(data)
+    _MEM.set((kind, key.sha), text)
+    _disk_put(kind, key.sha, key.dhash() if PHASH_ENABLED else None, text)
+
+
+def get_or_compute(kind: str, data: bytes, compute: Callable[[], Optional[str]]) -> Optional[str]:
+    """
+    적중하면 Vision 을 호출하지 않고 캐시 텍스트 반환.
+    미적중 시 compute() 결과가 비어 있지 않을 때만 저장 (실패/빈 결과는 재시도 가능하게)
+    """
+    key = ImageKey(data)
+    cached = lookup(kind, data, key)
+    if cached is not None:
+        return cached
+    text = compute()
+    if text:
+        store(kind, data, text, key)
+    return text
+
+
+def stats() -> dict:
+    return {"memory": _MEM.stats(), "disk_path": DISK_PATH, "disk_enabled": not _disk_disabled,
+            "phash": PHASH_ENABLED}
@@ -0,0 +1,64 @@
+# backend/routers/ocr_executor.py
+# ============================================
+# OCR 전용 실행기 (이벤트 루프 밖에서 Vision/DB 동기 작업 실행)
+# - 동시 실행 수 상한: OCR_MAX_CONCURRENCY (기본 4)
+# - 대기열 상한: OCR_MAX_PENDING (기본 32, 초과 시 503)
+# - 요청당 대기 시간 상한: OCR_TIMEOUT_SEC (기본 30, 초과 시 504)
+# async 핸들러는 run_ocr(...)를 await 하므로 OCR 중에도 같은 워커의
+# 챗/대시보드 요청이 멈추지 않는다
+# ============================================
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from fastapi import HTTPException
+
+MAX_CONCURRENCY = max(1, int(os.getenv("OCR_MAX_CONCURRENCY", "4")))
+MAX_PENDING = max(1, int(os.getenv("OCR_MAX_PENDING", "32")))
+TIMEOUT_SEC = float(os.getenv("OCR_TIMEOUT_SEC", "30"))
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix="ocr")
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+def _release_slot(_future=None):
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+
+async def run_ocr(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    fn(*args, **kwargs)를 OCR 실행기에서 실행하고 결과를 돌려준다.
+    fn 안에서 발생한 HTTPException 은 그대로 전달된다.
+    대기열 자리는 작업이 실제로 끝날 때 반납한다 (시간 초과로 먼저 응답해도 작업은 계속 돈다)
+    """
+    global _pending
+    with _pending_lock:
+        if _pending >= MAX_PENDING:
+            raise HTTPException(status_code=503, detail="OCR 요청이 많습니다. 잠시 후 다시 시도해주세요.")
+        _pending += 1
+    try:
+        job = _EXECUTOR.submit(functools.partial(fn, *args, **kwargs))
+    except Exception:
+        _release_slot()
+        raise
+    job.add_done_callback(_release_slot)
+
+    future = asyncio.wrap_future(job)
+    try:
+        if TIMEOUT_SEC > 0:
+            return await asyncio.wait_for(future, timeout=TIMEOUT_SEC)
+        return await future
+    except asyncio.TimeoutError:
+        print(f"❌ OCR 작업 시간 초과({TIMEOUT_SEC}s): {getattr(fn, '__name__', fn)}")
+        raise HTTPException(status_code=504, detail="OCR 처리 시간이 초과되었습니다.")
+
+
+def stats() -> dict:
+    return {"max_concurrency": MAX_CONCURRENCY, "max_pending": MAX_PENDING, "pending": _pending}
@@ -0,0 +1,257 @@
+# backend/routers/ocr_layout.py
+# ============================================
+# Vision 레이아웃 기반 전성분 영역 추출
+# - full_text_annotation 의 block / paragraph / bounding box 를 가벼운 구조(JSON 직렬화 가능)로 보관
+# - "전성분/Ingredients" 머리글이 있는 문단부터, 같은 단(열)에서 바로 아래로 이어지는 블록만 수집
+#   사용법/주의사항/제조 등 다른 머리글이 나오면 중단
+# - 머리글이 없으면 쉼표 밀도가 가장 높은 블록을 성분표로 간주
+# - 못 찾으면 None → 호출부는 기존처럼 전체 텍스트 사용
+# ============================================
+
+import json
+import re
+from statistics import median
+from typing import Callable, List, Optional
+
+from . import ocr_cache
+
+# 머리글 / 종료 머리글 (OCR 띄어쓰기 흔들림 허용)
+_HEADER_RE = re.compile(r"전\s*성\s*분|全成分|ingredients?", re.IGNORECASE)
+_WEAK_HEADER_RE = re.compile(r"^\s*성\s*분\s*[:：]")
+_STOP_RE = re.compile(
+    r"사\s*용\s*(방\s*법|법)|주\s*의\s*사\s*항|사\s*용\s*시\s*주\s*의|보\s*관\s*(방\s*법|법)|"
+    r"제\s*조\s*(업\s*자|판\s*매|번\s*호|일\s*자|국)|책\s*임\s*판\s*매|용\s*량|사용\s*기한|"
+    r"how\s+to\s+use|directions|caution|warning|precautions|manufactur",
+    re.IGNORECASE
+)
+
+MIN_COMMAS = 5              # 머리글 없는 블록을 성분표로 보기 위한 최소 쉼표 수
+MIN_COMMA_DENSITY = 0.025   # 글자당 쉼표 비율
+MIN_COLUMN_OVERLAP = 0.5    # 이어지는 블록의 가로 겹침 비율 (좁은 쪽 너비 기준)
+MAX_GAP_LINES = 2.5         # 이어지는 블록까지 허용하는 세로 간격 (줄 높이 배수)
+
+# Vision TextAnnotation.DetectedBreak.BreakType
+_SPACE_BREAKS = {1, 2}      # SPACE, SURE_SPACE
+_LINE_BREAKS = {3, 4, 5}    # EOL_SURE_SPACE, HYPHEN(줄바꿈), LINE_BREAK
+
+
+class OcrParagraph:
+    __slots__ = ("text", "bbox", "lines")
+
+    def __init__(self, text: str, bbox: List[int]):
+        self.text = text
+        self.bbox = bbox    # [x0, y0, x1, y1]
+        self.lines = max(1, text.count("\n") + 1)
+
+
+class OcrBlock:
+    __slots__ = ("paragraphs", "bbox")
+
+    def __init__(self, paragraphs: List[OcrParagraph], bbox: List[int]):
+        self.paragraphs = paragraphs
+        self.bbox = bbox
+
+    @property
+    def text(self) -> str:
+        return "\n".join(p.text for p in self.paragraphs)
+
+
+class OcrLayout:
+    """OCR 전체 텍스트 + 블록 구조"""
+
+    __slots__ = ("text", "blocks")
+
+    def __init__(self, text: str, blocks: List[OcrBlock]):
+        self.text = text
+        self.blocks = blocks
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "text": self.text,
+            "blocks": [{"bbox": b.bbox, "paragraphs": [{"text": p.text, "bbox": p.bbox} for p in b.paragraphs]}
+                       for b in self.blocks]
+        }, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "OcrLayout":
+        data = json.loads(raw)
+        blocks = [OcrBlock([OcrParagraph(p["text"], p["bbox"]) for p in b["paragraphs"]], b["bbox"])
+                  for b in data.get("blocks", [])]
+        return cls(data.get("text", ""), blocks)
+
+
+# ============================================
+# Vision 응답 → 레이아웃
+# ============================================
+def _bbox(poly) -> List[int]:
+    xs = [v.x for v in poly.vertices] or [0]
+    ys = [v.y for v in poly.vertices] or [0]
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+def _paragraph_text(paragraph) -> str:
+    out: List[str] = []
+    for word in paragraph.words:
+        for sym in word.symbols:
+            out.append(sym.text)
+            brk = sym.property.detected_break.type_ if sym.property and sym.property.detected_break else 0
+            brk = int(brk)
+            if brk in _SPACE_BREAKS:
+                out.append(" ")
+            elif brk in _LINE_BREAKS:
+                out.append("\n")
+    return "".join(out).strip()
+
+
+def layout_from_annotation(annotation, text: Optional[str] = None) -> OcrLayout:
+    """full_text_annotation → OcrLayout (text 를 주면 전체 텍스트로 사용)"""
+    blocks: List[OcrBlock] = []
+    for page in getattr(annotation, "pages", []) or []:
+        for block in page.blocks:
+            paragraphs = [OcrParagraph(_paragraph_text(p), _bbox(p.bounding_box)) for p in block.paragraphs]
+            paragraphs = [p for p in paragraphs if p.text]
+            if paragraphs:
+                blocks.append(OcrBlock(paragraphs, _bbox(block.bounding_box)))
+    full_text = text if text is not None else (getattr(annotation, "text", "") or "")
+    return OcrLayout(full_text, blocks)
+
+
+def cached_layout(kind: str, content, detect: Callable[[], Optional[OcrLayout]]) -> Optional[OcrLayout]:
+    """OCR 캐시(ocr_cache)를 거쳐 레이아웃 반환 (빈 결과는 저장하지 않음)"""
+    def _compute() -> Optional[str]:
+        layout = detect()
+        return layout.to_json() if layout and layout.text else None
+
+    raw = ocr_cache.get_or_compute(kind, content, _compute)
+    return OcrLayout.from_json(raw) if raw else None
+
+
+def cached_layouts(kind: str, contents: List, detect_many: Callable[[List], List[Optional[OcrLayout]]]
+                   ) -> List[Optional[OcrLayout]]:
+    """
+    여러 이미지의 레이아웃 (입력 순서 유지).
+    캐시에 없는 이미지만 모아 detect_many 한 번으로 처리 (Vision 배치 요청 1회)
+    """
+    results: List[Optional[OcrLayout]] = []
+    missing: List[int] = []
+    keys = [ocr_cache.ImageKey(content) for content in contents]
+    for i, content in enumerate(contents):
+        raw = ocr_cache.lookup(kind, content, keys[i])
+        results.append(OcrLayout.from_json(raw) if raw else None)
+        if raw is None:
+            missing.append(i)
+    if missing:
+        detected = detect_many([contents[i] for i in missing])
+        for i, layout in zip(missing, detected):
+            if layout and layout.text:
+                ocr_cache.store(kind, contents[i], layout.to_json(), keys[i])
+                results[i] = layout
+    return results
+
+
+def merge_layouts(layouts: List[OcrLayout]) -> OcrLayout:
+    """
+    여러 장의 레이아웃을 하나로 (텍스트는 순서대로 이어 붙이고, 블록은 세로로 쌓음).
+    장 사이 간격을 앞 장 높이만큼 두어 열 이어붙이기가 다른 장으로 넘어가지 않게 한다
+    """
+    blocks: List[OcrBlock] = []
+    offset = 0
+    for layout in layouts:
+        bottom = 0
+        for b in layout.blocks:
+            paragraphs = [OcrParagraph(p.text, [p.bbox[0], p.bbox[1] + offset, p.bbox[2], p.bbox[3] + offset])
+                          for p in b.paragraphs]
+            blocks.append(OcrBlock(paragraphs, [b.bbox[0], b.bbox[1] + offset, b.bbox[2], b.bbox[3] + offset]))
+            bottom = max(bottom, b.bbox[3])
+        offset += 2 * bottom + 1
+    return OcrLayout("\n".join(l.text for l in layouts if l.text), blocks)
+
+
+# ============================================
+# 전성분 영역 추출
+# ============================================
+def _line_height(layout: OcrLayout) -> float:
+    heights = [(p.bbox[3] - p.bbox[1]) / p.lines for b in layout.blocks for p in b.paragraphs
+               if p.bbox[3] > p.bbox[1]]
+    return median(heights) if heights else 0.0
+
+
+def _column_overlap(a: List[int], b: List[int]) -> float:
+    inter = min(a[2], b[2]) - max(a[0], b[0])
+    narrow = min(a[2] - a[0], b[2] - b[0])
+    return inter / narrow if narrow > 0 else 0.0
+
+
+def _cut_at_stop(text: str) -> tuple:
+    """(종료 머리글 앞까지의 텍스트, 종료 여부)"""
+    m = _STOP_RE.search(text)
+    return (text[:m.start()], True) if m else (text, False)
+
+
+def _find_header(layout: OcrLayout):
+    """(블록 idx, 문단 idx, 머리글 끝 위치) — 전성분/Ingredients 우선, 없으면 '성분:' """
+    for pattern in (_HEADER_RE, _WEAK_HEADER_RE):
+        for bi, block in enumerate(layout.blocks):
+            for pi, para in enumerate(block.paragraphs):
+                m = pattern.search(para.text)
+                if m:
+                    return bi, pi, m.end()
+    return None
+
+
+def _densest_block(layout: OcrLayout) -> Optional[str]:
+    best, best_commas = None, 0
+    for block in layout.blocks:
+        t = block.text
+        commas = t.count(",")
+        if commas >= MIN_COMMAS and commas / max(1, len(t)) >= MIN_COMMA_DENSITY and commas > best_commas:
+            best, best_commas = t, commas
+    if best is None:
+        return None
+    return _cut_at_stop(best)[0].strip() or None
+
+
+def ingredient_block_text(layout: Optional[OcrLayout]) -> Optional[str]:
+    """레이아웃에서 전성분 영역 텍스트만 (찾지 못하면 None)"""
+    if not layout or not layout.blocks:
+        return None
+    header = _find_header(layout)
+    if header is None:
+        return _densest_block(layout)
+
+    bi, pi, pos = header
+    block = layout.blocks[bi]
+    parts: List[str] = []
+
+    # 1) 머리글 문단의 나머지 + 같은 블록의 이후 문단
+    first = block.paragraphs[pi].text[pos:].lstrip(" :：\n")
+    stopped = False
+    for t in [first] + [p.text for p in block.paragraphs[pi + 1:]]:
+        t, stopped = _cut_at_stop(t)
+        if t.strip():
+            parts.append(t.strip())
+        if stopped:
+            break
+
+    # 2) 같은 단에서 바로 아래로 이어지는 블록 (위→아래 순)
+    if not stopped:
+        line_h = _line_height(layout) or 1.0
+        col = list(block.bbox)
+        below = sorted(
+            (b for i, b in enumerate(layout.blocks) if i != bi and b.bbox[1] >= col[1]),
+            key=lambda b: b.bbox[1]
+        )
+        for b in below:
+            if _column_overlap(col, b.bbox) < MIN_COLUMN_OVERLAP:
+                continue
+            if b.bbox[1] - col[3] > MAX_GAP_LINES * line_h:
+                break
+            t, stopped = _cut_at_stop(b.text)
+            if t.strip():
+                parts.append(t.strip())
+            col = [min(col[0], b.bbox[0]), col[1], max(col[2], b.bbox[2]), max(col[3], b.bbox[3])]
+            if stopped:
+                break
+
+    text = "\n".join(parts).strip()
+    return text or None
@@ -0,0 +1,55 @@
+# backend/routers/ocr_upload.py
+# ============================================
+# OCR 업로드 수신
+# - UploadFile 을 청크 단위로 읽어 하나의 버퍼에 모으고 memoryview 로 넘긴다
+#   (임시 파일 저장 → 다시 읽기 제거)
+# - 크기 상한: OCR_MAX_UPLOAD_BYTES (기본 20MB, 초과 시 413)
+# ============================================
+
+import os
+from typing import Union
+
+from fastapi import HTTPException, UploadFile
+
+MAX_UPLOAD_BYTES = int(os.getenv("OCR_MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+CHUNK_SIZE = 256 * 1024
+
+# OCR 함수들이 받는 이미지 입력 (파일 경로 또는 메모리 버퍼)
+ImageInput = Union[str, bytes, bytearray, memoryview]
+
+
+def _too_large():
+    return HTTPException(
+        status_code=413,
+        detail=f"이미지 파일이 너무 큽니다. (최대 {MAX_UPLOAD_BYTES // (1024 * 1024)}MB)"
+    )
+
+
+async def read_upload(upload: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> memoryview:
+    """업로드 본문을 상한까지 스트리밍으로 읽어 복사 없는 memoryview 로 반환"""
+    size = getattr(upload, "size", None)
+    if size is not None and size > max_bytes:
+        raise _too_large()
+
+    buf = bytearray()
+    while True:
+        chunk = await upload.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        if len(buf) + len(chunk) > max_bytes:
+            raise _too_large()
+        buf += chunk
+    if not buf:
+        raise HTTPException(status_code=400, detail="빈 이미지 파일입니다.")
+    return memoryview(buf)
+
+
+def load_image_bytes(image: ImageInput) -> Union[bytes, memoryview]:
+    """경로면 파일을 읽고, 메모리 버퍼면 그대로 (bytearray 는 복사 없이 memoryview 로)"""
+    if isinstance(image, str):
+        with open(image, "rb") as f:
+            return f.read()
+    if isinstance(image, bytearray):
+        return memoryview(image)
+    return image
+
@@ -0,0 +1,166 @@
+# backend/routers/product_name_index.py
+# ============================================
+# OCR 제품 식별용 제품명 3-gram 색인
+# - product_data 의 product_name 을 TrigramIndex 로, brand 는 pid → 정규화 브랜드로 보관
+# - OCR 후보 줄(과 후보 전체를 이은 문자열)마다 색인 1회 조회 → 순위화된 후보
+#   · Dice ≥ 0.6: 기존 FULLTEXT + SequenceMatcher(≥60%) 경로에 해당
+#   · 질의 포함률 ≥ 0.95: 기존 LIKE '%후보 줄%' 경로에 해당
+#   · 라벨에 브랜드가 함께 찍혀 있으면 순위 가산
+# - 신규 제품은 pid 증분, 이름 변경/삭제는 주기적 전체 재적재 (product_resolver 와 같은 방식)
+# ============================================
+
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy import text
+
+from db import engine
+from .trigram_index import TrigramIndex, normalize_for_ngrams
+
+REFRESH_INTERVAL_SEC = int(os.getenv("PRODUCT_INDEX_REFRESH_SEC", "60"))
+FULL_RELOAD_SEC = int(os.getenv("PRODUCT_INDEX_FULL_RELOAD_SEC", "1800"))
+
+MIN_DICE = 0.6
+MIN_CONTAINMENT = 0.95
+MIN_CONTAINMENT_QUERY_LEN = 4   # 너무 짧은 줄은 포함률만으로 채택하지 않음
+BRAND_BONUS = 0.1
+MIN_BRAND_LEN = 2
+CANDIDATE_POOL = 10             # 질의마다 색인에서 받는 후보 수 (브랜드 가산 후 limit 로 자름)
+
+
+class ProductMatch(NamedTuple):
+    pid: int
+    product_name: str
+    score: float
+    dice: float
+    containment: float
+    query: str
+
+
+class ProductNameIndex:
+    def __init__(self):
+        self._index = TrigramIndex()
+        self._names: Dict[int, str] = {}
+        self._brands: Dict[int, str] = {}
+        self._max_pid = 0
+        self._full_loaded_at = 0.0
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def refresh(self, full: bool = False) -> int:
+        """full=False 면 MAX(pid) 이후 신규 행만 색인, 전체 재적재 주기가 지났으면 새로 구성"""
+        with self._lock:
+            if not self.loaded or time.time() - self._full_loaded_at > FULL_RELOAD_SEC:
+                full = True
+            t0 = time.time()
+            with engine.connect() as conn:
+                if full:
+                    rows = conn.execute(text("SELECT pid, product_name, brand FROM product_data")).fetchall()
+                else:
+                    rows = conn.execute(text(
+                        "SELECT pid, product_name, brand FROM product_data WHERE pid > :last ORDER BY pid"
+                    ), {"last": self._max_pid}).fetchall()
+            if not full and not rows:
+                return 0
+
+            rows = [r for r in rows if r[1]]
+            if full:
+                index, names, brands = TrigramIndex(), {}, {}
+            else:
+                index, names, brands = self._index, dict(self._names), dict(self._brands)
+            for pid, name, brand in rows:
+                names[pid] = name
+                b = normalize_for_ngrams(brand)
+                if len(b) >= MIN_BRAND_LEN:
+                    brands[pid] = b
+            index.add((pid, name) for pid, name, _ in rows)
+
+            # 참조 교체로 원자적 반영
+            self._index, self._names, self._brands = index, names, brands
+            if rows:
+                self._max_pid = max(self._max_pid if not full else 0, max(r[0] for r in rows))
+            if full:
+                self._full_loaded_at = time.time()
+                print(f"[PRODUCT_INDEX] 전체 색인: {len(index)}개 제품, max_pid={self._max_pid} "
+                      f"({(time.time() - t0) * 1000:.0f}ms)")
+            self.loaded = True
+            return len(rows)
+
+    def identify(self, candidates: List[str], limit: int = 5) -> List[ProductMatch]:
+        """
+        OCR 후보 줄들로 제품 후보를 점수순으로 반환 (채택 기준을 넘은 것만).
+        질의: 후보 전체를 이은 문자열 + 각 후보 줄
+        """
+        if not self.loaded or not candidates:
+            return []
+        index, names, brands = self._index, self._names, self._brands
+        joined = " ".join(candidates)
+        ocr_norm = normalize_for_ngrams(joined)
+
+        # 같은 이름의 다른 브랜드 제품도 후보에 남도록 limit 보다 넉넉히 받아 둔다
+        pool = max(limit, CANDIDATE_POOL)
+        best: Dict[int, ProductMatch] = {}
+        for q in dict.fromkeys([joined] + list(candidates)):
+            allow_containment = len(normalize_for_ngrams(q)) >= MIN_CONTAINMENT_QUERY_LEN
+            for hit in index.search(q, limit=pool, min_dice=MIN_DICE,
+                                    min_containment=MIN_CONTAINMENT if allow_containment else 0.0):
+                if hit.dice < MIN_DICE and not (allow_containment and hit.containment >= MIN_CONTAINMENT):
+                    continue
+                score = hit.dice
+                brand = brands.get(hit.doc_id)
+                if brand and brand in ocr_norm:
+                    score += BRAND_BONUS
+                prev = best.get(hit.doc_id)
+                if prev is None or score > prev.score:
+                    best[hit.doc_id] = ProductMatch(hit.doc_id, names.get(hit.doc_id), score,
+                                                    hit.dice, hit.containment, q)
+        return sorted(best.values(), key=lambda m: (-m.score, -m.containment, m.pid))[:limit]
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+_INDEX = ProductNameIndex()
+_STOP_EVENT = threading.Event()
+_REFRESH_THREAD: Optional[threading.Thread] = None
+
+
+def get_product_index() -> ProductNameIndex:
+    return _INDEX
+
+
+def identify_product(candidates: List[str]) -> Optional[ProductMatch]:
+    """가장 점수가 높은 제품 (색인이 아직 없거나 후보가 없으면 None)"""
+    matches = _INDEX.identify(candidates, limit=1)
+    return matches[0] if matches else None
+
+
+def _refresh_loop(interval: int):
+    while not _STOP_EVENT.wait(interval):
+        try:
+            _INDEX.refresh()
+        except Exception as e:
+            print(f"❌ 제품명 색인 갱신 실패(기존 색인 유지): {e}")
+
+
+def start_background_refresh(interval: int = REFRESH_INTERVAL_SEC):
+    """서버 시작 시 1회 색인 + 주기적 증분 갱신 스레드 기동"""
+    global _REFRESH_THREAD
+    try:
+        _INDEX.refresh(full=True)
+    except Exception as e:
+        print(f"❌ 제품명 색인 초기 구성 실패(DB 검색으로 대체): {e}")
+
+    if _REFRESH_THREAD is not None and _REFRESH_THREAD.is_alive():
+        return
+    _STOP_EVENT.clear()
+    _REFRESH_THREAD = threading.Thread(
+        target=_refresh_loop, args=(interval,), name="product-name-index", daemon=True
+    )
+    _REFRESH_THREAD.start()
+
+
+def stop_background_refresh():
+    _STOP_EVENT.set()
@@ -0,0 +1,151 @@
+# backend/routers/product_resolver.py
+# ============================================
+# 제품명 → pid 인메모리 리졸버
+# - product_data 의 (정확 이름 → pid), (정규화 이름 → pid) 맵을 보관
+# - 새 제품은 pid 증분(MAX(pid) 이후)으로 추가, 이름 변경/삭제는 주기적 전체 재적재로 반영
+# - 분석 API 는 이름을 pid 로 바꾼 뒤 기본키 조회만 수행한다 (Text 컬럼 비교 제거)
+# ============================================
+
+import os
+import re
+import threading
+import time
+import unicodedata
+from typing import Dict, Optional
+
+from sqlalchemy import text
+
+from db import engine
+
+# 증분(신규 pid) 확인 주기 / 전체 재적재 주기(초)
+REFRESH_INTERVAL_SEC = int(os.getenv("PRODUCT_RESOLVER_REFRESH_SEC", "60"))
+FULL_RELOAD_SEC = int(os.getenv("PRODUCT_RESOLVER_FULL_RELOAD_SEC", "1800"))
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_product_name(name: Optional[str]) -> Optional[str]:
+    """전각/반각, 대소문자, 공백 차이를 흡수한 제품명 키"""
+    if not name:
+        return None
+    return _WS_RE.sub("", unicodedata.normalize("NFKC", name)).lower() or None
+
+
+class ProductNameResolver:
+    def __init__(self):
+        self._exact: Dict[str, int] = {}
+        self._normalized: Dict[str, int] = {}
+        self._max_pid = 0
+        self._full_loaded_at = 0.0
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def _apply(self, exact: Dict[str, int], normalized: Dict[str, int], rows):
+        # 같은 이름이 여러 행이면 가장 작은 pid 를 대표로 사용
+        for pid, name in rows:
+            if not name:
+                continue
+            if pid < exact.get(name, pid + 1):
+                exact[name] = pid
+            key = normalize_product_name(name)
+            if key and pid < normalized.get(key, pid + 1):
+                normalized[key] = pid
+
+    def refresh(self, full: bool = False) -> int:
+        """
+        full=False 면 MAX(pid) 이후 신규 행만 반영, 전체 재적재 주기가 지났으면 전체 적재.
+        반환: 반영한 행 수
+        """
+        with self._lock:
+            if not self.loaded or time.time() - self._full_loaded_at > FULL_RELOAD_SEC:
+                full = True
+            with engine.connect() as conn:
+                if full:
+                    rows = conn.execute(text("SELECT pid, product_name FROM product_data")).fetchall()
+                else:
+                    rows = conn.execute(text(
+                        "SELECT pid, product_name FROM product_data WHERE pid > :last ORDER BY pid"
+                    ), {"last": self._max_pid}).fetchall()
+
+            if full:
+                exact, normalized = {}, {}
+            else:
+                if not rows:
+                    return 0
+                exact, normalized = dict(self._exact), dict(self._normalized)
+            self._apply(exact, normalized, rows)
+
+            # 참조 교체로 원자적 반영
+            self._exact, self._normalized = exact, normalized
+            if full:
+                self._max_pid = max((r[0] for r in rows), default=0)
+                self._full_loaded_at = time.time()
+                print(f"[PRODUCT_RESOLVER] 전체 적재: {len(exact)}개 이름, max_pid={self._max_pid}")
+            else:
+                self._max_pid = max(self._max_pid, max(r[0] for r in rows))
+            self.loaded = True
+            return len(rows)
+
+    def resolve(self, product_name: Optional[str]) -> Optional[int]:
+        """정확 일치 → 정규화 일치 순으로 pid 반환 (없으면 None)"""
+        if not product_name:
+            return None
+        pid = self._exact.get(product_name)
+        if pid is None:
+            pid = self._normalized.get(normalize_product_name(product_name))
+        return pid
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+
+_RESOLVER = ProductNameResolver()
+_STOP_EVENT = threading.Event()
+_REFRESH_THREAD: Optional[threading.Thread] = None
+
+
+def get_resolver() -> ProductNameResolver:
+    return _RESOLVER
+
+
+def resolve_product_pid(product_name: Optional[str]) -> Optional[int]:
+    return _RESOLVER.resolve(product_name)
+
+
+def fetch_product_by_pid(pid: int, db) -> Optional[dict]:
+    """product_data 기본키 조회 (분석에 필요한 컬럼만)"""
+    row = db.execute(text("""
+        SELECT pid, product_name, category, p_ingredients
+        FROM product_data
+        WHERE pid = :pid
+    """), {"pid": pid}).fetchone()
+    return dict(row._mapping) if row else None
+
+
+def _refresh_loop(interval: int):
+    while not _STOP_EVENT.wait(interval):
+        try:
+            _RESOLVER.refresh()
+        except Exception as e:
+            print(f"❌ 제품명 리졸버 갱신 실패(기존 맵 유지): {e}")
+
+
+def start_background_refresh(interval: int = REFRESH_INTERVAL_SEC):
+    """서버 시작 시 1회 적재 + 주기적 증분 갱신 스레드 기동"""
+    global _REFRESH_THREAD
+    try:
+        _RESOLVER.refresh(full=True)
+    except Exception as e:
+        print(f"❌ 제품명 리졸버 초기 적재 실패(이름 조회로 대체): {e}")
+
+    if _REFRESH_THREAD is not None and _REFRESH_THREAD.is_alive():
+        return
+    _STOP_EVENT.clear()
+    _REFRESH_THREAD = threading.Thread(
+        target=_refresh_loop, args=(interval,), name="product-name-resolver", daemon=True
+    )
+    _REFRESH_THREAD.start()
+
+
+def stop_background_refresh():
+    _STOP_EVENT.set()
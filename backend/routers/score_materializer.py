@@ -0,0 +1,440 @@
+# backend/routers/score_materializer.py
+# ============================================
+# 제품 × 바우만 16타입 점수 물리화 테이블
+# - product_baumann_scores 에 final_score / score_before / breakdown / reliability / 히트 수 저장
+# - 제품 성분 문자열, 제품이 참조하는 사전 항목, 피부타입 가중치의 지문(hash)이
+#   바뀐 (pid, skin_type) 행만 다시 계산해 upsert (증분 갱신)
+# - 읽기 API(/api/analyze, /api/top-products)는 이 테이블을 먼저 조회하고
+#   요청 시점에는 사용자 주의 성분 감점만 적용한다
+# - 갱신 완료 시 사전 스냅샷 버전 + product_data 버전을 product_baumann_scores_state 에 기록.
+#   /api/top-products 는 두 버전이 현재와 같을 때만 테이블 순위를 쓴다
+#   (페이지 밖의 갱신 전 행 / 갱신 후 추가된 제품 때문에 순위가 틀리지 않도록)
+# - 갱신 전에 product_ingredient_tokens 동기화(ingredient_tokens)를 먼저 수행한다
+#
+# 실행 (backend 디렉터리에서):
+#   python -m routers.score_materializer          # 증분 갱신
+#   python -m routers.score_materializer --full   # 전체 재계산
+# ============================================
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text, text
+from sqlalchemy.orm import Session, declarative_base
+
+from db import engine
+from .ingredient_dict import IngredientDictSnapshot, get_snapshot, refresh_snapshot
+from .ingredient_tokens import ProductTokens, sync_product_tokens, tokenize_ingredients
+from .scoring_engine import (
+    EFFECT_KEYS, ProductScoreMatrix, build_breakdown, compile_all_weights, contributions,
+    reliability_label,
+)
+
+Base = declarative_base()
+
+TBL_SCORES = "product_baumann_scores"
+TBL_STATE = "product_baumann_scores_state"
+WRITE_BATCH = 1000
+
+
+class ProductBaumannScore(Base):
+    __tablename__ = TBL_SCORES
+    pid = Column(Integer, primary_key=True)
+    skin_type = Column(String(10), primary_key=True)
+    category = Column(String(255))
+    final_score = Column(Integer)         # 소프트 캡 적용 후 (사용자 감점 전)
+    score_before = Column(Integer)        # calculate_score_final 원점수 (캡 적용 전)
+    ratios = Column(Text)                 # JSON: calculate_keyword_ratios 결과
+    breakdown = Column(Text)              # JSON: calculate_score_final breakdown
+    reliability = Column(String(10))
+    total_keyword_hits = Column(Integer)
+    matched_count = Column(Integer)
+    ingredients_hash = Column(String(16))
+    dict_hash = Column(String(16))
+    weights_hash = Column(String(16))
+    updated_at = Column(DateTime)
+    __table_args__ = (
+        Index('idx_pbs_type_cat_score', 'skin_type', 'category', 'final_score'),
+    )
+
+
+class ProductBaumannScoreState(Base):
+    """마지막 갱신 완료 시점의 입력 버전 (행 1개, id=1)"""
+    __tablename__ = TBL_STATE
+    id = Column(Integer, primary_key=True)
+    dict_version = Column(String(16))       # ingredient_dict 스냅샷 버전 (사전 + 가중치)
+    products_version = Column(String(16))   # product_data_version() 결과
+    refreshed_at = Column(DateTime)
+
+
+# ============================================
+# 지문(hash) 계산
+# ============================================
+def _short_hash(s: str) -> str:
+    return hashlib.sha1(s.encode("utf-8")).hexdigest()[:16]
+
+
+def ingredients_hash(ingredients_str: Optional[str]) -> str:
+    return _short_hash(ingredients_str or "")
+
+
+def dict_hash_for(tokens: ProductTokens, snap: IngredientDictSnapshot) -> str:
+    """제품이 참조하는 사전 항목(정규화 토큰 → 키워드 집합)만으로 만든 지문"""
+    norms = sorted(tokens.norm_set())
+    keyword_map = snap.keywords
+    return _short_hash("|".join(
+        f"{n}={','.join(sorted(keyword_map.get(n, ())))}" for n in norms
+    ))
+
+
+def weights_hash_for(user_weights_dict: dict) -> str:
+    return _short_hash(json.dumps(user_weights_dict, sort_keys=True, ensure_ascii=False, default=str))
+
+
+# ============================================
+# 증분 갱신 잡
+# ============================================
+def product_data_version(conn) -> str:
+    """
+    product_data 변경 여부 서명 (ingredient_dict._fetch_version 과 같은 방식).
+    - 행 수 + 최대 pid (추가/삭제 감지)
+    - information_schema.TABLES.UPDATE_TIME (제자리 수정 감지, 엔진이 지원하는 경우)
+    """
+    count, max_pid = conn.execute(text("SELECT COUNT(*), MAX(pid) FROM product_data")).fetchone()
+    parts = [f"product_data:{count}:{max_pid}"]
+    try:
+        row = conn.execute(text("""
+            SELECT UPDATE_TIME FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'product_data'
+        """)).fetchone()
+        parts.append(f"@{row[0] if row else None}")
+    except Exception as e:
+        print(f"⚠️ product_data UPDATE_TIME 조회 실패(행 수 기준으로만 판별): {e}")
+    return _short_hash("|".join(parts))
+
+
+def ensure_table():
+    Base.metadata.create_all(
+        engine, tables=[ProductBaumannScore.__table__, ProductBaumannScoreState.__table__], checkfirst=True
+    )
+
+
+def refresh_scores(full: bool = False) -> Dict[str, int]:
+    """
+    변경된 (pid, skin_type) 행만 다시 계산해 upsert 하고,
+    사라진 제품/피부타입 행은 삭제한다.
+    """
+    t0 = time.time()
+    ensure_table()
+    sync_product_tokens(full=full)
+    refresh_snapshot()
+    snap = get_snapshot()
+    compiled = compile_all_weights(snap.weights)
+    skin_types = compiled.skin_types
+    w_hashes = {st: weights_hash_for(snap.weights[st]) for st in skin_types}
+
+    with engine.connect() as conn:
+        # 읽기 전에 서명을 떠 둔다 (갱신 도중 바뀐 제품이 있으면 다음 확인에서 불일치)
+        products_version = product_data_version(conn)
+        products = conn.execute(text("""
+            SELECT pid, category, p_ingredients
+            FROM product_data
+            WHERE p_ingredients IS NOT NULL AND LENGTH(TRIM(p_ingredients)) > 0
+        """)).fetchall()
+        existing: Dict[Tuple[int, str], Tuple[str, str, str]] = {}
+        if not full:
+            for pid, st, ih, dh, wh in conn.execute(text(
+                f"SELECT pid, skin_type, ingredients_hash, dict_hash, weights_hash FROM {TBL_SCORES}"
+            )):
+                existing[(pid, st)] = (ih, dh, wh)
+
+    # 1) 지문 비교로 재계산 대상 선정
+    stale_rows = []       # (pid, category, ProductTokens, ih, dh)
+    for pid, cat, ing_str in products:
+        ih = ingredients_hash(ing_str)
+        tokens = tokenize_ingredients(ing_str)
+        dh = dict_hash_for(tokens, snap)
+        if full or any(existing.get((pid, st)) != (ih, dh, w_hashes[st]) for st in skin_types):
+            stale_rows.append((pid, cat, tokens, ih, dh))
+
+    # 2) 대상 제품 × 전체 피부타입 벡터화 채점
+    written = 0
+    if stale_rows and skin_types:
+        matrix = ProductScoreMatrix([(str(r[0]), r[1], r[2]) for r in stale_rows], snap)
+        fit, contrib = contributions(matrix.ratios, compiled)
+        score_before, final_score = matrix.score(compiled)
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+
+        payload = []
+        for i, (pid, cat, _, ih, dh) in enumerate(stale_rows):
+            has_hits = bool(matrix.hits[i])
+            ratios = {k: float(matrix.ratios[i, j]) for j, k in enumerate(EFFECT_KEYS)} if has_hits else {}
+            for p, st in enumerate(skin_types):
+                if existing.get((pid, st)) == (ih, dh, w_hashes[st]):
+                    continue
+                breakdown = build_breakdown(matrix.ratios[i], fit[i, p], contrib[i, p], compiled, p, has_hits)
+                payload.append({
+                    "pid": pid, "skin_type": st, "category": (cat or "")[:255],
+                    "final_score": int(final_score[i, p]), "score_before": int(score_before[i, p]),
+                    "ratios": json.dumps(ratios, ensure_ascii=False),
+                    "breakdown": json.dumps(breakdown, ensure_ascii=False),
+                    "reliability": reliability_label(matrix.reliability[i]),
+                    "total_keyword_hits": int(matrix.hits[i]),
+                    "matched_count": int(matrix.matched_count[i]),
+                    "ih": ih, "dh": dh, "wh": w_hashes[st], "now": now,
+                })
+
+        upsert = text(f"""
+            INSERT INTO {TBL_SCORES}
+                (pid, skin_type, category, final_score, score_before, ratios, breakdown,
+                 reliability, total_keyword_hits, matched_count,
+                 ingredients_hash, dict_hash, weights_hash, updated_at)
+            VALUES
+                (:pid, :skin_type, :category, :final_score, :score_before, :ratios, :breakdown,
+                 :reliability, :total_keyword_hits, :matched_count, :ih, :dh, :wh, :now)
+            ON DUPLICATE KEY UPDATE
+                category = VALUES(category), final_score = VALUES(final_score),
+                score_before = VALUES(score_before), ratios = VALUES(ratios),
+                breakdown = VALUES(breakdown), reliability = VALUES(reliability),
+                total_keyword_hits = VALUES(total_keyword_hits), matched_count = VALUES(matched_count),
+                ingredients_hash = VALUES(ingredients_hash), dict_hash = VALUES(dict_hash),
+                weights_hash = VALUES(weights_hash), updated_at = VALUES(updated_at)
+        """)
+        with engine.begin() as conn:
+            for start in range(0, len(payload), WRITE_BATCH):
+                conn.execute(upsert, payload[start:start + WRITE_BATCH])
+        written = len(payload)
+
+    # 3) 사라진 제품 / 피부타입 정리
+    live_pids = {r[0] for r in products}
+    removed = 0
+    stale_keys = [k for k in existing if k[0] not in live_pids or k[1] not in w_hashes]
+    if stale_keys:
+        with engine.begin() as conn:
+            for pid, st in stale_keys:
+                conn.execute(text(f"DELETE FROM {TBL_SCORES} WHERE pid = :pid AND skin_type = :st"),
+                             {"pid": pid, "st": st})
+        removed = len(stale_keys)
+
+    # 4) 전체 갱신 완료 기록
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            INSERT INTO {TBL_STATE} (id, dict_version, products_version, refreshed_at)
+            VALUES (1, :dv, :pv, :now)
+            ON DUPLICATE KEY UPDATE
+                dict_version = VALUES(dict_version), products_version = VALUES(products_version),
+                refreshed_at = VALUES(refreshed_at)
+        """), {"dv": snap.version, "pv": products_version, "now": time.strftime("%Y-%m-%d %H:%M:%S")})
+
+    stats = {
+        "products": len(products), "recomputed_products": len(stale_rows),
+        "rows_written": written, "rows_removed": removed,
+        "ms": int((time.time() - t0) * 1000),
+    }
+    print(f"[SCORE_MATERIALIZER] {stats}")
+    return stats
+
+
+# 선택: 워커 내 주기 실행 (기본 비활성, 배치/크론 실행 권장)
+REFRESH_INTERVAL_SEC = int(os.getenv("SCORE_REFRESH_SEC", "0"))
+_STOP_EVENT = threading.Event()
+
+
+def start_background_refresh(interval: int = REFRESH_INTERVAL_SEC):
+    if interval <= 0:
+        return
+
+    def _loop():
+        while not _STOP_EVENT.wait(interval):
+            try:
+                refresh_scores()
+            except Exception as e:
+                print(f"❌ 점수 테이블 갱신 실패: {e}")
+
+    threading.Thread(target=_loop, name="score-materializer", daemon=True).start()
+
+
+# ============================================
+# 읽기 헬퍼 (테이블이 없거나 비어 있으면 None → 호출부에서 실시간 계산)
+# ============================================
+_TABLE_RETRY_SEC = 60
+_table_missing_since: Optional[float] = None
+
+
+def _table_available() -> bool:
+    return _table_missing_since is None or time.time() - _table_missing_since > _TABLE_RETRY_SEC
+
+
+def _mark_table_error(e: Exception):
+    global _table_missing_since
+    _table_missing_since = time.time()
+    print(f"⚠️ {TBL_SCORES} 조회 실패(실시간 계산으로 대체): {e}")
+
+
+# 테이블 전체 최신 여부 확인 결과 (요청마다 product_data 를 세지 않도록 잠시 재사용)
+STATE_CHECK_SEC = float(os.getenv("SCORE_STATE_CHECK_SEC", "30"))
+_state_checked: Tuple[float, str, bool] = (0.0, "", False)   # (확인 시각, 스냅샷 버전, 결과)
+
+
+def table_is_current(db: Session) -> bool:
+    """
+    마지막 갱신 완료 시점의 사전/가중치 버전과 product_data 버전이 모두 현재와 같은지.
+    다르면 페이지 밖에도 갱신 전 행이나 행 없는 신규 제품이 있을 수 있으므로 False
+    """
+    global _state_checked
+    snap_version = get_snapshot().version
+    checked_at, checked_version, current = _state_checked
+    if checked_version == snap_version and time.time() - checked_at < STATE_CHECK_SEC:
+        return current
+    try:
+        row = db.execute(text(
+            f"SELECT dict_version, products_version FROM {TBL_STATE} WHERE id = 1"
+        )).fetchone()
+        current = bool(row) and row[0] == snap_version and row[1] == product_data_version(db)
+    except Exception as e:
+        print(f"⚠️ {TBL_STATE} 조회 실패(실시간 계산으로 대체): {e}")
+        current = False
+    if not current:
+        print("[SCORE_MATERIALIZER] 점수 테이블이 현재 사전/제품 버전과 다름 → 실시간 계산으로 대체")
+    _state_checked = (time.time(), snap_version, current)
+    return current
+
+
+def _is_fresh(row, ingredients_str: Optional[str], snap: IngredientDictSnapshot,
+              tokens: Optional[ProductTokens] = None) -> bool:
+    """행의 성분/사전/가중치 지문이 현재 스냅샷과 모두 같은지 (하나라도 다르면 갱신 전 행)"""
+    weights = snap.weights.get(row["skin_type"])
+    if not weights or row["weights_hash"] != weights_hash_for(weights):
+        return False
+    if row["ingredients_hash"] != ingredients_hash(ingredients_str):
+        return False
+    if tokens is None:
+        tokens = tokenize_ingredients(ingredients_str)
+    return row["dict_hash"] == dict_hash_for(tokens, snap)
+
+
+def fetch_materialized_score(pid: Optional[int], skin_type: str, ingredients_str: str,
+                             db: Session, tokens: Optional[ProductTokens] = None) -> Optional[Dict[str, Any]]:
+    """(pid, skin_type) 점수 행. 성분/사전/가중치 지문 중 하나라도 다르면(갱신 전) None"""
+    global _table_missing_since
+    if pid is None or not _table_available():
+        return None
+    try:
+        row = db.execute(text(f"""
+            SELECT skin_type, final_score, score_before, ratios, breakdown, reliability,
+                   total_keyword_hits, matched_count, ingredients_hash, dict_hash, weights_hash
+            FROM {TBL_SCORES}
+            WHERE pid = :pid AND skin_type = :st
+        """), {"pid": pid, "st": skin_type}).mappings().first()
+        _table_missing_since = None
+    except Exception as e:
+        _mark_table_error(e)
+        return None
+    if not row or not _is_fresh(row, ingredients_str, get_snapshot(), tokens):
+        return None
+    return {
+        "final_score": row["final_score"],
+        "score_before": row["score_before"],
+        "ratios": json.loads(row["ratios"] or "{}"),
+        "breakdown": json.loads(row["breakdown"] or "{}"),
+        "reliability": row["reliability"],
+        "total_keyword_hits": row["total_keyword_hits"],
+        "matched_count": row["matched_count"],
+    }
+
+
+def fetch_materialized_all_types(pid: Optional[int], skin_types: List[str], ingredients_str: str,
+                                 db: Session, tokens: Optional[ProductTokens] = None
+                                 ) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    제품 1개의 전체 피부타입 점수 행 {skin_type: 점수}.
+    skin_types 중 하나라도 없거나 갱신 전이면 None (타입별 결과가 섞이지 않도록 전부 실시간 계산)
+    """
+    global _table_missing_since
+    if pid is None or not skin_types or not _table_available():
+        return None
+    try:
+        rows = db.execute(text(f"""
+            SELECT skin_type, final_score, score_before, ratios, breakdown, reliability,
+                   total_keyword_hits, matched_count, ingredients_hash, dict_hash, weights_hash
+            FROM {TBL_SCORES}
+            WHERE pid = :pid
+        """), {"pid": pid}).mappings().all()
+        _table_missing_since = None
+    except Exception as e:
+        _mark_table_error(e)
+        return None
+    by_type = {r["skin_type"]: r for r in rows}
+    if any(st not in by_type for st in skin_types):
+        return None
+    snap = get_snapshot()
+    if tokens is None:
+        tokens = tokenize_ingredients(ingredients_str)
+    out = {}
+    for st in skin_types:
+        row = by_type[st]
+        if not _is_fresh(row, ingredients_str, snap, tokens):
+            return None
+        out[st] = {
+            "final_score": row["final_score"],
+            "score_before": row["score_before"],
+            "ratios": json.loads(row["ratios"] or "{}"),
+            "breakdown": json.loads(row["breakdown"] or "{}"),
+        }
+    return out
+
+
+def fetch_top_scores(category: str, skin_type: str, limit: int, offset: int,
+                     db: Session, with_ingredients: bool = False,
+                     like: bool = False) -> Optional[List[Dict[str, Any]]]:
+    """
+    카테고리 top-k: (skin_type, category, final_score) 인덱스 ORDER BY.
+    p_ingredients 는 지문 검증용으로 항상 조회하고, with_ingredients=True 일 때만 결과에 남긴다.
+    테이블 전체가 현재 버전으로 갱신되지 않았거나(table_is_current),
+    페이지에 갱신 전 행이 하나라도 있으면 순위를 믿을 수 없으므로 None (실시간 계산으로 대체)
+    """
+    global _table_missing_since
+    if not _table_available() or not table_is_current(db):
+        return None
+    cat_cond = "s.category LIKE :cat" if like else "s.category = :cat"
+    cat_val = f"%{category.strip()}%" if like else category
+    try:
+        rows = db.execute(text(f"""
+            SELECT s.pid, p.product_name, p.category, s.final_score, s.score_before,
+                   s.reliability, s.total_keyword_hits, s.matched_count, p.p_ingredients,
+                   s.skin_type, s.ingredients_hash, s.dict_hash, s.weights_hash
+            FROM {TBL_SCORES} s
+            JOIN product_data p ON p.pid = s.pid
+            WHERE s.skin_type = :st AND {cat_cond} AND s.total_keyword_hits > 0
+            ORDER BY s.final_score DESC, s.pid ASC
+            LIMIT :lim OFFSET :off
+        """), {"st": skin_type, "cat": cat_val, "lim": limit, "off": offset}).mappings().all()
+        _table_missing_since = None
+    except Exception as e:
+        _mark_table_error(e)
+        return None
+
+    snap = get_snapshot()
+    out = []
+    for r in rows:
+        if not _is_fresh(r, r["p_ingredients"], snap):
+            print(f"[SCORE_MATERIALIZER] 갱신 전 행(pid={r['pid']}, skin_type={skin_type}) → 실시간 계산으로 대체")
+            return None
+        item = {k: r[k] for k in ("pid", "product_name", "category", "final_score", "score_before",
+                                  "reliability", "total_keyword_hits", "matched_count")}
+        if with_ingredients:
+            item["p_ingredients"] = r["p_ingredients"]
+        out.append(item)
+    return out
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="product_baumann_scores 증분 갱신")
+    ap.add_argument("--full", action="store_true", help="지문과 무관하게 전체 재계산")
+    args = ap.parse_args()
+    refresh_scores(full=args.full)
@@ -0,0 +1,336 @@
+# backend/routers/scoring_engine.py
+# ============================================
+# 바우만 적합도 점수 벡터화 엔진
+# - 제품 × 6키워드 비율 행렬(NumPy)과 피부타입별 가중치 배열로
+#   calculate_fit_score / calculate_contribution / calculate_score_final /
+#   apply_soft_caps_by_hits 를 카테고리 단위로 한 번에 계산
+# - 결과는 analysis.py 의 스칼라 함수와 정확히 일치해야 한다
+#   (연산 순서/반올림 방식까지 동일하게 유지)
+# ============================================
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .ingredient_dict import IngredientDictSnapshot
+from .ingredient_tokens import ProductTokens, as_tokens
+
+# calculate_score_final 과 같은 순서의 6개 효능 키워드
+EFFECT_KEYS = ('moisturizing', 'soothing', 'sebum_control', 'anti_aging', 'brightening', 'protection')
+EFFECT_KEYS_KOR = ('보습', '진정', '피지', '주름', '미백', '보호')
+_EFFECT_INDEX = {k: i for i, k in enumerate(EFFECT_KEYS)}
+
+# 신뢰등급 코드 (classify_reliability 와 동일 기준)
+RELIABILITY_LABELS = ("very_low", "low", "normal")
+
+
+# ============================================
+# 반올림 (파이썬 round()와 동일 결과 보장)
+# ============================================
+def round_exact(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """
+    np.round 는 x*10^n 을 rint 하는 방식이라 .5 경계에서 파이썬 round()와 어긋날 수 있다.
+    경계 근처 원소만 파이썬 round()로 다시 계산해 결과를 일치시킨다.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    scale = 10.0 ** ndigits
+    scaled = values * scale
+    out = np.rint(scaled) / scale
+    ambiguous = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if ambiguous.any():
+        flat_out = out.reshape(-1)
+        flat_val = values.reshape(-1)
+        for i in np.flatnonzero(ambiguous.reshape(-1)):
+            flat_out[i] = round(float(flat_val[i]), ndigits)
+    return out
+
+
+# ============================================
+# 가중치 컴파일
+# ============================================
+class CompiledWeights:
+    """
+    user_weights_dict 하나(또는 여러 피부타입)를 배열로 변환한 것.
+    importance / target_min / target_max : (P, 6)
+    min_possible / score_range : (P,)
+    """
+
+    __slots__ = ("skin_types", "importance", "tmin", "tmax",
+                 "min_possible", "score_range", "importance_raw", "target_ranges")
+
+    def __init__(self, skin_types: Sequence[Optional[str]], weight_dicts: Sequence[dict]):
+        self.skin_types = list(skin_types)
+        n_prof = len(weight_dicts)
+        self.importance = np.zeros((n_prof, 6), dtype=np.float64)
+        self.tmin = np.zeros((n_prof, 6), dtype=np.float64)
+        self.tmax = np.zeros((n_prof, 6), dtype=np.float64)
+        self.min_possible = np.zeros(n_prof, dtype=np.float64)
+        self.score_range = np.zeros(n_prof, dtype=np.float64)
+        # breakdown 은 원래 객체(int/float, list)를 그대로 돌려줘야 하므로 따로 보관
+        self.importance_raw: List[List[Any]] = []
+        self.target_ranges: List[List[list]] = []
+
+        for p, user_weights_dict in enumerate(weight_dicts):
+            max_possible_score = 0
+            min_possible_score = 0
+            imp_row, tr_row = [], []
+            for j, effect_kor in enumerate(EFFECT_KEYS_KOR):
+                effect_settings = (user_weights_dict or {}).get(effect_kor)
+                importance = 0
+                target_range = [0, 100]
+                if isinstance(effect_settings, dict):
+                    imp_val = effect_settings.get('importance')
+                    tr_val = effect_settings.get('target_range')
+                    if isinstance(imp_val, (int, float)): importance = imp_val
+                    if isinstance(tr_val, list) and len(tr_val) == 2: target_range = tr_val
+                if importance > 0: max_possible_score += (1.0 * importance)
+                elif importance < 0: min_possible_score += (importance * 0.7)
+                self.importance[p, j] = importance
+                self.tmin[p, j] = target_range[0]
+                self.tmax[p, j] = target_range[1]
+                imp_row.append(importance)
+                tr_row.append(target_range)
+            if max_possible_score == 0: max_possible_score = 1
+            self.min_possible[p] = min_possible_score
+            self.score_range[p] = max_possible_score - min_possible_score
+            self.importance_raw.append(imp_row)
+            self.target_ranges.append(tr_row)
+
+    def __len__(self) -> int:
+        return len(self.skin_types)
+
+
+def compile_weights(user_weights_dict: dict, skin_type: Optional[str] = None) -> CompiledWeights:
+    return CompiledWeights([skin_type], [user_weights_dict])
+
+
+def compile_all_weights(weights_by_type: Dict[str, dict]) -> CompiledWeights:
+    """스냅샷의 전체 피부타입 가중치를 (P, 6) 배열로 한 번에 컴파일"""
+    skin_types = sorted(weights_by_type)
+    return CompiledWeights(skin_types, [weights_by_type[s] for s in skin_types])
+
+
+# ============================================
+# 벡터화 점수 계산
+# ============================================
+def keyword_ratio_matrix(counts: np.ndarray, hits: np.ndarray) -> np.ndarray:
+    """calculate_keyword_ratios 의 행렬 버전 (히트 0 이면 전부 0)"""
+    counts = np.asarray(counts, dtype=np.float64)
+    hits = np.asarray(hits, dtype=np.float64)
+    ratios = np.zeros_like(counts)
+    nz = hits > 0
+    if nz.any():
+        ratios[nz] = round_exact((counts[nz] / hits[nz, None]) * 100, 2)
+    return ratios
+
+
+def fit_scores(p: np.ndarray, tmin: np.ndarray, tmax: np.ndarray, imp: np.ndarray) -> np.ndarray:
+    """calculate_fit_score 의 원소별(브로드캐스트) 버전"""
+    p, tmin, tmax, imp = (a.astype(np.float64, copy=False)
+                          for a in np.broadcast_arrays(p, tmin, tmax, imp))
+    out = np.full(p.shape, 0.5)
+
+    in_range = (tmin <= p) & (p <= tmax)
+    below = ~in_range & (p < tmin)
+    above = ~in_range & ~below & (p > tmax)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # 범위 중앙에 가까울수록 높게(최대 0.97), 경계에서 0.90
+        if in_range.any():
+            pi, lo, hi = p[in_range], tmin[in_range], tmax[in_range]
+            mid = (lo + hi) / 2.0
+            half = np.maximum(1.0, (hi - lo) / 2.0)
+            deviation = np.minimum(1.0, np.abs(pi - mid) / half)
+            out[in_range] = np.maximum(0.90, round_exact(0.97 - deviation * 0.07, 4))
+
+        if below.any():
+            pb, lo = p[below], tmin[below]
+            nonpos = lo <= 0
+            out[below] = np.where(
+                nonpos,
+                np.where(pb == 0, 1.0, 0.5),
+                np.maximum(0.0, pb / np.where(nonpos, 1.0, lo)),
+            )
+
+        if above.any():
+            pa, hi, ia = p[above], tmax[above], imp[above]
+            # 음수 중요도: 초과분 선형 감점
+            neg_val = np.maximum(-0.5, 1.0 - ((pa - hi) / 100) * 5)
+            # 양수 중요도: soft_max(=1.5배)까지 완만하게, 이후 급감
+            soft_max = hi * 1.5
+            span = soft_max - hi
+            ratio = np.where(span != 0, (pa - hi) / np.where(span != 0, span, 1.0), 0)
+            soft_val = np.maximum(0.2, 1.0 - ratio * 0.8)
+            divisor = np.where(hi != 0, hi, 1)
+            hard_val = np.maximum(0.0, 0.2 - (pa - soft_max) / divisor * 0.2)
+            pos_val = np.where(pa <= soft_max, soft_val, hard_val)
+            out[above] = np.where(ia < 0, neg_val, pos_val)
+
+    return out
+
+
+def contributions(ratios: np.ndarray, compiled: CompiledWeights) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    calculate_contribution 의 벡터화 버전.
+    ratios (N, 6) × 가중치 (P, 6) → fit / contribution (N, P, 6)
+    """
+    p = np.asarray(ratios, dtype=np.float64)[:, None, :]
+    imp = compiled.importance[None, :, :]
+    tmin = compiled.tmin[None, :, :]
+    tmax = compiled.tmax[None, :, :]
+
+    fit = fit_scores(p, tmin, tmax, imp)
+    neg = np.broadcast_to(imp < 0, fit.shape)
+    neg_ok = neg & (p <= tmax)
+    fit = np.where(neg_ok, 1.0, fit)
+    contrib = np.where(neg, np.where(neg_ok, 0.0, (1.0 - fit) * imp * 0.75), fit * imp)
+    return fit, contrib
+
+
+def final_scores_from_contrib(contrib: np.ndarray, compiled: CompiledWeights) -> np.ndarray:
+    """calculate_score_final 의 점수 부분 (N, P) int64"""
+    # 파이썬 루프와 같은 순서로 누적 (부동소수 합산 순서 고정)
+    total = np.zeros(contrib.shape[:-1], dtype=np.float64)
+    for j in range(contrib.shape[-1]):
+        total = total + contrib[..., j]
+
+    score_range = compiled.score_range[None, :]
+    safe_range = np.where(score_range == 0, 1.0, score_range)
+    normalized = (total - compiled.min_possible[None, :]) / safe_range
+    final = np.where(score_range == 0, 50.0, 25 + normalized * 75)
+    final = np.ceil(final)
+    return np.clip(final, 0, 100).astype(np.int64)
+
+
+def classify_reliability_codes(hits: np.ndarray) -> np.ndarray:
+    """0=very_low(<3), 1=low(3~6), 2=normal(>=7)"""
+    hits = np.asarray(hits)
+    return np.where(hits < 3, 0, np.where(hits < 7, 1, 2))
+
+
+def apply_soft_caps(final: np.ndarray, hits: np.ndarray, rel_codes: np.ndarray) -> np.ndarray:
+    """apply_soft_caps_by_hits 벡터화 (final: (N,) 또는 (N, P))"""
+    if final.ndim == 2:
+        hits = hits[:, None]
+        rel_codes = rel_codes[:, None]
+    capped = np.where(rel_codes == 1, np.minimum(final, 75), final)
+    capped = np.where((rel_codes == 2) & (hits < 10), np.minimum(capped, 95), capped)
+    return capped
+
+
+def build_breakdown(ratio_row: np.ndarray, fit_row: np.ndarray, contrib_row: np.ndarray,
+                    compiled: CompiledWeights, profile: int, has_hits: bool = True) -> Dict[str, dict]:
+    """
+    calculate_score_final 의 breakdown 과 동일한 dict 생성 (값 타입까지 동일하게).
+    fit_row / contrib_row : 해당 (제품, 피부타입)의 6개 값
+    """
+    breakdown = {}
+    for j, effect_eng in enumerate(EFFECT_KEYS):
+        importance = compiled.importance_raw[profile][j]
+        percent = float(ratio_row[j]) if has_hits else 0
+        if importance < 0 and percent <= compiled.target_ranges[profile][j][1]:
+            fit_score, contribution = 1.0, 0
+        else:
+            fit_score, contribution = float(fit_row[j]), float(contrib_row[j])
+        breakdown[effect_eng] = {
+            "percent": round(percent, 1), "target_range": compiled.target_ranges[profile][j],
+            "fit_score": round(fit_score, 2), "importance": importance,
+            "contribution": round(contribution, 2)
+        }
+    return breakdown
+
+
+# ============================================
+# 제품 × 6키워드 행렬
+# ============================================
+def keyword_features(tokens: ProductTokens, snap: IngredientDictSnapshot):
+    """
+    match_ingredients 와 같은 규칙으로 (6키워드 카운트, 총 키워드 히트, 고유 매칭 성분 수) 계산
+    """
+    counts = [0] * 6
+    hits = 0
+    matched = set()
+    keyword_map = snap.keywords
+    for ingredient, normalized in tokens:
+        if not normalized: continue
+        keywords = keyword_map.get(normalized)
+        if not keywords: continue
+        matched.add(ingredient)
+        for kw in keywords:
+            hits += 1
+            j = _EFFECT_INDEX.get(kw)
+            if j is not None:
+                counts[j] += 1
+    return counts, hits, len(matched)
+
+
+class ProductScoreMatrix:
+    """
+    카테고리(또는 임의 제품 묶음) 단위 점수 계산용 행렬.
+    - ratios : (N, 6) 키워드 비율 (calculate_keyword_ratios 결과와 동일)
+    - hits   : (N,) 총 키워드 히트 수
+    - matched_count : (N,) 키워드가 하나라도 있는 고유 성분 수
+    - norm_tokens   : 사용자 주의 성분 교집합용 정규화 토큰 집합
+    rows 는 (name, category, ProductTokens | p_ingredients 문자열)
+    """
+
+    def __init__(self, rows: Sequence[Tuple[Any, ...]], snap: IngredientDictSnapshot):
+        n = len(rows)
+        self.version = snap.version
+        self.names: List[str] = []
+        self.categories: List[str] = []
+        self.norm_tokens: List[frozenset] = []
+        counts = np.zeros((n, 6), dtype=np.float64)
+        self.hits = np.zeros(n, dtype=np.int64)
+        self.matched_count = np.zeros(n, dtype=np.int64)
+
+        for i, (name, cat, ingredients) in enumerate(rows):
+            tokens = as_tokens(ingredients)
+            c, h, m = keyword_features(tokens, snap)
+            counts[i] = c
+            self.hits[i] = h
+            self.matched_count[i] = m
+            self.names.append(name)
+            self.categories.append(cat)
+            self.norm_tokens.append(tokens.norm_set())
+
+        self.ratios = keyword_ratio_matrix(counts, self.hits)
+        self.reliability = classify_reliability_codes(self.hits)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def score(self, compiled: CompiledWeights) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        반환: (score_before, final_score) 각 (N, P)
+        - score_before : calculate_score_final 결과
+        - final_score  : apply_soft_caps_by_hits 적용 후
+        """
+        if len(self) == 0:
+            empty = np.zeros((0, len(compiled)), dtype=np.int64)
+            return empty, empty
+        _, contrib = contributions(self.ratios, compiled)
+        raw = final_scores_from_contrib(contrib, compiled)
+        capped = apply_soft_caps(raw, self.hits, self.reliability)
+        return raw, capped
+
+
+def score_single(ratios: Dict[str, float], hits: int, compiled: CompiledWeights):
+    """
+    제품 1개를 여러 피부타입 가중치에 대해 한 번에 평가.
+    반환: (score_before (P,), final_score (P,), breakdowns [P개 dict])
+    """
+    ratio_row = np.array([[ratios.get(k, 0) for k in EFFECT_KEYS]], dtype=np.float64)
+    fit, contrib = contributions(ratio_row, compiled)
+    raw = final_scores_from_contrib(contrib, compiled)[0]
+    rel = classify_reliability_codes(np.array([hits]))
+    capped = apply_soft_caps(raw[None, :], np.array([hits]), rel)[0]
+    breakdowns = [
+        build_breakdown(ratio_row[0], fit[0, p], contrib[0, p], compiled, p, has_hits=bool(ratios))
+        for p in range(len(compiled))
+    ]
+    return raw, capped, breakdowns
+
+
+def reliability_label(code: int) -> str:
+    return RELIABILITY_LABELS[int(code)]
@@ -0,0 +1,133 @@
+# backend/routers/trigram_index.py
+# ============================================
+# 문자 3-gram 역색인 (인메모리 퍼지 문자열 검색)
+# - 정규화(NFKC, 소문자, 영숫자/한글 외 문자 제거) 후 겹치는 3글자 조각을 색인
+# - 조회: 질의 조각의 포스팅을 한 번에 모아 np.bincount 로 문서별 공유 조각 수 계산
+#   → Dice 유사도(2·공유/(|질의|+|문서|))와 질의 포함률(공유/|질의|)을 벡터 연산으로 산출
+# - 문서 추가는 바뀐 조각의 포스팅만 새로 만들고 참조를 교체 (조회 중에도 안전)
+# ============================================
+
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+GRAM = 3
+
+
+def normalize_for_ngrams(text_value: Optional[str]) -> str:
+    if not text_value:
+        return ""
+    s = unicodedata.normalize("NFKC", text_value).lower()
+    return "".join(ch for ch in s if ch.isalnum())
+
+
+def ngrams(text_value: Optional[str], n: int = GRAM) -> List[str]:
+    """정규화 문자열의 서로 다른 n-gram (n 보다 짧으면 문자열 전체 하나)"""
+    s = normalize_for_ngrams(text_value)
+    if not s:
+        return []
+    if len(s) <= n:
+        return [s]
+    return list(dict.fromkeys(s[i:i + n] for i in range(len(s) - n + 1)))
+
+
+class TrigramHit(NamedTuple):
+    doc_id: int
+    dice: float        # 질의 ↔ 문서 전체 유사도
+    containment: float # 질의 조각 중 문서에 있는 비율 (1.0 이면 질의가 문서 안에 그대로 등장하는 경우 포함)
+
+
+class _State:
+    __slots__ = ("postings", "doc_ids", "gram_counts", "position")
+
+    def __init__(self, postings, doc_ids, gram_counts, position):
+        self.postings: Dict[str, np.ndarray] = postings    # gram → 문서 위치 배열(int32)
+        self.doc_ids: np.ndarray = doc_ids                 # 위치 → 외부 doc_id
+        self.gram_counts: np.ndarray = gram_counts         # 위치 → 문서 조각 수
+        self.position: Dict[int, int] = position           # doc_id → 위치
+
+
+class TrigramIndex:
+    def __init__(self, docs: Iterable[Tuple[int, str]] = ()):
+        self._lock = threading.Lock()
+        self._state = _State({}, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32), {})
+        self.add(docs)
+
+    def __len__(self) -> int:
+        return len(self._state.doc_ids)
+
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self._state.position
+
+    def add(self, docs: Iterable[Tuple[int, str]]) -> int:
+        """(doc_id, 문자열) 추가. 이미 있는 doc_id 는 건너뜀. 반환: 추가한 문서 수"""
+        with self._lock:
+            st = self._state
+            position = dict(st.position)
+            new_ids: List[int] = []
+            new_counts: List[int] = []
+            touched: Dict[str, List[int]] = {}
+            base = len(st.doc_ids)
+            for doc_id, value in docs:
+                if doc_id in position:
+                    continue
+                grams = ngrams(value)
+                if not grams:
+                    continue
+                pos = base + len(new_ids)
+                position[doc_id] = pos
+                new_ids.append(doc_id)
+                new_counts.append(len(grams))
+                for g in grams:
+                    touched.setdefault(g, []).append(pos)
+            if not new_ids:
+                return 0
+
+            postings = dict(st.postings)
+            for g, positions in touched.items():
+                extra = np.asarray(positions, dtype=np.int32)
+                old = postings.get(g)
+                postings[g] = extra if old is None else np.concatenate((old, extra))
+            self._state = _State(
+                postings,
+                np.concatenate((st.doc_ids, np.asarray(new_ids, dtype=np.int64))),
+                np.concatenate((st.gram_counts, np.asarray(new_counts, dtype=np.int32))),
+                position,
+            )
+            return len(new_ids)
+
+    def search(self, query: Optional[str], limit: int = 5, min_dice: float = 0.0,
+               min_containment: float = 0.0) -> List[TrigramHit]:
+        """Dice 유사도 내림차순 상위 limit 개 (두 하한 중 하나만 넘어도 후보)"""
+        st = self._state
+        grams = ngrams(query)
+        if not grams or not len(st.doc_ids):
+            return []
+        lists = [st.postings[g] for g in grams if g in st.postings]
+        if not lists:
+            return []
+        shared = np.bincount(np.concatenate(lists), minlength=len(st.doc_ids))
+        cand = np.nonzero(shared)[0]
+        if not len(cand):
+            return []
+        common = shared[cand].astype(np.float32)
+        dice = 2.0 * common / (len(grams) + st.gram_counts[cand])
+        containment = common / len(grams)
+        if min_dice or min_containment:
+            keep = np.zeros(len(cand), dtype=bool)
+            if min_dice:
+                keep |= dice >= min_dice
+            if min_containment:
+                keep |= containment >= min_containment
+            cand, dice, containment = cand[keep], dice[keep], containment[keep]
+            if not len(cand):
+                return []
+        if len(cand) > limit:
+            top = np.argpartition(-dice, limit - 1)[:limit]
+        else:
+            top = np.arange(len(cand))
+        # Dice 동률이면 포함률이 높은 쪽 우선
+        top = top[np.lexsort((-containment[top], -dice[top]))]
+        return [TrigramHit(int(st.doc_ids[cand[i]]), float(dice[i]), float(containment[i])) for i in top]
@@ -0,0 +1,16 @@
+# backend/tests/conftest.py
+# ============================================
+# backend/ 를 import 경로에 추가하고, db 모듈이 import 시점에 읽는 접속 정보 기본값 설정
+# (엔진은 지연 연결이므로 실제 DB 없이도 import 가능)
+# ============================================
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for _key, _default in {
+    "DB_USER": "test", "DB_PASSWORD": "test", "DB_HOST": "localhost",
+    "DB_PORT": "3306", "DB_NAME": "test",
+}.items():
+    os.environ.setdefault(_key, _default)
@@ -0,0 +1,35 @@
+# backend/tests/test_product_name_index.py
+from routers.product_name_index import ProductNameIndex
+from routers.trigram_index import TrigramIndex, normalize_for_ngrams
+
+
+def _index(rows):
+    """DB 없이 (pid, product_name, brand) 행으로 색인 구성"""
+    idx = ProductNameIndex()
+    idx._index = TrigramIndex((pid, name) for pid, name, _ in rows)
+    idx._names = {pid: name for pid, name, _ in rows}
+    idx._brands = {pid: normalize_for_ngrams(brand) for pid, _, brand in rows}
+    idx.loaded = True
+    return idx
+
+
+def test_brand_bonus_picks_same_name_product_with_limit_1():
+    idx = _index([
+        (1, "수분 진정 크림", "브랜드에이"),
+        (2, "수분 진정 크림", "라운드랩"),
+    ])
+    candidates = ["라운드랩", "수분 진정 크림"]
+
+    top = idx.identify(candidates, limit=1)
+    assert [m.pid for m in top] == [2]
+    assert top[0].score > idx.identify(candidates, limit=5)[1].score
+
+
+def test_limit_1_matches_head_of_wider_ranking():
+    rows = [(pid, "수분 진정 크림", f"브랜드{pid}") for pid in range(1, 9)]
+    rows.append((99, "수분 진정 크림", "라운드랩"))
+    idx = _index(rows)
+    candidates = ["라운드랩", "수분 진정 크림"]
+
+    assert idx.identify(candidates, limit=1)[0].pid == 99
+    assert idx.identify(candidates, limit=1)[0] == idx.identify(candidates, limit=5)[0]